@@ -1,9 +1,12 @@
 import streamlit as st
 import pandas as pd
-from supabase import create_client, Client
+
+from db import get_client
+from metrics import begin_rerun, end_rerun
 
 # --- Streamlit Page Setup ---
 st.set_page_config(page_title="Salon Manager", page_icon="🌸", layout="wide")
+begin_rerun("Home")
 # ---- Simple password protection ----
 PASSWORD = st.secrets.get("app_password", None)
 
@@ -29,9 +32,7 @@ Use the sidebar / pages to:
 
 # --- Connect to Supabase ---
 try:
-    url = st.secrets["SUPABASE_URL"]
-    key = st.secrets["SUPABASE_KEY"]
-    supabase: Client = create_client(url, key)
+    supabase = get_client()
 
     # Instead of count(*), just try a light select
     test_res = supabase.table("Customers").select("*").limit(1).execute()
@@ -59,3 +60,4 @@ try:
 except Exception as e:
     st.error(f"❌ Failed to connect to Supabase: {e}")
 
+end_rerun()
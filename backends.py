@@ -0,0 +1,64 @@
+"""Storage backends the pages can run against.
+
+Every page talks to storage through `db.get_client()`, which returns a
+`Backend`: the query-builder surface of a supabase Client (`table(...)` and
+`rpc(...)`) restricted to what the app uses. Which one is built is chosen by
+the `backend` setting (SALON_BACKEND env var or `backend` in
+.streamlit/secrets.toml):
+
+    backend = "supabase"   # default: the cloud project ([supabase] url/key)
+    backend = "sqlite"     # local file (sqlite_path, default salon.db) or ":memory:"
+"""
+from typing import Protocol
+
+from supabase import create_client
+
+# Every table the app reads or writes
+APP_TABLES = [
+    "Customers",
+    "Visits",
+    "ProductsUsed",
+    "Products",
+    "Services",
+    "SaleProducts",
+    "SaleCart",
+    "Sales",
+    "SaleLines",
+    "DailyRollup",
+]
+
+
+class Query(Protocol):
+    def select(self, *columns: str, count: str | None = None) -> "Query": ...
+    def insert(self, rows) -> "Query": ...
+    def upsert(self, rows, on_conflict: str = "", ignore_duplicates: bool = False) -> "Query": ...
+    def update(self, values: dict) -> "Query": ...
+    def delete(self) -> "Query": ...
+    def eq(self, column: str, value) -> "Query": ...
+    def neq(self, column: str, value) -> "Query": ...
+    def gt(self, column: str, value) -> "Query": ...
+    def gte(self, column: str, value) -> "Query": ...
+    def lt(self, column: str, value) -> "Query": ...
+    def lte(self, column: str, value) -> "Query": ...
+    def ilike(self, column: str, pattern: str) -> "Query": ...
+    def in_(self, column: str, values) -> "Query": ...
+    def or_(self, filters: str) -> "Query": ...
+    def order(self, column: str, *, desc: bool = False, foreign_table: str | None = None) -> "Query": ...
+    def limit(self, size: int) -> "Query": ...
+    def range(self, start: int, end: int) -> "Query": ...
+    def execute(self): ...
+
+
+class Backend(Protocol):
+    def table(self, name: str) -> Query: ...
+    def rpc(self, name: str, params: dict | None = None) -> Query: ...
+
+
+def create_backend(kind: str, *, url: str | None = None, key: str | None = None,
+                   sqlite_path: str = "salon.db") -> Backend:
+    if kind == "supabase":
+        return create_client(url, key)
+    if kind == "sqlite":
+        from sqlite_backend import SQLiteBackend
+        return SQLiteBackend(sqlite_path)
+    raise ValueError(f"Unknown backend {kind!r}; expected 'supabase' or 'sqlite'")
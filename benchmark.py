@@ -0,0 +1,223 @@
+"""Headless page benchmarks against a local SQLite dataset.
+
+    python generate_data.py --scale 0.1 --sqlite bench.db
+    python benchmark.py --sqlite bench.db --save-baseline bench_baseline.json
+    ... change something ...
+    python benchmark.py --sqlite bench.db --baseline bench_baseline.json
+
+Each scenario drives the real page with Streamlit's AppTest: the setup
+(opening the page, filling the cart, ...) runs unmeasured with an empty query
+cache and fresh table snapshots, then the user action is timed. Reported per scenario: median wall
+time, backend calls (what would be PostgREST round trips) and peak Python
+memory of the action (from a separate tracemalloc run). With --baseline the
+run is compared and the exit status is 1 when a scenario got slower than
+--tolerance, made more calls, or used more memory than --tolerance.
+
+Peak memory is traced, so that run is several times slower than the timed
+ones; at full scale (generate_data.py without --scale) pages that render a
+widget per row can take minutes. "confirm sale" really checks out, so each
+run takes stock from the dataset; regenerate it now and then.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+PASSWORD = "benchmark"
+
+
+# ---------- HELPERS ----------
+def _page(ctx: dict, name: str):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(ROOT / "pages" / name), default_timeout=ctx["timeout"])
+    at.secrets["app_password"] = PASSWORD
+    return at
+
+
+def _widget(widgets, label: str):
+    return next(w for w in widgets if w.label == label)
+
+
+def _check(at) -> None:
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+
+
+# ---------- SCENARIOS ----------
+# Each returns the action to time; everything before `return` is setup.
+def customers_first_page(ctx):
+    at = _page(ctx, "1_Customers.py")
+    return lambda: at.run()
+
+
+def customers_search(ctx):
+    at = _page(ctx, "1_Customers.py").run()
+    box = _widget(at.text_input, "🔍 Search customers")
+    return lambda: box.set_value(ctx["search_term"]).run()
+
+
+def open_customer(ctx):
+    at = _page(ctx, "2_Customer_Detail.py")
+    at.session_state["selected_customer_no"] = ctx["busiest_customer"]
+    return lambda: at.run()
+
+
+def retail_open(ctx):
+    at = _page(ctx, "5_Retail_Sales.py")
+    return lambda: at.run()
+
+
+def _tick(at, row: int):
+    # AppTest can't click grid cells; tick the row through the editor's widget state
+    at.session_state["inventory_0"] = {"edited_rows": {row: {"Add": True}}, "added_rows": [], "deleted_rows": []}
+    return at
+
+
+def retail_add_to_cart(ctx):
+    at = _tick(_page(ctx, "5_Retail_Sales.py").run(), ctx["stocked_row"]).run()
+    return lambda: _tick(at, ctx["stocked_row"]).button(key="add_selected").click().run()
+
+
+def retail_confirm_sale(ctx):
+    at = _tick(_page(ctx, "5_Retail_Sales.py").run(), ctx["stocked_row"]).run()
+    _tick(at, ctx["stocked_row"]).button(key="add_selected").click().run()
+    _widget(at.text_input, "🔐 Password to confirm sale").set_value(PASSWORD).run()
+    return lambda: _widget(at.button, "✅ Confirm Sale").click().run()
+
+
+SCENARIOS = {
+    "customers: first page": customers_first_page,
+    "customers: search": customers_search,
+    "customer detail: open": open_customer,
+    "retail: open": retail_open,
+    "retail: add to cart": retail_add_to_cart,
+    "retail: confirm sale": retail_confirm_sale,
+}
+
+
+# ---------- RUNNER ----------
+def context(client, timeout: float) -> dict:
+    """Inputs the scenarios need, read straight from the dataset."""
+    import db
+
+    conn = client.conn
+    busiest = conn.execute(
+        'SELECT "CustomerNo" FROM "Customers" ORDER BY "LastVisitID" DESC LIMIT 1').fetchone()
+    name = conn.execute('SELECT "FullName" FROM "Customers" LIMIT 1').fetchone()
+    products = db.load_sale_products("")
+    if busiest is None or products.empty:
+        raise SystemExit("The dataset is empty; run generate_data.py first.")
+    return {
+        "timeout": timeout,
+        "busiest_customer": busiest[0],
+        "search_term": name[0].split()[-1][:5],
+        "stocked_row": int(products["Quantity"].to_numpy().argmax()),
+        "rows": {t: conn.execute(f'SELECT count(*) FROM "{t}"').fetchone()[0]
+                 for t in ("Customers", "Visits", "ProductsUsed", "SaleProducts", "Services")},
+    }
+
+
+def measure(scenario, ctx: dict, client, trace: bool = False) -> dict:
+    import db
+
+    db.get_cache().clear()
+    db.get_snapshots.clear()
+    action = scenario(ctx)
+    calls = client.calls
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    at = action()
+    wall = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] if trace else 0
+    if trace:
+        tracemalloc.stop()
+    _check(at)
+    return {"wall_ms": wall * 1000, "calls": client.calls - calls, "peak_kb": peak / 1024}
+
+
+def run(repeat: int, timeout: float) -> dict:
+    from streamlit.logger import set_log_level
+
+    import db
+
+    set_log_level("error")      # bare-mode ScriptRunContext warnings on every cached call
+
+    client = db.get_client()
+    ctx = context(client, timeout)
+    results = {}
+    for name, scenario in SCENARIOS.items():
+        timed = [measure(scenario, ctx, client) for _ in range(repeat)]
+        traced = measure(scenario, ctx, client, trace=True)
+        results[name] = {
+            "wall_ms": round(statistics.median(r["wall_ms"] for r in timed), 1),
+            "calls": min(r["calls"] for r in timed),
+            "peak_kb": round(traced["peak_kb"]),
+        }
+        print(f"  {name:<24} {results[name]['wall_ms']:>9.1f} ms {results[name]['calls']:>5} calls "
+              f"{results[name]['peak_kb']:>9,} KiB", flush=True)
+    return {"rows": ctx["rows"], "scenarios": results}
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Human-readable regressions of `current` against `baseline`."""
+    if baseline.get("rows") != current["rows"]:
+        print(f"⚠️ Baseline was taken on a different dataset: {baseline.get('rows')}")
+    regressions = []
+    for name, now in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        change = now["wall_ms"] / before["wall_ms"] - 1 if before["wall_ms"] else 0.0
+        print(f"  {name:<24} {before['wall_ms']:>9.1f} -> {now['wall_ms']:>9.1f} ms ({change:+.0%}), "
+              f"calls {before['calls']} -> {now['calls']}, "
+              f"memory {before['peak_kb']:,} -> {now['peak_kb']:,} KiB")
+        if change > tolerance:
+            regressions.append(f"{name}: {change:+.0%} wall time")
+        if now["calls"] > before["calls"]:
+            regressions.append(f"{name}: {now['calls'] - before['calls']} more backend calls")
+        if before["peak_kb"] and now["peak_kb"] > before["peak_kb"] * (1 + tolerance):
+            regressions.append(f"{name}: peak memory {now['peak_kb']:,} KiB (was {before['peak_kb']:,})")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sqlite", default="salon.db", help="dataset made by generate_data.py")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per scenario (median is reported)")
+    parser.add_argument("--timeout", type=float, default=900, help="seconds one page run may take")
+    parser.add_argument("--baseline", help="JSON from an earlier --save-baseline to compare against")
+    parser.add_argument("--save-baseline", metavar="PATH", help="write this run's results as a baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown/memory growth (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    if not Path(args.sqlite).exists():
+        raise SystemExit(f"{args.sqlite} not found; run generate_data.py first.")
+    # db.get_client() reads these; set before the pages import db
+    os.environ["SALON_BACKEND"] = "sqlite"
+    os.environ["SALON_SQLITE_PATH"] = str(Path(args.sqlite).resolve())
+    sys.path.insert(0, str(ROOT))
+
+    print(f"Benchmarking against {args.sqlite}")
+    current = run(args.repeat, args.timeout)
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(current, indent=2) + "\n")
+        print(f"Baseline saved to {args.save_baseline}")
+    if args.baseline:
+        print(f"Compared with {args.baseline}:")
+        regressions = compare(current, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for line in regressions:
+            print(f"❌ {line}")
+        if regressions:
+            sys.exit(1)
+        print("✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+import threading
+import time
+from dataclasses import dataclass
+
+import pandas as pd
+import streamlit as st
+
+from changeset import to_records
+from db import save_cart, get_client, get_executor, setting
+from pricing import price_lines
+
+CHECKPOINT_SECONDS = 30   # background SaleCart sync at most this often while editing
+TOUCH_SECONDS = 3600      # rewrite an unchanged open cart this often, so the sweeper never expires it
+CART_EXPIRY_HOURS = 24    # sql/010_cart_expiry.sql: carts untouched this long are deleted
+SWEEP_SECONDS = 900       # CartSweeper interval
+SWEEP_BATCH = 500         # carts per expire_sale_carts call
+SALE_CART_COLUMNS = ["SessionID", "ProductID", "Name", "Brand", "Qty", "DiscountPct", "VATRate",
+                     "UnitSellEx", "UnitSellInc", "LineTotalEx", "LineTotalInc"]
+
+
+@dataclass
+class CartLine:
+    product_id: int
+    name: str
+    brand: str | None
+    qty: float
+    discount_pct: float
+    base_ex: float      # SellPriceEx when the line was added (cached catalog price)
+    buy_ex: float       # BuyPriceEx, for line profit
+    stock: float        # Quantity on hand when the line was added
+
+
+class SessionCart:
+    """Shopping cart kept in st.session_state.
+
+    Every click edits the lines in memory and prices them locally, so it costs
+    no network round trip. SaleCart is written behind: `checkpoint()` pushes the
+    latest state on a background thread at most every CHECKPOINT_SECONDS, and
+    coalesces bursts into one write; `flush()` writes synchronously (checkout).
+    An open cart is rewritten every TOUCH_SECONDS even without edits, which
+    keeps its UpdatedAt ahead of the CartSweeper.
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.lines: dict[int, CartLine] = {}
+        self._version = 0           # bumped on every edit
+        self._written = 0           # last version persisted to SaleCart
+        self._pending = None        # (version, records) waiting for the writer
+        self._writing = False
+        self._last_checkpoint = 0.0
+        self._written_at = time.monotonic()   # last successful SaleCart write
+        self._priced: tuple[int, pd.DataFrame] | None = None    # (version, frame())
+        self._cond = threading.Condition()
+        self.last_error: Exception | None = None
+
+    # ---------- EDITS ----------
+    def _touch(self) -> None:
+        self._version += 1
+
+    def _add_line(self, product_row: pd.Series, qty: float) -> str | None:
+        qty = float(qty)
+        if qty <= 0:
+            return "Quantity must be > 0"
+        pid = int(product_row["id"])
+        line = self.lines.get(pid)
+        in_cart = line.qty if line else 0.0
+        if in_cart + qty > float(product_row["Quantity"]):
+            return f"Not enough stock for {product_row['Name']}"
+        if line:
+            # Keep whatever discount the line already had
+            line.qty += qty
+        else:
+            self.lines[pid] = CartLine(
+                product_id=pid,
+                name=product_row["Name"],
+                brand=product_row.get("Brand"),
+                qty=qty,
+                discount_pct=0.0,
+                base_ex=float(product_row["SellPriceEx"]),
+                buy_ex=float(product_row.get("BuyPriceEx") or 0.0),
+                stock=float(product_row["Quantity"]),
+            )
+        return None
+
+    def add(self, product_row: pd.Series, qty: float) -> str | None:
+        msg = self._add_line(product_row, qty)
+        if msg is None:
+            self._touch()
+        return msg
+
+    def add_many(self, product_rows: pd.DataFrame, qty_column: str = "Qty") -> list[str]:
+        """Add every row of `product_rows` as one edit, so the basket costs one SaleCart write.
+
+        Rows that don't fit (stock, quantity) are skipped; their messages are returned.
+        """
+        errors, added = [], False
+        for _, row in product_rows.iterrows():
+            msg = self._add_line(row, row[qty_column])
+            if msg:
+                errors.append(msg)
+            else:
+                added = True
+        if added:
+            self._touch()
+        return errors
+
+    def set_qty(self, product_id: int, new_qty: float) -> str | None:
+        line = self.lines.get(product_id)
+        if line is None:
+            return None
+        msg = None
+        new_qty = max(0.0, float(new_qty))
+        if new_qty > line.stock:
+            msg = "⚠️ Cannot exceed available stock."
+            new_qty = line.stock
+        line.qty = new_qty
+        self._touch()
+        return msg
+
+    def set_discount(self, product_id: int, new_discount: float) -> None:
+        line = self.lines.get(product_id)
+        if line is None:
+            return
+        line.discount_pct = min(max(float(new_discount), 0.0), 100.0)
+        self._touch()
+
+    def clear(self) -> None:
+        self.lines.clear()
+        self._touch()
+
+    def mark_checked_out(self) -> None:
+        """confirm_sale already deleted the SaleCart rows; nothing left to write."""
+        with self._cond:
+            self.lines.clear()
+            self._touch()
+            self._written = self._version
+
+    # ---------- PRICING ----------
+    def frame(self) -> pd.DataFrame:
+        """Cart lines priced locally in one vectorized pass (SaleCart columns plus LineVAT/LineProfit).
+
+        Priced once per edit: the cart and totals fragments share the frame, so don't modify it.
+        """
+        if self._priced is None or self._priced[0] != self._version:
+            self._priced = (self._version, self._price())
+        return self._priced[1]
+
+    def _price(self) -> pd.DataFrame:
+        if not self.lines:
+            return pd.DataFrame()
+        lines = pd.DataFrame([{
+            "SessionID": self.session_id,
+            "ProductID": line.product_id,
+            "Name": line.name,
+            "Brand": line.brand,
+            "Qty": line.qty,
+            "DiscountPct": line.discount_pct,
+            "BasePriceEx": line.base_ex,
+            "BuyPriceEx": line.buy_ex,
+        } for line in self.lines.values()])
+        return price_lines(lines).drop(columns=["BasePriceEx", "BuyPriceEx"])
+
+    # ---------- PERSISTENCE ----------
+    def _submit(self) -> bool:
+        """Queue the current state for the writer; False if it is already persisted (and fresh)."""
+        with self._cond:
+            refresh = bool(self.lines) and time.monotonic() - self._written_at > TOUCH_SECONDS
+            if self._version <= self._written and not refresh:
+                return False
+            records = to_records(self.frame()[SALE_CART_COLUMNS]) if self.lines else []
+            self._pending = (self._version, records, refresh)
+            if self._writing:
+                return True     # the running write picks up the newest state
+            self._writing = True
+        client = get_client()
+        get_executor().submit(self._drain, client)
+        return True
+
+    def _drain(self, client) -> None:
+        while True:
+            with self._cond:
+                if self._pending is None or (self._pending[0] <= self._written and not self._pending[2]):
+                    self._pending = None
+                    self._writing = False
+                    self._cond.notify_all()
+                    return
+                version, records, _ = self._pending
+                self._pending = None
+            try:
+                save_cart(self.session_id, records, client)
+                with self._cond:
+                    self._written = max(self._written, version)
+                    self._written_at = time.monotonic()
+                    self.last_error = None
+            except Exception as e:
+                # Leave _written behind so the next checkpoint/flush retries
+                with self._cond:
+                    self.last_error = e
+                    self._writing = False
+                    self._cond.notify_all()
+                return
+
+    def checkpoint(self) -> None:
+        """Write behind at most every CHECKPOINT_SECONDS; never blocks the rerun."""
+        if time.monotonic() - self._last_checkpoint < CHECKPOINT_SECONDS:
+            return
+        if self._submit():
+            self._last_checkpoint = time.monotonic()
+
+    def flush(self, timeout: float = 10.0) -> None:
+        """Persist the cart now and wait for it (before checkout)."""
+        refresh = self._submit() and self._version <= self._written
+        with self._cond:
+            self._cond.wait_for(lambda: not self._writing, timeout=timeout)
+            if self._version > self._written or (refresh and self.last_error):
+                raise RuntimeError(f"Could not save the cart: {self.last_error or 'timed out'}")
+        self._last_checkpoint = time.monotonic()
+
+
+# ---------- EXPIRY ----------
+class CartSweeper:
+    """Daemon thread that deletes abandoned carts (sql/010_cart_expiry.sql).
+
+    Every SWEEP_SECONDS it calls expire_sale_carts until a call deletes fewer
+    than SWEEP_BATCH carts, so each statement stays short. Set cart_sweeper =
+    "off" when pg_cron runs the function in the database instead.
+    """
+
+    def __init__(self, client, max_age_hours: float = CART_EXPIRY_HOURS,
+                 interval: float = SWEEP_SECONDS, batch: int = SWEEP_BATCH):
+        self.client = client
+        self.max_age_hours = max_age_hours
+        self.interval = interval
+        self.batch = batch
+        self.expired = 0            # carts deleted since start
+        self.last_run: float | None = None
+        self.last_error: Exception | None = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="cart-sweeper", daemon=True)
+
+    def start(self) -> "CartSweeper":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def sweep(self) -> int:
+        """Expire stale carts in batches; returns how many were deleted."""
+        total = 0
+        while not self._stop.is_set():
+            res = self.client.rpc("expire_sale_carts", {"p_max_age_hours": self.max_age_hours,
+                                                        "p_batch": self.batch}).execute()
+            count = int(res.data or 0)
+            total += count
+            if count < self.batch:
+                break
+        return total
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.expired += self.sweep()
+                self.last_error = None
+            except Exception as e:
+                # Offline or not migrated yet; try again next interval
+                self.last_error = e
+            self.last_run = time.time()
+            if self._stop.wait(self.interval):
+                return
+
+
+@st.cache_resource
+def get_cart_sweeper() -> CartSweeper | None:
+    if str(setting("cart_sweeper", "on")).lower() == "off":
+        return None
+    max_age = float(setting("cart_expiry_hours", CART_EXPIRY_HOURS))
+    return CartSweeper(get_client(), max_age_hours=max_age).start()
+
+
+def get_session_cart(session_id: str) -> SessionCart:
+    get_cart_sweeper()
+    cart = st.session_state.get("retail_cart")
+    if cart is None or cart.session_id != session_id:
+        cart = st.session_state["retail_cart"] = SessionCart(session_id)
+    return cart
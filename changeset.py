@@ -0,0 +1,38 @@
+import pandas as pd
+
+
+def to_records(df: pd.DataFrame) -> list[dict]:
+    # JSON-safe: NaN/NaT -> None, numpy scalars -> Python scalars
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def changed_rows(original: pd.DataFrame, edited: pd.DataFrame, key: str = "id",
+                 columns: list[str] | None = None) -> list[dict]:
+    """Diff an `st.data_editor` result against the frame it was loaded from.
+
+    Rows are matched on `key`, so ordering, sorting and duplicate names in the
+    editor don't matter. Only `columns` (default: every column both frames
+    share) are compared. Each changed row comes back as the full original
+    record with the edited values applied, ready for a single bulk upsert.
+    Rows added or deleted in the editor are ignored.
+    """
+    if original.empty or edited.empty:
+        return []
+
+    before = original.drop_duplicates(key).set_index(key)
+    after = edited.drop_duplicates(key).set_index(key)
+    if columns is None:
+        columns = [c for c in after.columns if c in before.columns]
+    common = after.index.intersection(before.index)
+    a = before.loc[common, columns].astype(object)
+    b = after.loc[common, columns].astype(object)
+
+    differs = ~((a == b) | (a.isna() & b.isna()))
+    changed = differs.any(axis=1)
+    if not changed.any():
+        return []
+
+    keys = common[changed.to_numpy()]
+    merged = before.loc[keys].astype(object)
+    merged[columns] = b.loc[keys]
+    return to_records(merged.reset_index())
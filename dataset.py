@@ -0,0 +1,251 @@
+"""Reset, seed, snapshot and restore the app's data (replaces reset_data.py).
+
+    python dataset.py reset                          # empty every app table in one transaction
+    python dataset.py seed --generate --scale 0.01   # reset, then load synthetic data (generate_data.py)
+    python dataset.py seed --fixture fixtures/demo   # reset, then load a dataset directory
+    python dataset.py snapshot bench-small           # save all tables as datasets/bench-small/
+    python dataset.py restore bench-small            # reset, then load that snapshot back
+    python dataset.py list
+
+A dataset (snapshot or fixture) is a directory with one <Table>.parquet or
+<Table>.csv per table. Snapshots are Parquet, or CSV when pyarrow is not
+installed (meta.json then lists the text columns, so ids like phone numbers
+come back as text). Snapshots read PostgREST in keyset pages, and loads go
+through bulk_load: SQLiteBackend.bulk_load locally, or the bulk_load() RPC of
+sql/008_dataset_admin.sql in LOAD_BATCH-row requests against Supabase. The
+rows are complete (ids, VisitID, NetIncome, DailyRollup), so triggers are off
+while loading.
+
+This is a plain script, not a Streamlit app. Settings come from SALON_<NAME>
+env vars or .streamlit/secrets.toml, read directly. Supabase needs the
+service_role key: SALON_SUPABASE_SERVICE_KEY, or service_key under [supabase].
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+import tomllib
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+
+import pandas as pd
+
+from backends import APP_TABLES, create_backend
+from changeset import to_records
+from sqlite_backend import PRIMARY_KEYS
+
+ROOT = Path(__file__).parent
+DATASETS = ROOT / "datasets"
+LOAD_BATCH = 5000       # rows per bulk_load() request against Supabase
+READ_PAGE = 1000        # PostgREST's default max-rows
+# Parents before children
+LOAD_ORDER = ["Products", "Services", "SaleProducts", "Customers", "Visits", "ProductsUsed",
+              "Sales", "SaleLines", "SaleCart", "DailyRollup"]
+
+
+# ---------- SETTINGS ----------
+@lru_cache
+def _secrets() -> dict:
+    path = ROOT / ".streamlit" / "secrets.toml"
+    if not path.exists():
+        return {}
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+def setting(name: str, default=None):
+    """Same lookup as db.setting (SALON_<NAME>, then secrets.toml) without Streamlit."""
+    value = os.environ.get(f"SALON_{name.upper()}")
+    return value if value is not None else _secrets().get(name, default)
+
+
+def connect():
+    kind = setting("backend", "supabase")
+    if kind == "sqlite":
+        return create_backend("sqlite", sqlite_path=setting("sqlite_path", "salon.db"))
+    section = setting("supabase", {}) or {}
+    url = section.get("url") or setting("supabase_url")
+    key = section.get("service_key") or setting("supabase_service_key")
+    if not url or not key:
+        raise SystemExit("Supabase needs its url and the service_role key "
+                         "(SALON_SUPABASE_URL / SALON_SUPABASE_SERVICE_KEY).")
+    return create_backend(kind, url=url, key=key)
+
+
+# ---------- OPERATIONS ----------
+def reset(client) -> None:
+    client.rpc("truncate_app_data", {}).execute()
+
+
+def _plain_rows(df: pd.DataFrame):
+    # Column-wise tolist() turns numpy scalars into plain Python values
+    columns = [df[c].astype(object).where(df[c].notna(), None).tolist() for c in df.columns]
+    return zip(*columns)
+
+
+def load_frame(client, table: str, df: pd.DataFrame) -> int:
+    """Bulk-load complete rows into `table`."""
+    if df.empty:
+        return 0
+    if hasattr(client, "bulk_load"):     # SQLiteBackend: one executemany
+        return client.bulk_load(table, list(df.columns), _plain_rows(df))
+    loaded = 0
+    for i in range(0, len(df), LOAD_BATCH):
+        res = client.rpc("bulk_load", {"p_table": table, "p_rows": to_records(df.iloc[i:i + LOAD_BATCH])}).execute()
+        loaded += int(res.data or 0)
+    return loaded
+
+
+def load_dataset(client, frames: dict[str, pd.DataFrame], log=print) -> int:
+    total = 0
+    for table in LOAD_ORDER:
+        if table in frames:
+            started = time.perf_counter()
+            rows = load_frame(client, table, frames[table])
+            total += rows
+            log(f"  {table:<13} {rows:>10,} rows  {time.perf_counter() - started:6.1f}s")
+    if hasattr(client, "conn"):
+        client.conn.execute("ANALYZE")
+    return total
+
+
+def _has_pyarrow() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def read_dataset(path: Path) -> dict[str, pd.DataFrame]:
+    """Frames of a dataset directory (<Table>.parquet or <Table>.csv)."""
+    if not path.is_dir():
+        raise SystemExit(f"No dataset at {path}")
+    meta = json.loads((path / "meta.json").read_text()) if (path / "meta.json").exists() else {}
+    text = meta.get("text_columns", {})
+    frames = {}
+    for table in APP_TABLES:
+        if (path / f"{table}.parquet").exists():
+            if not _has_pyarrow():
+                raise SystemExit(f"{path / table}.parquet needs pyarrow (pip install pyarrow).")
+            frames[table] = pd.read_parquet(path / f"{table}.parquet")
+        elif (path / f"{table}.csv").exists():
+            frames[table] = pd.read_csv(path / f"{table}.csv", dtype={c: str for c in text.get(table, [])})
+    return frames
+
+
+def read_table(client, table: str) -> pd.DataFrame:
+    """All rows of `table`: one query on SQLite, keyset pages over PostgREST."""
+    if hasattr(client, "conn"):
+        return pd.read_sql(f'SELECT * FROM "{table}"', client.conn)
+    keys = PRIMARY_KEYS[table].split(",")
+    pages, last = [], None
+    while True:
+        q = client.table(table).select("*")
+        if len(keys) == 1:
+            q = q.order(keys[0]).limit(READ_PAGE)
+            if last is not None:
+                q = q.gt(keys[0], last)
+        else:
+            # Composite key (DailyRollup): Range pages in key order
+            for k in keys:
+                q = q.order(k)
+            offset = sum(len(p) for p in pages)
+            q = q.range(offset, offset + READ_PAGE - 1)
+        page = pd.DataFrame(q.execute().data or [])
+        pages.append(page)
+        if len(page) < READ_PAGE:
+            return pd.concat(pages, ignore_index=True)
+        last = page[keys[0]].iloc[-1]
+
+
+def snapshot(client, name: str, log=print) -> Path:
+    """Write every app table to datasets/<name>/ (replaced only once complete)."""
+    target = DATASETS / name
+    tmp = target.with_name(name + ".part")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    parquet = _has_pyarrow()
+    if not parquet:
+        log("pyarrow is not installed (pip install pyarrow): writing CSV instead of Parquet")
+    counts, text = {}, {}
+    for table in APP_TABLES:
+        started = time.perf_counter()
+        df = read_table(client, table)
+        if parquet:
+            df.to_parquet(tmp / f"{table}.parquet", index=False)
+        else:
+            df.to_csv(tmp / f"{table}.csv", index=False)
+            text[table] = [c for c in df.columns if not pd.api.types.is_numeric_dtype(df[c])]
+        counts[table] = len(df)
+        log(f"  {table:<13} {len(df):>10,} rows  {time.perf_counter() - started:6.1f}s")
+    (tmp / "meta.json").write_text(json.dumps({
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "backend": setting("backend", "supabase"),
+        "format": "parquet" if parquet else "csv",
+        "rows": counts,
+        **({"text_columns": text} if text else {}),
+    }, indent=2))
+    shutil.rmtree(target, ignore_errors=True)
+    tmp.rename(target)
+    return target
+
+
+def list_datasets() -> list[dict]:
+    out = []
+    for path in sorted(DATASETS.glob("*/meta.json")):
+        meta = json.loads(path.read_text())
+        out.append({"name": path.parent.name, "created": meta.get("created"),
+                    "rows": sum(meta.get("rows", {}).values())})
+    return out
+
+
+# ---------- CLI ----------
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("reset", help="empty every app table")
+    seed = sub.add_parser("seed", help="reset, then load a fixture or generated data")
+    source = seed.add_mutually_exclusive_group(required=True)
+    source.add_argument("--fixture", type=Path, help="dataset directory (<Table>.parquet/.csv)")
+    source.add_argument("--generate", action="store_true", help="synthetic data from generate_data.py")
+    seed.add_argument("--scale", type=float, default=0.01)
+    seed.add_argument("--seed", type=int, default=42)
+    sub.add_parser("snapshot", help="save all tables as datasets/NAME").add_argument("name")
+    sub.add_parser("restore", help="reset, then load datasets/NAME").add_argument("name")
+    sub.add_parser("list", help="list saved datasets")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for d in list_datasets():
+            print(f"{d['name']:<24} {d['created']}  {d['rows']:>12,} rows")
+        return
+
+    client = connect()
+    started = time.perf_counter()
+    if args.command == "snapshot":
+        path = snapshot(client, args.name)
+        print(f"✅ Snapshot {path} in {time.perf_counter() - started:.1f}s")
+        return
+
+    if args.command == "seed" and args.generate:
+        from generate_data import generate
+
+        frames = generate(args.scale, args.seed)
+        print(f"Generated in {time.perf_counter() - started:.1f}s")
+    elif args.command == "seed":
+        frames = read_dataset(args.fixture)
+    elif args.command == "restore":
+        frames = read_dataset(DATASETS / args.name)
+    else:
+        frames = {}
+
+    reset(client)
+    rows = load_dataset(client, frames)
+    print(f"✅ {args.command.capitalize()} done: {rows:,} rows in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,725 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import Callable, Iterator
+
+import pandas as pd
+import streamlit as st
+
+from backends import Backend, create_backend
+from changeset import changed_rows, to_records
+from pricing import VISIT_OVERHEAD, price_products, round_cents, vat_from_gross
+
+# ---------- CONSTANTS ----------
+CACHE_TTL = 60            # seconds a cached read stays fresh
+CACHE_MAX_ENTRIES = 128   # per table, least recently used entries are evicted first
+CUSTOMER_PAGE_SIZE = 50   # default rows per page in the customer list
+PAGE_DEADLINE = 10.0      # seconds a page waits for its fanned-out reads
+READ_WORKERS = 8          # threads shared by all sessions for fan_out
+FETCH_PAGE = 1000         # PostgREST's default max-rows: bigger reads are paged
+WRITE_BATCH = 1000        # rows per bulk insert/upsert request
+SEARCH_LIMIT = 20         # top N customer search matches
+SEARCH_MIN_CHARS = 2      # shorter terms are not sent to the database
+DELTA_POLL = 2.0          # seconds between delta queries for one snapshot table
+DELTA_OVERLAP = 30.0      # seconds re-read behind the watermark, for transactions that commit late
+RECONCILE_EVERY = 900.0   # seconds between full re-reads of a snapshot table
+# Tables held in memory by TableSnapshot (sql/009_delta_refresh.sql), with their key column
+SNAPSHOT_TABLES = {"Products": "id", "Services": "id", "SaleProducts": "id"}
+# How the snapshots store their repetitive labels (categorical) and money (float32, with its stored decimals)
+SNAPSHOT_CATEGORIES = {"Products": ["Brand"], "Services": ["Category"], "SaleProducts": ["Brand"]}
+SNAPSHOT_FLOAT32 = {
+    "Products": {"PackagePrice": 2, "PricePerGram": 4},
+    "Services": {"Price_EUR": 2},
+    "SaleProducts": {"BuyPriceEx": 2, "BuyPriceInc": 2, "SellPriceEx": 2, "SellPriceInc": 2, "ProfitAbs": 2},
+}
+
+# Columns the data_editor grids are allowed to write back
+PRODUCT_EDIT_COLUMNS = ["Brand", "ColorNo", "PackageWeight_g", "PackagePrice", "PricePerGram", "Quantity"]
+SERVICE_EDIT_COLUMNS = ["Category", "ServiceName", "Duration", "Price_EUR", "Active"]
+# Sell prices and profit are derived from BuyPriceEx (pricing.price_products), not edited
+SALE_PRODUCT_EDIT_COLUMNS = ["Name", "Brand", "BuyPriceEx", "Quantity"]
+
+
+# ---------- CONNECTION ----------
+def setting(name: str, default=None):
+    """App setting from the SALON_<NAME> env var, else .streamlit/secrets.toml."""
+    value = os.environ.get(f"SALON_{name.upper()}")
+    if value is not None:
+        return value
+    try:
+        return st.secrets.get(name, default)
+    except FileNotFoundError:   # no secrets.toml at all
+        return default
+
+
+def _secret(name: str):
+    # Older pages used [supabase] url/key, newer ones SUPABASE_URL/KEY; accept both.
+    section = setting("supabase", {}) or {}
+    return section.get(name.lower()) or setting(f"SUPABASE_{name}")
+
+
+@st.cache_resource
+def get_client() -> Backend:
+    """One client per server process; its HTTP connection pool is reused by every rerun.
+
+    `backend = "sqlite"` (see backends.py) swaps the Supabase project for a local database.
+    Every request made through it is recorded by metrics.py and retried per resilience.py.
+    With `offline_mirror` set, offline.py serves the point of sale from a local copy when
+    the server can't be reached.
+    """
+    from metrics import get_recorder, instrument     # metrics reads settings from this module
+    from resilience import FaultyBackend, resilient
+
+    kind = setting("backend", "supabase")
+    if kind == "sqlite":
+        backend = create_backend("sqlite", sqlite_path=setting("sqlite_path", "salon.db"))
+    else:
+        backend = create_backend(kind, url=_secret("URL"), key=_secret("KEY"))
+    if faults := setting("faults"):
+        backend = FaultyBackend(backend, faults)
+    hedge = str(setting("hedge_reads", "")).lower() in ("1", "true", "yes")
+    client = resilient(instrument(backend), hedge=hedge, recorder=get_recorder())
+    if mirror := setting("offline_mirror"):
+        from offline import OfflineClient
+        client = OfflineClient(client, mirror)
+    return client
+
+
+# ---------- QUERY CACHE ----------
+class QueryCache:
+    """Per-table read cache with TTL expiry and size-bounded (LRU) eviction.
+
+    Entries are grouped by table so a write can drop a single key or the whole
+    table. A generation counter per table keeps a read that started before an
+    invalidation from storing its (now stale) result.
+    """
+
+    def __init__(self, ttl: float = CACHE_TTL, max_entries: int = CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._tables: dict[str, OrderedDict] = {}
+        self._generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get_or_load(self, table: str, key, loader, ttl: float | None = None):
+        with self._lock:
+            entries = self._tables.setdefault(table, OrderedDict())
+            hit = entries.get(key)
+            if hit is not None and hit[0] > time.monotonic():
+                entries.move_to_end(key)
+                return hit[1]
+            generation = self._generations.get(table, 0)
+
+        value = loader()
+
+        with self._lock:
+            if self._generations.get(table, 0) == generation:
+                entries = self._tables.setdefault(table, OrderedDict())
+                entries[key] = (time.monotonic() + (ttl or self.ttl), value)
+                entries.move_to_end(key)
+                while len(entries) > self.max_entries:
+                    entries.popitem(last=False)
+        return value
+
+    def invalidate(self, table: str, key=None) -> None:
+        with self._lock:
+            self._generations[table] = self._generations.get(table, 0) + 1
+            if key is None:
+                self._tables.pop(table, None)
+            else:
+                self._tables.get(table, {}).pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            for table in list(self._tables):
+                self._generations[table] = self._generations.get(table, 0) + 1
+            self._tables.clear()
+
+
+@st.cache_resource
+def get_cache() -> QueryCache:
+    return QueryCache()
+
+
+def cached_rows(table: str, key, query, page_key: str | None = None) -> list[dict]:
+    """Run `query` (a builder callable) through the cache and return its rows.
+
+    Unbounded selects pass `page_key` (a unique column) so they are read in
+    pages instead of being cut off at PostgREST's max-rows.
+    """
+    if page_key:
+        return get_cache().get_or_load(table, key, lambda: fetch_all(query, page_key))
+    return get_cache().get_or_load(table, key, lambda: query().execute().data or [])
+
+
+def invalidate(table: str, key=None) -> None:
+    get_cache().invalidate(table, key)
+    if table in SNAPSHOT_TABLES:
+        get_snapshots()[table].mark_stale()
+
+
+@st.cache_resource
+def get_executor() -> ThreadPoolExecutor:
+    """Small shared pool for background reads (prefetching)."""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="db")
+
+
+# ---------- CONCURRENT READS ----------
+class Deadline:
+    """Time budget of one page rerun, shared by all of its fan_out calls."""
+
+    def __init__(self, seconds: float = PAGE_DEADLINE):
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+@st.cache_resource
+def get_read_pool() -> ThreadPoolExecutor:
+    """Pool for fan_out; separate from get_executor so prefetch/write-behind can't starve page reads."""
+    return ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix="read")
+
+
+def fan_out(calls: dict[str, Callable], deadline: Deadline | None = None) -> dict:
+    """Run independent reads concurrently and return {name: result}.
+
+    Page latency becomes the slowest read instead of the sum of all of them.
+    The first read to fail re-raises its own exception; reads still running
+    when `deadline` runs out raise DeadlineExceeded. Their threads finish in
+    the background, and whatever they loaded still lands in the cache.
+    """
+    from metrics import bind_rerun, current_rerun    # metrics imports db
+
+    deadline = deadline or Deadline()
+    rerun, pool = current_rerun(), get_read_pool()
+    get_client(), get_cache(), get_snapshots()      # resolve the shared resources here, not on the workers
+
+    def traced(call):
+        with bind_rerun(rerun):
+            return call()
+
+    futures = {pool.submit(traced, call): name for name, call in calls.items()}
+    done, pending = wait(futures, timeout=deadline.remaining(), return_when=FIRST_EXCEPTION)
+    for future in done:
+        if future.exception() is not None:
+            for other in pending:
+                other.cancel()
+            raise future.exception()
+    if pending:
+        for future in pending:
+            future.cancel()
+        slow = ", ".join(sorted(futures[f] for f in pending))
+        raise DeadlineExceeded(f"{slow} did not load within {deadline.seconds:g}s")
+    return {name: future.result() for future, name in futures.items()}
+
+
+def _frame(rows: list[dict]) -> pd.DataFrame:
+    return pd.DataFrame(rows) if rows else pd.DataFrame()
+
+
+# ---------- HELPERS ----------
+def iter_pages(query, key: str | None = "id", page_size: int = FETCH_PAGE) -> Iterator[list[dict]]:
+    """Yield every row of `query()` (a builder callable) a page at a time.
+
+    With a unique `key` each page is a keyset cursor (`key > last seen`), which
+    stays an index range scan however deep it goes. key=None pages with Range
+    (offset) instead, for selects without a unique column; give those a stable
+    order in `query`. page_size must not exceed the server's max-rows.
+    """
+    after, start = None, 0
+    while True:
+        q = query()
+        if key is None:
+            q = q.range(start, start + page_size - 1)
+        else:
+            q = q.order(key).limit(page_size)
+            if after is not None:
+                q = q.gt(key, after)
+        page = q.execute().data or []
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        start += len(page)
+        after = page[-1][key] if key is not None else None
+
+
+def fetch_all(query, key: str | None = "id") -> list[dict]:
+    return [row for page in iter_pages(query, key) for row in page]
+
+
+def iter_table(table: str, columns: str = "*", key: str | None = "id",
+               page_size: int = FETCH_PAGE) -> Iterator[pd.DataFrame]:
+    """A table as a stream of DataFrames, so memory stays bounded by one page."""
+    for page in iter_pages(lambda: get_client().table(table).select(columns), key, page_size):
+        yield pd.DataFrame(page)
+
+
+def read_all(table: str, columns: str = "*", key: str = "id") -> pd.DataFrame:
+    """Every row of `table`, read in FETCH_PAGE keyset pages ordered by the unique `key`."""
+    return _frame(fetch_all(lambda: get_client().table(table).select(columns), key))
+
+
+def bulk_insert(table: str, rows: list[dict]) -> list[dict]:
+    """Insert `rows` in WRITE_BATCH-sized requests; returns the stored rows with their keys."""
+    stored = []
+    for i in range(0, len(rows), WRITE_BATCH):
+        stored += get_client().table(table).insert(rows[i:i + WRITE_BATCH]).execute().data or []
+    if rows:
+        invalidate(table)
+    return stored
+
+
+def bulk_upsert(table: str, rows: list[dict], on_conflict: str = "id") -> int:
+    """Write all `rows` in one request and drop the table's cached reads."""
+    if not rows:
+        return 0
+    get_client().table(table).upsert(rows, on_conflict=on_conflict).execute()
+    invalidate(table)
+    return len(rows)
+
+
+def matching(df: pd.DataFrame, columns: list[str], term: str) -> pd.DataFrame:
+    """Rows where any of `columns` contains `term`, case-insensitively (an `ilike '%term%'` or-filter)."""
+    if not term or df.empty:
+        return df
+    hit = pd.Series(False, index=df.index)
+    for column in columns:
+        hit |= df[column].astype("string").str.contains(term, case=False, regex=False).fillna(False)
+    return df[hit].reset_index(drop=True)
+
+
+# ---------- TABLE SNAPSHOTS ----------
+def _latest(stamps: pd.Series) -> pd.Timestamp | None:
+    latest = pd.to_datetime(stamps, utc=True, format="ISO8601").max() if len(stamps) else pd.NaT
+    return None if pd.isna(latest) else latest
+
+
+def _money(values: pd.Series, decimals: int) -> pd.Series:
+    """float64 values with float32 noise rounded off (31.799999237 -> 31.8).
+
+    Only values within float32 precision of `decimals` move, so a price stored
+    with more decimals than that (1.005) is left as it is.
+    """
+    values = pd.to_numeric(values, errors="coerce").astype("float64")
+    rounded = values.round(decimals)
+    return rounded.where((values - rounded).abs() <= rounded.abs() * 2.0 ** -23, values)
+
+
+def _float32(values: pd.Series, decimals: int) -> pd.Series:
+    values = _money(values, decimals)
+    narrow = values.astype("float32")
+    # A value with more decimals (or digits) than float32 can give back stays float64, column and all
+    exact = narrow.astype("float64").round(decimals).eq(values) | values.isna()
+    return narrow if exact.all() else values
+
+
+def _compact(rows: pd.DataFrame, table: str) -> pd.DataFrame:
+    """The shared layout of a snapshot table: categorical labels and float32 money.
+
+    Text columns keep pandas' default string dtype, which is Arrow-backed
+    when pyarrow is installed.
+    """
+    columns = {c: rows[c].astype("category") for c in SNAPSHOT_CATEGORIES.get(table, []) if c in rows}
+    columns |= {c: _float32(rows[c], decimals) for c, decimals in SNAPSHOT_FLOAT32.get(table, {}).items() if c in rows}
+    return rows.assign(**columns) if columns else rows
+
+
+def _plain(df: pd.DataFrame, table: str) -> pd.DataFrame:
+    """Rows taken from a snapshot with ordinary column types again, for the pages.
+
+    Money goes back to float64 rounded to its stored decimals (float32 keeps ~7
+    significant digits, so that is exact): it is priced, edited and written
+    back. Every money column goes through _money, float32 or not, so a column
+    that was widened somewhere on the way still never writes float32 noise.
+    Labels go back to strings, or the grids would only offer existing brands
+    and categories.
+    """
+    columns = {c: df[c].astype("str") for c in SNAPSHOT_CATEGORIES.get(table, []) if c in df}
+    columns |= {c: _money(df[c], decimals)
+                for c, decimals in SNAPSHOT_FLOAT32.get(table, {}).items() if c in df}
+    return df.assign(**columns) if columns else df
+
+
+class TableSnapshot:
+    """A whole table held in memory and kept current from its UpdatedAt column (sql/009).
+
+    The first read loads every row. After that, at most every DELTA_POLL
+    seconds (and on the first read after a local write), only rows with
+    UpdatedAt at or after the watermark come back, plus the table's
+    DeletedRows tombstones, and both are merged into the frame by key. The
+    watermark is read DELTA_OVERLAP seconds early so a transaction that
+    committed after a later one is not skipped; rows seen twice just merge
+    again. Every RECONCILE_EVERY seconds the table is re-read in full, which
+    also picks up what no trigger saw (TRUNCATE, dataset.py restores).
+    Without a watermark (an empty table) each poll is a full read. A table
+    without the UpdatedAt column (sql/009 not run yet) is noted once
+    (`tracked`) and re-read every CACHE_TTL seconds or after a local write,
+    like a plain cached read.
+
+    One snapshot serves every session of the process. Its frame is compact
+    (see _compact) and never modified in place: a refresh builds the next
+    frame and swaps it in with one assignment, so a reader keeps a consistent
+    frame however long it holds it.
+    """
+
+    def __init__(self, table: str, key: str = "id", clock: Callable[[], float] = time.monotonic):
+        self.table, self.key, self.clock = table, key, clock
+        self._lock = threading.Lock()
+        self._rows: pd.DataFrame | None = None
+        self._updated: pd.Timestamp | None = None   # newest UpdatedAt merged
+        self._deleted: pd.Timestamp | None = None   # newest DeletedAt applied
+        self._polled = self._reconciled = 0.0
+        self._stale = False
+        self.tracked: bool | None = None     # has UpdatedAt; None until a non-empty read shows it
+        self.full_loads = self.delta_loads = self.delta_rows = 0
+        self.bytes = 0      # memory of the current frame
+
+    def frame(self) -> pd.DataFrame:
+        """The current rows, ordered by key.
+
+        A shallow copy: no data is copied, and with copy-on-write a caller that
+        modifies it gets its own columns instead of changing the shared ones.
+        """
+        with self._lock:
+            now = self.clock()
+            poll = DELTA_POLL if self.tracked is not False else CACHE_TTL
+            if self._rows is None or now - self._reconciled >= RECONCILE_EVERY:
+                self._load_all(now)
+            elif (self._stale or now - self._polled >= poll) and self._updated is None:
+                self._load_all(now)     # no watermark to take a delta from: empty, or no UpdatedAt
+            elif self._stale or now - self._polled >= poll:
+                self._load_delta(now)
+            return self._rows.copy(deep=False)
+
+    def mark_stale(self) -> None:
+        """Poll for changes on the next read instead of waiting out DELTA_POLL."""
+        self._stale = True
+
+    def expire(self) -> None:
+        """Re-read the whole table on the next read (no lock: callable from inside a refresh)."""
+        self._reconciled = float("-inf")
+
+    def stats(self) -> dict:
+        rows = self._rows
+        return {"table": self.table, "rows": 0 if rows is None else len(rows), "bytes": self.bytes,
+                "tracked": self.tracked,
+                "full_loads": self.full_loads, "delta_loads": self.delta_loads, "delta_rows": self.delta_rows}
+
+    def _swap(self, rows: pd.DataFrame) -> None:
+        rows = _compact(rows, self.table)
+        self.bytes = int(rows.memory_usage(deep=True).sum())
+        self._rows = rows
+
+    def _load_all(self, now: float) -> None:
+        rows = read_all(self.table, key=self.key)
+        self._swap(rows)
+        if not rows.empty:
+            self.tracked = "UpdatedAt" in rows
+        self._updated = _latest(rows["UpdatedAt"]) if "UpdatedAt" in rows else None
+        self._deleted = self._updated
+        self._polled = self._reconciled = now
+        self._stale = False
+        self.full_loads += 1
+
+    def _load_delta(self, now: float) -> None:
+        client, overlap = get_client(), pd.Timedelta(seconds=DELTA_OVERLAP)
+        since = (self._updated - overlap).isoformat(timespec="microseconds")
+        deleted_since = (self._deleted - overlap).isoformat(timespec="microseconds")
+        changed = _frame(fetch_all(lambda: client.table(self.table).select("*").gte("UpdatedAt", since), self.key))
+        gone = _frame(fetch_all(lambda: client.table("DeletedRows").select("id, RowId, DeletedAt")
+                                .eq("TableName", self.table).gte("DeletedAt", deleted_since)))
+        if not changed.empty or not gone.empty:
+            # Compact before the concat: float32 rows joined with float64 ones would widen the
+            # column and carry the float32 noise along
+            changed, rows = _compact(changed, self.table), self._rows
+            if not gone.empty:
+                rows = rows[~rows[self.key].isin(gone["RowId"])]
+            if not changed.empty:
+                rows = pd.concat([rows[~rows[self.key].isin(changed[self.key])], changed], ignore_index=True)
+            self._swap(rows.sort_values(self.key, ignore_index=True) if not rows.empty else rows)
+            if not gone.empty:
+                self._deleted = max(self._deleted, _latest(gone["DeletedAt"]))
+            if not changed.empty:
+                self._updated = max(self._updated, _latest(changed["UpdatedAt"]))
+        self._polled = now
+        self._stale = False
+        self.delta_loads += 1
+        self.delta_rows += len(changed) + len(gone)
+
+
+@st.cache_resource
+def get_snapshots() -> dict[str, TableSnapshot]:
+    """One snapshot per SNAPSHOT_TABLES table, shared by every session of the process."""
+    return {table: TableSnapshot(table, key) for table, key in SNAPSHOT_TABLES.items()}
+
+
+def snapshot(table: str) -> pd.DataFrame:
+    return get_snapshots()[table].frame()
+
+
+# ---------- CUSTOMERS ----------
+def normalize_search(term: str) -> str:
+    return " ".join(term.split()).lower()
+
+
+def search_customers(term: str, limit: int = SEARCH_LIMIT) -> pd.DataFrame:
+    """Top `limit` customers matching `term`, ranked by the search_customers RPC (sql/001_customer_search.sql)."""
+    term = normalize_search(term)
+    if len(term) < SEARCH_MIN_CHARS and not term.isdigit():
+        return pd.DataFrame()
+    rows = cached_rows("Customers", ("search", term, limit),
+                       lambda: get_client().rpc("search_customers", {"q": term, "max_results": limit}))
+    return _frame(rows)
+
+
+def _customers_page_rows(client, after: int | None, limit: int) -> list[dict]:
+    # Keyset pagination: "CustomerNo > cursor" stays an index range scan no matter
+    # how deep the page is, unlike OFFSET. One extra row tells us if a next page exists.
+    q = client.table("Customers").select("CustomerNo, FullName, Phone, Email").order("CustomerNo").limit(limit + 1)
+    if after is not None:
+        q = q.gt("CustomerNo", after)
+    return q.execute().data or []
+
+
+def get_customers_page(after: int | None = None, limit: int = CUSTOMER_PAGE_SIZE) -> tuple[pd.DataFrame, int | None]:
+    """Return one page of customers after the `after` cursor and the cursor of the next page (None on the last)."""
+    client = get_client()
+    rows = get_cache().get_or_load("Customers", ("page", after, limit),
+                                   lambda: _customers_page_rows(client, after, limit))
+    next_after = rows[limit - 1]["CustomerNo"] if len(rows) > limit else None
+    return _frame(rows[:limit]), next_after
+
+
+def prefetch_customers_page(after: int | None, limit: int = CUSTOMER_PAGE_SIZE) -> None:
+    """Warm the cache with the page after `after` without blocking the rerun."""
+    client, cache = get_client(), get_cache()
+    get_executor().submit(cache.get_or_load, "Customers", ("page", after, limit),
+                          lambda: _customers_page_rows(client, after, limit))
+
+
+def add_customer(full_name, phone, email):
+    """Insert a customer; CustomerNo comes from the database sequence (sql/006_id_allocation.sql)."""
+    res = get_client().table("Customers").insert({
+        "FullName": full_name,
+        "Phone": phone,
+        "Email": email
+    }).execute()
+    invalidate("Customers")
+    return res.data[0]["CustomerNo"] if res.data else None
+
+
+def get_customer_detail(customer_no) -> dict | None:
+    """Customer with its visits (newest first) and each visit's products, in one request.
+
+    Uses PostgREST resource embedding over the Visits -> Customers and
+    ProductsUsed -> Visits foreign keys (sql/005_customer_detail.sql). Cached per
+    customer; every write for that customer drops the entry.
+    """
+    rows = cached_rows("Customers", ("detail", customer_no), lambda: get_client().table("Customers")
+                       .select("*, Visits(*, ProductsUsed(*))")
+                       .eq("CustomerNo", customer_no)
+                       .order("Date", desc=True, foreign_table="Visits"))
+    return rows[0] if rows else None
+
+
+def detail_visits(detail: dict) -> pd.DataFrame:
+    visits = [{k: v for k, v in visit.items() if k != "ProductsUsed"} for visit in detail.get("Visits") or []]
+    return _frame(visits)
+
+
+def detail_products_used(detail: dict, visit_pk) -> pd.DataFrame:
+    for visit in detail.get("Visits") or []:
+        if visit["VisitPK"] == visit_pk:
+            return _frame(visit.get("ProductsUsed") or [])
+    return pd.DataFrame()
+
+
+def update_customer(customer_no, name, phone, email):
+    get_client().table("Customers").update({
+        "FullName": name,
+        "Phone": phone,
+        "Email": email
+    }).eq("CustomerNo", customer_no).execute()
+    invalidate("Customers")
+
+
+# ---------- VISITS ----------
+def add_visit(customer_no, visit_date, service, total_price):
+    vat = float(vat_from_gross(total_price))
+    net_income = round(total_price - vat - VISIT_OVERHEAD, 2)
+    # VisitID is numbered per customer by the visits_assign_visitid trigger
+    res = get_client().table("Visits").insert({
+        "CustomerNo": customer_no,
+        "Date": str(visit_date),
+        "Service": service,
+        "TotalPrice_Gross": total_price,
+        "VAT": vat,
+        "NetIncome": net_income
+    }).execute()
+    invalidate("Customers", ("detail", customer_no))
+    invalidate("DailyRollup")   # maintained by the sql/007 triggers
+    return res.data[0]["VisitPK"] if res.data else None
+
+
+# ---------- PRODUCTS USED ----------
+def add_products_used(customer_no, visit_pk, items: list[tuple[int, float]]) -> int:
+    """Record several products for one visit in a single insert.
+
+    `items` are (Products.id, grams used) pairs; names, colours and cost per
+    gram come from the cached catalog. Visits.NetIncome is kept up to date by
+    the ProductsUsed triggers in sql/004_visit_net_income.sql, so there is no
+    re-aggregation round trip here.
+    """
+    if not items:
+        return 0
+    catalog = get_product_catalog()
+    lines = pd.DataFrame(items, columns=["id", "WeightUsed_g"]).join(catalog, on="id", how="inner")
+    if lines.empty:
+        return 0
+    lines["ProductCost"] = round_cents(lines["WeightUsed_g"].astype(float) * lines["PricePerGram"].astype(float))
+    rows = to_records(lines.rename(columns={"ProductName": "Product"})
+                      .assign(VisitPK=visit_pk)
+                      [["VisitPK", "Product", "Brand", "ColorNo", "WeightUsed_g", "ProductCost"]])
+    get_client().table("ProductsUsed").insert(rows).execute()
+    invalidate("Customers", ("detail", customer_no))
+    invalidate("DailyRollup")
+    return len(rows)
+
+
+# ---------- PRODUCTS ----------
+def get_products_list() -> pd.DataFrame:
+    products = snapshot("Products")
+    if products.empty:
+        return products
+    products = products[["id", "ProductName", "Brand", "ColorNo", "PricePerGram"]]
+    return _plain(products.sort_values(["Brand", "id"], ignore_index=True), "Products")
+
+
+def get_product_catalog() -> pd.DataFrame:
+    """The product list indexed by id, for cost lookups without a round trip."""
+    products = get_products_list()
+    return products.set_index("id") if not products.empty else products
+
+
+def load_products(search_query="") -> pd.DataFrame:
+    return _plain(matching(snapshot("Products"), ["ProductName", "Brand", "ColorNo"], search_query.strip()), "Products")
+
+
+def save_products(original: pd.DataFrame, edited: pd.DataFrame) -> int:
+    """Upsert only the edited Products rows; returns how many changed."""
+    return bulk_upsert("Products", changed_rows(original, edited, "id", PRODUCT_EDIT_COLUMNS))
+
+
+# ---------- SERVICES ----------
+def load_services(search_query="") -> pd.DataFrame:
+    return _plain(matching(snapshot("Services"), ["ServiceName", "Category"], search_query), "Services")
+
+
+def save_services(original: pd.DataFrame, edited: pd.DataFrame) -> int:
+    """Upsert only the edited Services rows; returns how many changed."""
+    return bulk_upsert("Services", changed_rows(original, edited, "id", SERVICE_EDIT_COLUMNS))
+
+
+def add_service(category, name, duration, price, active):
+    get_client().table("Services").insert({
+        "Category": category,
+        "ServiceName": name,
+        "Duration": duration,
+        "Price_EUR": price,
+        "Active": active
+    }).execute()
+    invalidate("Services")
+
+
+# ---------- SALE PRODUCTS ----------
+def load_sale_products(search: str = "") -> pd.DataFrame:
+    return _plain(matching(snapshot("SaleProducts"), ["Name", "Brand"], search), "SaleProducts")
+
+
+def add_sale_product(name: str, brand: str, buy_ex: float, qty: float) -> None:
+    priced = price_products(pd.DataFrame([{
+        "Name": name.strip(),
+        "Brand": brand.strip() if brand else None,
+        "BuyPriceEx": float(buy_ex),
+        "Quantity": float(qty),
+    }]))
+    data = {**to_records(priced)[0], "UpdatedAt": "now()"}
+    get_client().table("SaleProducts").insert(data).execute()
+    invalidate("SaleProducts")
+
+
+def save_sale_products(original: pd.DataFrame, edited: pd.DataFrame) -> int:
+    """Upsert only the edited SaleProducts rows; returns how many changed."""
+    columns = [c for c in SALE_PRODUCT_EDIT_COLUMNS if c in edited.columns]
+    rows = changed_rows(original, edited, "id", columns)
+    if rows:
+        rows = to_records(price_products(pd.DataFrame(rows)).assign(UpdatedAt="now()"))
+    return bulk_upsert("SaleProducts", rows)
+
+
+# ---------- SALE CART ----------
+def save_cart(session_id: str, records: list[dict], client: Backend | None = None) -> None:
+    """Make the session's SaleCart rows match `records` (upsert + delete the rest).
+
+    Takes an explicit client so the write-behind thread in cart.py never touches
+    Streamlit state. Needs the unique index from sql/003_sale_cart.sql.
+    """
+    client = client or get_client()
+    if records:
+        client.table("SaleCart").upsert(records, on_conflict="SessionID,ProductID").execute()
+        kept = [int(r["ProductID"]) for r in records]
+        client.table("SaleCart").delete().eq("SessionID", session_id).not_.in_("ProductID", kept).execute()
+    else:
+        client.table("SaleCart").delete().eq("SessionID", session_id).execute()
+
+
+def checkout(session_id: str) -> dict:
+    """Run the atomic confirm_sale RPC (sql/002_checkout.sql) and return its result."""
+    res = get_client().rpc("confirm_sale", {"p_session_id": session_id}).execute()
+    invalidate("SaleProducts")
+    invalidate("DailyRollup")
+    return res.data or {"ok": False, "sale_id": None, "errors": [{"error": "No response from checkout"}]}
+
+
+def describe_checkout_error(err: dict) -> str:
+    if "product_id" not in err:
+        return err.get("error", "Checkout failed")
+    return (f"{err['error']} for {err.get('name') or err['product_id']} "
+            f"(requested {float(err['requested']):g}, available {float(err['available']):g})")
+
+
+def confirm_sell(session_id: str, password: str) -> str | None:
+    """Checkout the session's persisted SaleCart rows (flush a SessionCart first)."""
+    if password != st.secrets.get("app_password"):
+        return "Incorrect password"
+    # Not retried: a lost response after a committed sale must not sell twice
+    result = checkout(session_id)
+    if result.get("ok"):
+        return None
+    return "  \n".join(describe_checkout_error(e) for e in result.get("errors", []))
+
+
+# ---------- ANALYTICS ----------
+def get_rollup_report(start, end, grain: str = "month") -> dict:
+    """Totals per period and kind plus per-service totals, aggregated from DailyRollup (sql/007)."""
+    params = {"p_from": str(start), "p_to": str(end), "p_grain": grain}
+    return get_cache().get_or_load(
+        "DailyRollup", ("report", str(start), str(end), grain),
+        lambda: get_client().rpc("rollup_report", params).execute().data or {"periods": [], "services": []},
+    )
+
+
+def rebuild_daily_rollup() -> int:
+    """Recompute DailyRollup from Visits and Sales on the server; returns its row count."""
+    res = get_client().rpc("rebuild_daily_rollup", {}).execute()
+    invalidate("DailyRollup")
+    return int(res.data or 0)
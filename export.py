@@ -0,0 +1,123 @@
+"""Streaming export of Visits, ProductsUsed and SaleProducts for accounting and backups.
+
+    python export.py                                  # all three as CSV into ./export
+    python export.py Visits --format parquet --from 2025-01-01 --to 2025-12-31
+    python export.py --out /backups/2025-06-30 --format parquet
+
+Tables are read with db.iter_pages (keyset pages of FETCH_PAGE rows) and each
+page is appended to the output file as soon as it arrives, so memory stays at
+one page however large the table is. Columns have fixed dtypes, so every
+Parquet row group has the same schema and a CSV column never changes type.
+"""
+import argparse
+import time
+from pathlib import Path
+from typing import Callable, Iterator
+
+import pandas as pd
+
+# Export columns and dtypes, in table order
+EXPORTS = {
+    "Visits": ("VisitPK", {
+        "VisitPK": "Int64", "CustomerNo": "Int64", "VisitID": "Int64", "Date": "string", "Service": "string",
+        "TotalPrice_Gross": "float64", "VAT": "float64", "NetIncome": "float64"}),
+    "ProductsUsed": ("ProductUsedPK", {
+        "ProductUsedPK": "Int64", "VisitPK": "Int64", "ProductPK": "Int64", "Product": "string",
+        "Brand": "string", "ColorNo": "string", "WeightUsed_g": "float64", "ProductCost": "float64"}),
+    "SaleProducts": ("id", {
+        "id": "Int64", "Name": "string", "Brand": "string", "BuyPriceEx": "float64", "BuyPriceInc": "float64",
+        "SellPriceEx": "float64", "SellPriceInc": "float64", "ProfitAbs": "float64", "Quantity": "float64",
+        "UpdatedAt": "string"}),
+}
+FORMATS = {"csv": ".csv", "parquet": ".parquet"}
+
+
+def _typed(page: pd.DataFrame, dtypes: dict[str, str]) -> pd.DataFrame:
+    page = page.reindex(columns=list(dtypes))
+    return pd.DataFrame({c: pd.array(page[c].astype(object).where(page[c].notna(), None), dtype=t)
+                         for c, t in dtypes.items()})
+
+
+def export_pages(table: str, start=None, end=None) -> Iterator[pd.DataFrame]:
+    """Typed pages of an export table; Visits can be limited to a date range."""
+    from db import get_client, iter_pages     # db needs streamlit; keep `--help` light
+
+    key, dtypes = EXPORTS[table]
+
+    def query():
+        q = get_client().table(table).select(", ".join(dtypes))
+        if table == "Visits" and start:
+            q = q.gte("Date", str(start))
+        if table == "Visits" and end:
+            q = q.lte("Date", str(end))
+        return q
+
+    for page in iter_pages(query, key):
+        yield _typed(pd.DataFrame(page), dtypes)
+
+
+def write_csv(pages: Iterator[pd.DataFrame], path: Path) -> int:
+    rows = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        for page in pages:
+            page.to_csv(f, index=False, header=rows == 0)
+            rows += len(page)
+    return rows
+
+
+def write_parquet(pages: Iterator[pd.DataFrame], path: Path, dtypes: dict[str, str]) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow); use --format csv instead.")
+    schema = pa.Schema.from_pandas(_typed(pd.DataFrame(), dtypes), preserve_index=False)
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for page in pages:
+            writer.write_table(pa.Table.from_pandas(page, schema=schema, preserve_index=False))
+            rows += len(page)
+    return rows
+
+
+def export_table(table: str, out_dir: Path, fmt: str = "csv", start=None, end=None,
+                 on_page: Callable[[int], None] | None = None) -> tuple[Path, int]:
+    """Write one table to `out_dir/<table>.<fmt>`; returns the path and row count."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    path = out_dir / f"{table}{FORMATS[fmt]}"
+    tmp = path.with_name(path.name + ".part")     # a failed export never leaves a half file behind
+
+    def pages():
+        done = 0
+        for page in export_pages(table, start, end):
+            done += len(page)
+            if on_page:
+                on_page(done)
+            yield page
+
+    rows = write_csv(pages(), tmp) if fmt == "csv" else write_parquet(pages(), tmp, EXPORTS[table][1])
+    tmp.replace(path)
+    return path, rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("tables", nargs="*", metavar="TABLE",
+                        help=f"tables to export (default: {', '.join(EXPORTS)})")
+    parser.add_argument("--format", choices=list(FORMATS), default="csv")
+    parser.add_argument("--out", type=Path, default=Path("export"), help="output directory")
+    parser.add_argument("--from", dest="start", help="first visit date (Visits only), YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", help="last visit date (Visits only), YYYY-MM-DD")
+    args = parser.parse_args()
+    if unknown := [t for t in args.tables if t not in EXPORTS]:
+        parser.error(f"unknown table(s): {', '.join(unknown)}")
+
+    for table in args.tables or list(EXPORTS):
+        started = time.perf_counter()
+        path, rows = export_table(table, args.out, args.format, args.start, args.end,
+                                  on_page=lambda n: print(f"\r{table}: {n:,} rows", end="", flush=True))
+        print(f"\r✅ {table}: {rows:,} rows -> {path} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
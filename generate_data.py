@@ -0,0 +1,237 @@
+"""Synthetic salon data at production-like volume, for benchmarks and local runs.
+
+    python generate_data.py                      # ~100k customers, 1M visits, 3M products used
+    python generate_data.py --scale 0.01 --sqlite bench.db
+
+Everything is generated column-wise with numpy and written with
+SQLiteBackend.bulk_load, so the full-size dataset loads in well under a minute.
+Derived columns are computed the way the app/SQL computes them (VisitID per
+customer, LastVisitID, ProductCost, NetIncome, retail sell prices, DailyRollup),
+so the result looks exactly like data entered through the pages.
+"""
+import argparse
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from pricing import VISIT_OVERHEAD, price_products, round_cents, vat_from_gross
+from rollup import build_daily_rollup
+
+# ---------- SIZES (scale = 1) ----------
+SIZES = {
+    "Customers": 100_000,
+    "Visits": 1_000_000,
+    "ProductsUsed": 3_000_000,
+    "Products": 2_000,
+    "Services": 2_000,
+    "SaleProducts": 3_000,
+}
+FIRST_CUSTOMER_NO = 7394          # sql/006_id_allocation.sql
+FIRST_VISIT_DATE = date(2019, 1, 1)
+LOAD_ORDER = ["Products", "Services", "SaleProducts", "Customers", "Visits", "ProductsUsed", "DailyRollup"]
+
+FIRST_NAMES = ["Anna", "Maria", "Laura", "Emilia", "Sofia", "Aino", "Helmi", "Olivia", "Ella", "Noora",
+               "Sara", "Julia", "Mia", "Iida", "Venla", "Elina", "Satu", "Minna", "Sahar", "Leila",
+               "Mikko", "Juha", "Timo", "Antti", "Ali", "Omar", "Daniel", "Jussi", "Pekka", "Ville"]
+LAST_NAMES = ["Korhonen", "Virtanen", "Mäkinen", "Nieminen", "Mäkelä", "Hämäläinen", "Laine", "Heikkinen",
+              "Koskinen", "Järvinen", "Lehtonen", "Lehtinen", "Saarinen", "Salminen", "Heinonen",
+              "Niemi", "Ahmadi", "Hosseini", "Karimi", "Smith", "Johansson", "Andersson", "Nguyen"]
+EMAIL_DOMAINS = ["gmail.com", "outlook.com", "hotmail.com", "yahoo.com", "elisanet.fi"]
+COLOR_BRANDS = ["Wella", "L'Oréal", "Schwarzkopf", "Goldwell", "Matrix", "Redken", "Davines", "Joico"]
+COLOR_LINES = ["Koleston Perfect", "Majirel", "Igora Royal", "Topchic", "SoColor", "Shades EQ",
+               "Mask", "Lumishine", "Illumina", "Inoa", "Blondor", "Color Touch"]
+SERVICE_CATEGORIES = {
+    "Cut": (30, 45.0), "Color": (90, 95.0), "Highlights": (120, 140.0), "Balayage": (180, 220.0),
+    "Treatment": (45, 55.0), "Styling": (45, 50.0), "Perm": (120, 120.0), "Brows & Lashes": (30, 35.0),
+}
+RETAIL_BRANDS = ["Kérastase", "Olaplex", "Moroccanoil", "Davines", "Redken", "Kevin.Murphy", "Wella", "Aveda"]
+RETAIL_ITEMS = ["Shampoo", "Conditioner", "Hair Mask", "Oil", "Serum", "Heat Protect", "Dry Shampoo",
+                "Texture Spray", "Hairspray", "Styling Cream", "Leave-in", "Brush", "Comb", "Clip Set"]
+
+
+def _pick(rng: np.random.Generator, values: list, n: int) -> np.ndarray:
+    return np.asarray(values, dtype=object)[rng.integers(0, len(values), n)]
+
+
+def _digits(rng: np.random.Generator, n: int, width: int) -> np.ndarray:
+    return pd.Series(rng.integers(0, 10 ** width, n)).astype(str).str.zfill(width).to_numpy()
+
+
+# ---------- CATALOGS ----------
+def gen_products(rng: np.random.Generator, n: int) -> pd.DataFrame:
+    level = rng.integers(1, 11, n)
+    tone = rng.integers(0, 10, n)
+    package_g = rng.choice([60.0, 100.0, 500.0, 1000.0], n, p=[0.6, 0.25, 0.1, 0.05])
+    package_price = round_cents(package_g * rng.uniform(0.08, 0.35, n))
+    return pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "ProductName": _pick(rng, COLOR_LINES, n),
+        "Brand": _pick(rng, COLOR_BRANDS, n),
+        "ColorNo": [f"{lv}/{t}" for lv, t in zip(level, tone)],
+        "PackageWeight_g": package_g,
+        "PackagePrice": package_price,
+        "PricePerGram": np.round(package_price / package_g, 4),
+        "Quantity": rng.integers(0, 40, n).astype(float),
+    })
+
+
+def gen_services(rng: np.random.Generator, n: int) -> pd.DataFrame:
+    categories = list(SERVICE_CATEGORIES)
+    category = _pick(rng, categories, n)
+    base_duration = np.array([SERVICE_CATEGORIES[c][0] for c in category], dtype=float)
+    base_price = np.array([SERVICE_CATEGORIES[c][1] for c in category], dtype=float)
+    lengths = _pick(rng, ["Short", "Medium", "Long", "Extra long"], n)
+    return pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "Category": category,
+        "ServiceName": [f"{c} – {ln} #{i}" for i, (c, ln) in enumerate(zip(category, lengths), start=1)],
+        "Duration": base_duration + 15 * rng.integers(0, 4, n),
+        "Price_EUR": np.round(base_price * rng.uniform(0.8, 1.6, n) * 2) / 2,
+        "Active": (rng.random(n) < 0.9).astype(int),
+    })
+
+
+def gen_sale_products(rng: np.random.Generator, n: int) -> pd.DataFrame:
+    sizes = _pick(rng, ["50 ml", "100 ml", "250 ml", "500 ml", "1000 ml"], n)
+    df = pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "Name": [f"{item} {size} #{i}" for i, (item, size)
+                 in enumerate(zip(_pick(rng, RETAIL_ITEMS, n), sizes), start=1)],
+        "Brand": _pick(rng, RETAIL_BRANDS, n),
+        "BuyPriceEx": round_cents(rng.uniform(3.0, 40.0, n)),
+        "Quantity": rng.integers(0, 60, n).astype(float),
+    })
+    df = price_products(df)
+    df["UpdatedAt"] = pd.Timestamp.now(tz="UTC").isoformat(timespec="microseconds")
+    return df
+
+
+# ---------- CUSTOMERS & HISTORY ----------
+def gen_customers(rng: np.random.Generator, n: int) -> pd.DataFrame:
+    first = _pick(rng, FIRST_NAMES, n)
+    last = _pick(rng, LAST_NAMES, n)
+    numbers = np.arange(FIRST_CUSTOMER_NO, FIRST_CUSTOMER_NO + n)
+    email = pd.Series(first).str.lower() + "." + pd.Series(last).str.lower() + numbers.astype(str) \
+        + "@" + pd.Series(_pick(rng, EMAIL_DOMAINS, n))
+    email[rng.random(n) < 0.15] = None
+    return pd.DataFrame({
+        "CustomerNo": numbers,
+        "FullName": pd.Series(first) + " " + pd.Series(last),
+        "Phone": "04" + pd.Series(rng.integers(0, 10, n)).astype(str) + " " + pd.Series(_digits(rng, n, 7)),
+        "Email": email.to_numpy(dtype=object),
+        "LastVisitID": 0,
+    })
+
+
+def gen_visits(rng: np.random.Generator, n: int, customers: pd.DataFrame, services: pd.DataFrame) -> pd.DataFrame:
+    # Regulars visit far more often than walk-ins: skewed per-customer weights
+    weights = rng.gamma(0.6, size=len(customers))
+    owner = rng.choice(customers["CustomerNo"].to_numpy(), size=n, p=weights / weights.sum())
+    days = (date.today() - FIRST_VISIT_DATE).days
+    visit_date = np.datetime64(FIRST_VISIT_DATE) + rng.integers(0, days, n).astype("timedelta64[D]")
+    service = rng.integers(0, len(services), n)
+
+    df = pd.DataFrame({"CustomerNo": owner, "Date": visit_date})
+    df["Service"] = services["ServiceName"].to_numpy()[service]
+    gross = services["Price_EUR"].to_numpy()[service]
+    df["TotalPrice_Gross"] = gross
+    df = df.sort_values(["CustomerNo", "Date"], kind="stable", ignore_index=True)
+    df.insert(0, "VisitPK", np.arange(1, n + 1))
+    df.insert(2, "VisitID", df.groupby("CustomerNo").cumcount().to_numpy() + 1)
+    df["Date"] = df["Date"].dt.strftime("%Y-%m-%d")
+    df["VAT"] = vat_from_gross(df["TotalPrice_Gross"])
+    return df
+
+
+def gen_products_used(rng: np.random.Generator, n: int, visits: pd.DataFrame, products: pd.DataFrame) -> pd.DataFrame:
+    product = rng.integers(0, len(products), n)
+    grams = np.round(rng.gamma(2.0, 12.0, n) + 5.0, 1)
+    df = pd.DataFrame({
+        "ProductUsedPK": np.arange(1, n + 1),
+        "VisitPK": np.sort(rng.integers(1, len(visits) + 1, n)),
+        "ProductPK": products["id"].to_numpy()[product],
+        "Product": products["ProductName"].to_numpy()[product],
+        "Brand": products["Brand"].to_numpy()[product],
+        "ColorNo": products["ColorNo"].to_numpy()[product],
+        "WeightUsed_g": grams,
+    })
+    df["ProductCost"] = round_cents(grams * products["PricePerGram"].to_numpy()[product])
+    return df
+
+
+def generate(scale: float = 1.0, seed: int = 42) -> dict[str, pd.DataFrame]:
+    """All app tables as DataFrames, keyed by table name and consistent with each other."""
+    rng = np.random.default_rng(seed)
+    n = {table: max(1, int(size * scale)) for table, size in SIZES.items()}
+
+    products = gen_products(rng, n["Products"])
+    services = gen_services(rng, n["Services"])
+    customers = gen_customers(rng, n["Customers"])
+    visits = gen_visits(rng, n["Visits"], customers, services)
+    used = gen_products_used(rng, n["ProductsUsed"], visits, products)
+
+    # Same arithmetic as add_visit + the ProductsUsed triggers (sql/004)
+    cost = used.groupby("VisitPK")["ProductCost"].sum().reindex(visits["VisitPK"], fill_value=0.0)
+    visits["NetIncome"] = round_cents(visits["TotalPrice_Gross"] - visits["VAT"] - VISIT_OVERHEAD - cost.to_numpy())
+    last = visits.groupby("CustomerNo")["VisitID"].max()
+    customers["LastVisitID"] = customers["CustomerNo"].map(last).fillna(0).astype(int)
+    # bulk_load skips the UpdatedAt triggers of sql/009 as well
+    stamp = pd.Timestamp.now(tz="UTC").isoformat(timespec="microseconds")
+    for df in (products, services, customers):
+        df["UpdatedAt"] = stamp
+
+    return {
+        "Products": products,
+        "Services": services,
+        "SaleProducts": gen_sale_products(rng, n["SaleProducts"]),
+        "Customers": customers,
+        "Visits": visits,
+        "ProductsUsed": used,
+        # bulk_load skips the rollup triggers, so backfill it like rollup.py does
+        "DailyRollup": build_daily_rollup(visits),
+    }
+
+
+# ---------- LOADING ----------
+def _rows(df: pd.DataFrame):
+    # Column-wise tolist() turns numpy scalars into plain Python values
+    columns = [df[c].astype(object).where(df[c].notna(), None).tolist() for c in df.columns]
+    return zip(*columns)
+
+
+def load_sqlite(backend, frames: dict[str, pd.DataFrame], log=print) -> None:
+    """Bulk-load generated frames into an (empty) SQLiteBackend."""
+    for table in LOAD_ORDER:
+        df = frames[table]
+        started = time.perf_counter()
+        backend.bulk_load(table, list(df.columns), _rows(df))
+        log(f"  {table:<13} {len(df):>10,} rows  {time.perf_counter() - started:6.1f}s")
+    backend.conn.execute("ANALYZE")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for every table size (default 1.0)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--sqlite", default="salon.db", help="SQLite file to create (must not hold data yet)")
+    args = parser.parse_args()
+
+    from sqlite_backend import SQLiteBackend
+
+    backend = SQLiteBackend(args.sqlite)
+    occupied = [t for t in LOAD_ORDER if backend.conn.execute(f'SELECT 1 FROM "{t}" LIMIT 1').fetchone()]
+    if occupied:
+        raise SystemExit(f"{args.sqlite} already has data in {', '.join(occupied)}; use a new file.")
+
+    started = time.perf_counter()
+    frames = generate(args.scale, args.seed)
+    print(f"Generated in {time.perf_counter() - started:.1f}s; loading into {args.sqlite}")
+    load_sqlite(backend, frames)
+    backend.close()
+    print(f"✅ Done in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
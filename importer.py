@@ -0,0 +1,311 @@
+"""Bulk import of customers, color products, services and retail products.
+
+Files are read in CHUNK_ROWS chunks (CSV via pandas, XLSX via openpyxl's
+read-only mode), so memory stays flat however long the file is. Each chunk is
+normalized and validated with vectorized pandas operations, derived columns
+are filled in (PricePerGram, retail sell prices), rows are matched against the
+existing table and the file itself by a natural key, and the result is written
+with db.bulk_insert / db.bulk_upsert in WRITE_BATCH-sized requests.
+"""
+import csv
+import io
+from dataclasses import dataclass
+from typing import Callable, Iterator
+
+import numpy as np
+import pandas as pd
+
+from changeset import to_records
+from db import WRITE_BATCH, bulk_insert, bulk_upsert, read_all
+from pricing import price_products
+
+CHUNK_ROWS = 5000           # rows read and validated at a time
+MAX_REPORTED_ERRORS = 1000  # invalid rows kept for the error report
+EMAIL_RE = r"^[^@\s]+@[^@\s]+\.[^@\s]+$"
+TRUE_WORDS = {"1", "true", "yes", "y", "x", "kyllä", "active"}
+FALSE_WORDS = {"0", "false", "no", "n", "ei", "inactive"}
+
+
+# ---------- VECTORIZED CLEANERS ----------
+def _text(s: pd.Series) -> pd.Series:
+    """Trimmed, single-spaced strings; blanks become None."""
+    s = s.astype("string").str.strip().str.replace(r"\s+", " ", regex=True)
+    return s.where(s.notna() & (s != ""), None)
+
+
+def _number(s: pd.Series) -> pd.Series:
+    """Numbers from '12,50', '1 234.5', '€ 9.90' style cells; unparseable -> NaN."""
+    s = s.astype("string").str.replace(r"[\s€]", "", regex=True).str.replace(",", ".", regex=False)
+    return pd.to_numeric(s, errors="coerce")
+
+
+def _flag(s: pd.Series, default: bool) -> pd.Series:
+    s = s.astype("string").str.strip().str.lower()
+    return pd.Series(np.where(s.isin(FALSE_WORDS), False, np.where(s.isin(TRUE_WORDS), True, default)),
+                     index=s.index, dtype=bool)
+
+
+def _lower(s: pd.Series) -> pd.Series:
+    return s.fillna("").astype(str).str.lower()
+
+
+def _fail(errors: pd.Series, mask: pd.Series, reason: str) -> pd.Series:
+    """Record `reason` for rows in `mask` that don't have an error yet."""
+    return errors.mask(mask & (errors == ""), reason)
+
+
+# ---------- TARGETS ----------
+@dataclass(frozen=True)
+class Target:
+    table: str
+    id_column: str
+    columns: list[str]                              # written to the table
+    aliases: dict[str, str]                         # normalized header -> column
+    normalize: Callable[[pd.DataFrame], tuple[pd.DataFrame, pd.Series]]
+    key: Callable[[pd.DataFrame], pd.Series]        # natural key used to dedupe
+
+
+def _customers(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.Series]:
+    out = pd.DataFrame({c: _text(df[c]) if c in df else None for c in ["FullName", "Phone", "Email"]},
+                       index=df.index)
+    out["Email"] = out["Email"].str.lower()
+    errors = pd.Series("", index=df.index)
+    errors = _fail(errors, out["FullName"].isna(), "Full name is missing")
+    errors = _fail(errors, out["Email"].notna() & ~out["Email"].fillna("").str.match(EMAIL_RE), "Invalid email")
+    return out, errors
+
+
+def _customer_key(df: pd.DataFrame) -> pd.Series:
+    # Phone digits identify a customer best, then email, then the name
+    digits = df["Phone"].fillna("").astype(str).str.replace(r"\D", "", regex=True)
+    email = _lower(df["Email"])
+    return pd.Series(np.where(digits.str.len() >= 6, "p:" + digits,
+                              np.where(email != "", "e:" + email, "n:" + _lower(df["FullName"]))),
+                     index=df.index)
+
+
+def _products(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.Series]:
+    out = pd.DataFrame(index=df.index)
+    for c in ["ProductName", "Brand", "ColorNo"]:
+        out[c] = _text(df[c]) if c in df else None
+    for c in ["PackageWeight_g", "PackagePrice", "Quantity"]:
+        out[c] = _number(df[c]) if c in df else np.nan
+    out["Quantity"] = out["Quantity"].fillna(0.0)
+    out["PricePerGram"] = np.round(out["PackagePrice"] / out["PackageWeight_g"].where(out["PackageWeight_g"] > 0), 4)
+    errors = pd.Series("", index=df.index)
+    errors = _fail(errors, out["ProductName"].isna(), "Product name is missing")
+    errors = _fail(errors, ~(out["PackageWeight_g"] > 0), "Package weight must be a number > 0")
+    errors = _fail(errors, ~(out["PackagePrice"] >= 0), "Package price must be a number >= 0")
+    return out, errors
+
+
+def _product_key(df: pd.DataFrame) -> pd.Series:
+    return _lower(df["Brand"]) + "|" + _lower(df["ProductName"]) + "|" + _lower(df["ColorNo"])
+
+
+def _services(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.Series]:
+    out = pd.DataFrame(index=df.index)
+    out["Category"] = _text(df["Category"]) if "Category" in df else None
+    out["ServiceName"] = _text(df["ServiceName"]) if "ServiceName" in df else None
+    out["Duration"] = _number(df["Duration"]) if "Duration" in df else np.nan
+    out["Price_EUR"] = _number(df["Price_EUR"]) if "Price_EUR" in df else np.nan
+    out["Active"] = _flag(df["Active"], True) if "Active" in df else True
+    errors = pd.Series("", index=df.index)
+    errors = _fail(errors, out["ServiceName"].isna(), "Service name is missing")
+    errors = _fail(errors, ~(out["Price_EUR"] >= 0), "Price must be a number >= 0")
+    errors = _fail(errors, out["Duration"] < 0, "Duration must be >= 0")
+    return out, errors
+
+
+def _service_key(df: pd.DataFrame) -> pd.Series:
+    return _lower(df["Category"]) + "|" + _lower(df["ServiceName"])
+
+
+def _sale_products(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.Series]:
+    out = pd.DataFrame(index=df.index)
+    out["Name"] = _text(df["Name"]) if "Name" in df else None
+    out["Brand"] = _text(df["Brand"]) if "Brand" in df else None
+    out["BuyPriceEx"] = _number(df["BuyPriceEx"]) if "BuyPriceEx" in df else np.nan
+    out["Quantity"] = (_number(df["Quantity"]) if "Quantity" in df else pd.Series(np.nan, index=df.index)).fillna(0.0)
+    errors = pd.Series("", index=df.index)
+    errors = _fail(errors, out["Name"].isna(), "Name is missing")
+    errors = _fail(errors, ~(out["BuyPriceEx"] >= 0), "Buy price (excl. VAT) must be a number >= 0")
+    out = price_products(out.fillna({"BuyPriceEx": 0.0})).assign(UpdatedAt="now()")
+    return out, errors
+
+
+def _sale_product_key(df: pd.DataFrame) -> pd.Series:
+    return _lower(df["Brand"]) + "|" + _lower(df["Name"])
+
+
+TARGETS = {
+    "Customers": Target(
+        "Customers", "CustomerNo", ["FullName", "Phone", "Email"],
+        {"fullname": "FullName", "name": "FullName", "customer": "FullName", "nimi": "FullName",
+         "phone": "Phone", "phonenumber": "Phone", "mobile": "Phone", "puhelin": "Phone",
+         "email": "Email", "emailaddress": "Email", "sahkoposti": "Email"},
+        _customers, _customer_key),
+    "Products (color)": Target(
+        "Products", "id", ["ProductName", "Brand", "ColorNo", "PackageWeight_g", "PackagePrice", "PricePerGram", "Quantity"],
+        {"productname": "ProductName", "product": "ProductName", "name": "ProductName", "brand": "Brand",
+         "colorno": "ColorNo", "color": "ColorNo", "shade": "ColorNo", "packageweightg": "PackageWeight_g",
+         "packageweight": "PackageWeight_g", "weight": "PackageWeight_g", "grams": "PackageWeight_g",
+         "packageprice": "PackagePrice", "price": "PackagePrice", "quantity": "Quantity", "qty": "Quantity",
+         "stock": "Quantity"},
+        _products, _product_key),
+    "Services": Target(
+        "Services", "id", ["Category", "ServiceName", "Duration", "Price_EUR", "Active"],
+        {"category": "Category", "servicename": "ServiceName", "service": "ServiceName", "name": "ServiceName",
+         "duration": "Duration", "minutes": "Duration", "priceeur": "Price_EUR", "price": "Price_EUR",
+         "active": "Active"},
+        _services, _service_key),
+    "Retail products": Target(
+        "SaleProducts", "id",
+        ["Name", "Brand", "BuyPriceEx", "BuyPriceInc", "SellPriceEx", "SellPriceInc", "ProfitAbs", "Quantity",
+         "UpdatedAt"],
+        {"name": "Name", "product": "Name", "productname": "Name", "brand": "Brand", "buypriceex": "BuyPriceEx",
+         "buyprice": "BuyPriceEx", "cost": "BuyPriceEx", "quantity": "Quantity", "qty": "Quantity",
+         "stock": "Quantity"},
+        _sale_products, _sale_product_key),
+}
+
+
+# ---------- READING ----------
+def _header_key(name) -> str:
+    return "".join(ch for ch in str(name).lower() if ch.isalnum())
+
+
+def map_headers(df: pd.DataFrame, target: Target) -> pd.DataFrame:
+    """Rename file columns to table columns ('Full name', 'full_name' -> FullName)."""
+    renames = {}
+    for column in df.columns:
+        key = _header_key(column)
+        renames[column] = target.aliases.get(key) or next(
+            (c for c in target.columns if _header_key(c) == key), column)
+    return df.rename(columns=renames)
+
+
+def _sniff_separator(sample: str) -> str:
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=",;\t|").delimiter
+    except csv.Error:
+        return ","
+
+
+def read_chunks(file, filename: str, chunk_rows: int = CHUNK_ROWS) -> Iterator[tuple[pd.DataFrame, float]]:
+    """Yield (chunk of string cells, fraction of the file read); `Row` is the spreadsheet row number."""
+    if filename.lower().endswith((".xlsx", ".xlsm")):
+        yield from _read_xlsx(file, chunk_rows)
+        return
+    if isinstance(file, (str, bytes)):
+        file = io.BytesIO(file.encode("utf-8") if isinstance(file, str) else file)
+    start = file.tell()
+    size = max(file.seek(0, io.SEEK_END) - start, 1)
+    file.seek(start)
+    separator = _sniff_separator(file.read(8192).decode("utf-8-sig", errors="ignore"))
+    file.seek(start)
+    # Decoded as pandas reads it: only the parser's buffer and one chunk are in memory at a time
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", errors="replace", newline="")
+    first_row = 2   # row 1 is the header
+    try:
+        for chunk in pd.read_csv(text, sep=separator, dtype=str, keep_default_na=False, chunksize=chunk_rows):
+            chunk.insert(0, "Row", np.arange(first_row, first_row + len(chunk)))
+            first_row += len(chunk)
+            yield chunk, min((file.tell() - start) / size, 1.0)
+    finally:
+        text.detach()   # leave the caller's file open
+
+
+def _read_xlsx(file, chunk_rows: int) -> Iterator[tuple[pd.DataFrame, float]]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RuntimeError("Reading .xlsx files needs openpyxl (pip install openpyxl); or save the sheet as CSV.")
+    sheet = load_workbook(file, read_only=True, data_only=True).active
+    rows = sheet.iter_rows(values_only=True)
+    header = [str(h) if h is not None else f"column{i}" for i, h in enumerate(next(rows, ()))]
+    total = max((sheet.max_row or 0) - 1, 1)
+    batch, row_no = [], 2
+    for values in rows:
+        if any(v is not None and str(v).strip() != "" for v in values):
+            batch.append([row_no, *("" if v is None else str(v) for v in values[:len(header)])])
+        row_no += 1
+        if len(batch) >= chunk_rows:
+            yield pd.DataFrame(batch, columns=["Row", *header]), min((row_no - 2) / total, 1.0)
+            batch = []
+    if batch:
+        yield pd.DataFrame(batch, columns=["Row", *header]), 1.0
+
+
+# ---------- IMPORT ----------
+def prepare(chunk: pd.DataFrame, target: Target) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """(valid rows with a `_key` column, invalid rows with `Row` and `Error`)."""
+    df = map_headers(chunk, target)
+    clean, errors = target.normalize(df)
+    bad = errors != ""
+    invalid = pd.DataFrame({"Row": df.loc[bad, "Row"], "Error": errors[bad]})
+    valid = clean[~bad].copy()
+    valid["_key"] = target.key(valid)
+    return valid, invalid
+
+
+def missing_columns(chunk: pd.DataFrame, target: Target) -> list[str]:
+    """Required columns the file doesn't have (checked on the first chunk)."""
+    required = {"Customers": ["FullName"], "Products": ["ProductName", "PackageWeight_g", "PackagePrice"],
+                "Services": ["ServiceName", "Price_EUR"], "SaleProducts": ["Name", "BuyPriceEx"]}[target.table]
+    present = set(map_headers(chunk.head(0), target).columns)
+    return [c for c in required if c not in present]
+
+
+def existing_keys(target: Target) -> dict[str, object]:
+    """Natural key -> primary key of every row already in the table."""
+    existing = read_all(target.table, ", ".join([target.id_column, *target.columns]), target.id_column)
+    if existing.empty:
+        return {}
+    keys = target.key(existing)
+    return dict(zip(keys[::-1], existing[target.id_column][::-1]))     # first row wins on duplicates
+
+
+def run_import(file, filename: str, target_name: str, update_existing: bool = False,
+               on_progress: Callable[[float, dict], None] | None = None) -> dict:
+    """Stream `file` into the target table; returns counts and the invalid rows."""
+    target = TARGETS[target_name]
+    known = existing_keys(target)
+    summary = {"read": 0, "inserted": 0, "updated": 0, "duplicates": 0, "invalid": 0}
+    errors, reported = [], 0
+    first = True
+    for chunk, fraction in read_chunks(file, filename):
+        if first:
+            if missing := missing_columns(chunk, target):
+                raise ValueError(f"Missing column(s): {', '.join(missing)}")
+            first = False
+        summary["read"] += len(chunk)
+        valid, invalid = prepare(chunk, target)
+        summary["invalid"] += len(invalid)
+        if reported < MAX_REPORTED_ERRORS and not invalid.empty:
+            errors.append(invalid.head(MAX_REPORTED_ERRORS - reported))
+            reported += len(errors[-1])
+
+        # Later rows of the file win over earlier ones with the same key
+        deduped = valid.drop_duplicates("_key", keep="last")
+        summary["duplicates"] += len(valid) - len(deduped)
+        ids = deduped["_key"].map(known)
+        new, matched = deduped[ids.isna()], deduped[ids.notna()]
+
+        stored = bulk_insert(target.table, to_records(new[target.columns]))
+        if stored:
+            stored_df = pd.DataFrame(stored)
+            known.update(zip(target.key(stored_df), stored_df[target.id_column]))
+        summary["inserted"] += len(stored)
+
+        if update_existing and not matched.empty:
+            rows = to_records(matched[target.columns].assign(**{target.id_column: ids[ids.notna()]}))
+            for i in range(0, len(rows), WRITE_BATCH):
+                summary["updated"] += bulk_upsert(target.table, rows[i:i + WRITE_BATCH], on_conflict=target.id_column)
+        else:
+            summary["duplicates"] += len(matched)
+        if on_progress:
+            on_progress(fraction, summary)
+
+    summary["errors"] = pd.concat(errors, ignore_index=True) if errors else pd.DataFrame(columns=["Row", "Error"])
+    return summary
@@ -0,0 +1,414 @@
+"""Backend-call instrumentation.
+
+db.get_client() wraps the client in `InstrumentedClient`, so every
+`table(...)...execute()` and `rpc(...).execute()` is recorded with its table,
+operation, filter columns, row count, response size and latency. Calls are
+aggregated per page and per script rerun (pages call `begin_rerun` first and
+`end_rerun` last; `page_fragment` does the same for a fragment rerunning
+alone); reads fanned out with db.fan_out count toward the page that started
+them, other background threads (prefetch, cart write-behind) are filed under
+the "background" page.
+
+Settings (env SALON_<NAME> or secrets.toml, see db.setting):
+  debug_panel  - offer the per-rerun panel in the sidebar (master switch for the deployment);
+                 each session unlocks it with the admin password (app_password)
+  metrics_file - Prometheus text file, rewritten at most every METRICS_EXPORT_SECONDS
+                 (point node_exporter's textfile collector at it)
+  metrics_log  - JSON lines log, one line per backend call
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from db import get_client, get_snapshots, setting
+
+METRICS_EXPORT_SECONDS = 15
+RECENT_CALLS = 500            # kept in memory for the "slowest calls" table
+N_PLUS_ONE_THRESHOLD = 3      # same call shape this often in one rerun is flagged
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+BACKGROUND = "background"
+
+WRITE_OPS = {"insert", "upsert", "update", "delete"}
+FILTER_OPS = {"eq", "neq", "gt", "gte", "lt", "lte", "like", "ilike", "in_", "is_", "or_",
+              "contains", "contained_by", "text_search", "match"}
+
+
+@dataclass
+class Call:
+    page: str
+    table: str
+    op: str
+    filters: str
+    rows: int
+    bytes: int
+    ms: float
+    status: str
+    at: float
+
+
+# ---------- RECORDER ----------
+class Recorder:
+    """Process-wide aggregates of backend calls; thread-safe."""
+
+    def __init__(self, prom_path: str | None = None, json_path: str | None = None):
+        self.prom_path = prom_path
+        self.json_path = json_path
+        self.recent: deque[Call] = deque(maxlen=RECENT_CALLS)
+        self.requests = Counter()          # (page, table, op, status) -> n
+        self.rows = Counter()              # (page, table, op) -> rows
+        self.bytes = Counter()             # (page, table, op) -> bytes
+        self.latency: dict[tuple, list] = {}   # (page, table, op) -> [bucket counts..., sum, count]
+        self.reruns: dict[str, list] = {}      # page -> [reruns, requests, seconds, max requests]
+        self.retries = Counter()           # (table, op, reason) -> n, see resilience.py
+        self.hedges = Counter()            # (table, op, winner) -> n
+        self._last_export = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, call: Call) -> None:
+        key = (call.page, call.table, call.op)
+        with self._lock:
+            self.recent.append(call)
+            self.requests[key + (call.status,)] += 1
+            self.rows[key] += call.rows
+            self.bytes[key] += call.bytes
+            hist = self.latency.setdefault(key, [0] * len(LATENCY_BUCKETS) + [0.0, 0])
+            seconds = call.ms / 1000
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    hist[i] += 1
+            hist[-2] += seconds
+            hist[-1] += 1
+            if self.json_path:
+                with open(self.json_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(asdict(call)) + "\n")
+
+    def record_retry(self, table: str, op: str, reason: str) -> None:
+        with self._lock:
+            self.retries[(table, op, reason)] += 1
+
+    def record_hedge(self, table: str, op: str, won: bool) -> None:
+        with self._lock:
+            self.hedges[(table, op, "hedge" if won else "original")] += 1
+
+    def rerun_done(self, page: str, requests: int, seconds: float) -> None:
+        with self._lock:
+            stats = self.reruns.setdefault(page, [0, 0, 0.0, 0])
+            stats[0] += 1
+            stats[1] += requests
+            stats[2] += seconds
+            stats[3] = max(stats[3], requests)
+        self.maybe_export()
+
+    # ---------- EXPORT ----------
+    def maybe_export(self) -> None:
+        if not self.prom_path or time.monotonic() - self._last_export < METRICS_EXPORT_SECONDS:
+            return
+        self._last_export = time.monotonic()
+        tmp = f"{self.prom_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        os.replace(tmp, self.prom_path)     # the collector never sees a half-written file
+
+    def prometheus(self) -> str:
+        """All aggregates in the Prometheus text exposition format."""
+        def labels(**kv) -> str:
+            esc = {k: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for k, v in kv.items()}
+            return "{" + ",".join(f'{k}="{v}"' for k, v in esc.items()) + "}"
+
+        with self._lock:
+            out = ["# HELP salon_backend_requests_total Backend requests by page, table, operation and status.",
+                   "# TYPE salon_backend_requests_total counter"]
+            for (page, table, op, status), n in sorted(self.requests.items()):
+                out.append(f"salon_backend_requests_total{labels(page=page, table=table, op=op, status=status)} {n}")
+            for name, counter, help_text in [
+                ("salon_backend_rows_total", self.rows, "Rows returned by backend requests."),
+                ("salon_backend_response_bytes_total", self.bytes, "JSON size of backend responses."),
+            ]:
+                out += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                for (page, table, op), n in sorted(counter.items()):
+                    out.append(f"{name}{labels(page=page, table=table, op=op)} {n}")
+
+            out += ["# HELP salon_backend_request_duration_seconds Backend request latency.",
+                    "# TYPE salon_backend_request_duration_seconds histogram"]
+            for (page, table, op), hist in sorted(self.latency.items()):
+                base = labels(page=page, table=table, op=op)
+                for bound, n in zip(LATENCY_BUCKETS + ["+Inf"], hist[:-2] + [hist[-1]]):
+                    out.append("salon_backend_request_duration_seconds_bucket"
+                               f"{labels(page=page, table=table, op=op, le=bound)} {n}")
+                out.append(f"salon_backend_request_duration_seconds_sum{base} {hist[-2]:.6f}")
+                out.append(f"salon_backend_request_duration_seconds_count{base} {hist[-1]}")
+
+            out += ["# HELP salon_backend_retries_total Retried backend requests by reason (unsent/transient).",
+                    "# TYPE salon_backend_retries_total counter"]
+            for (table, op, reason), n in sorted(self.retries.items()):
+                out.append(f"salon_backend_retries_total{labels(table=table, op=op, reason=reason)} {n}")
+            out += ["# HELP salon_backend_hedges_total Hedged reads by which request answered first.",
+                    "# TYPE salon_backend_hedges_total counter"]
+            for (table, op, winner), n in sorted(self.hedges.items()):
+                out.append(f"salon_backend_hedges_total{labels(table=table, op=op, winner=winner)} {n}")
+
+            out += ["# HELP salon_page_rerun_requests Backend requests per script rerun.",
+                    "# TYPE salon_page_rerun_requests summary"]
+            for page, (n, requests, _, _) in sorted(self.reruns.items()):
+                out.append(f"salon_page_rerun_requests_sum{labels(page=page)} {requests}")
+                out.append(f"salon_page_rerun_requests_count{labels(page=page)} {n}")
+            out += ["# HELP salon_page_rerun_seconds Wall time of script reruns.",
+                    "# TYPE salon_page_rerun_seconds summary"]
+            for page, (n, _, seconds, _) in sorted(self.reruns.items()):
+                out.append(f"salon_page_rerun_seconds_sum{labels(page=page)} {seconds:.6f}")
+                out.append(f"salon_page_rerun_seconds_count{labels(page=page)} {n}")
+
+        snapshots = [s.stats() for s in get_snapshots().values()]
+        for name, field, help_text in [
+            ("salon_snapshot_rows", "rows", "Rows in each shared table snapshot."),
+            ("salon_snapshot_bytes", "bytes", "Memory held by each shared table snapshot."),
+        ]:
+            out += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            out += [f"{name}{labels(table=s['table'])} {s[field]}" for s in snapshots]
+        return "\n".join(out) + "\n"
+
+    def page_summary(self) -> pd.DataFrame:
+        with self._lock:
+            rows = [{"Page": page, "Reruns": n, "Requests/rerun": requests / n,
+                     "Max requests": most, "ms/rerun": seconds * 1000 / n}
+                    for page, (n, requests, seconds, most) in self.reruns.items()]
+        return pd.DataFrame(rows)
+
+
+@st.cache_resource
+def get_recorder() -> Recorder:
+    return Recorder(prom_path=setting("metrics_file"), json_path=setting("metrics_log"))
+
+
+# ---------- CLIENT WRAPPER ----------
+def _size(data) -> int:
+    try:
+        return len(json.dumps(data, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+_bound = threading.local()
+
+
+def _current_rerun() -> dict | None:
+    rerun = getattr(_bound, "rerun", None)
+    if rerun is not None:
+        return rerun
+    if get_script_run_ctx(suppress_warning=True) is None:
+        return None     # worker thread: no session to attribute the call to
+    return st.session_state.get("perf_rerun")
+
+
+def current_rerun() -> dict | None:
+    """This rerun's collector, to hand to worker threads with `bind_rerun`."""
+    return _current_rerun()
+
+
+@contextmanager
+def bind_rerun(rerun: dict | None):
+    """File the calls this (worker) thread makes under `rerun`."""
+    previous = getattr(_bound, "rerun", None)
+    _bound.rerun = rerun
+    try:
+        yield
+    finally:
+        _bound.rerun = previous
+
+
+class _TracedQuery:
+    """Query-builder proxy: follows the call chain and times `execute()`."""
+
+    def __init__(self, target, recorder: Recorder, table: str, op: str, filters: tuple = (), negate: bool = False):
+        self._target = target
+        self._recorder = recorder
+        self._table = table
+        self._op = op
+        self._filters = filters
+        self._negate = negate
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name == "execute":
+            return self._execute
+        if not callable(attr):          # e.g. the `not_` property
+            return self._chain(attr, name, ())
+        return lambda *args, **kwargs: self._chain(attr(*args, **kwargs), name, args)
+
+    def _chain(self, result, name: str, args: tuple):
+        if not hasattr(result, "execute"):
+            return result
+        op = name if name in WRITE_OPS or name == "select" else self._op
+        filters = self._filters
+        if name in FILTER_OPS:
+            # Column names only: values are customer data and unbounded label cardinality
+            column = "" if name == "or_" or not args else f":{args[0]}"
+            filters += (f"{'not.' if self._negate else ''}{name.rstrip('_')}{column}",)
+        return _TracedQuery(result, self._recorder, self._table, op, filters, negate=name == "not_")
+
+    def _execute(self):
+        rerun = _current_rerun()
+        started = time.perf_counter()
+        status, res = "ok", None
+        try:
+            res = self._target.execute()
+            return res
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            data = getattr(res, "data", None)
+            call = Call(
+                page=rerun["page"] if rerun else BACKGROUND,
+                table=self._table,
+                op=self._op,
+                filters=",".join(self._filters),
+                rows=len(data) if isinstance(data, list) else int(data is not None),
+                bytes=_size(data) if data is not None else 0,
+                ms=(time.perf_counter() - started) * 1000,
+                status=status,
+                at=time.time(),
+            )
+            self._recorder.record(call)
+            if rerun is not None:
+                rerun["calls"].append(call)
+
+
+class InstrumentedClient:
+    """Wraps a supabase Client / Backend; everything else passes straight through."""
+
+    def __init__(self, client, recorder: Recorder):
+        self._client = client
+        self._recorder = recorder
+
+    def table(self, name: str):
+        return _TracedQuery(self._client.table(name), self._recorder, name, "select")
+
+    def from_(self, name: str):
+        return self.table(name)
+
+    def rpc(self, name: str, *args, **kwargs):
+        return _TracedQuery(self._client.rpc(name, *args, **kwargs), self._recorder, f"rpc:{name}", "rpc")
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def instrument(client) -> InstrumentedClient:
+    return InstrumentedClient(client, get_recorder())
+
+
+# ---------- PER RERUN ----------
+def begin_rerun(page: str) -> None:
+    """Call at the top of a page: starts collecting this rerun's backend calls."""
+    _finish(st.session_state.get("perf_rerun"))     # previous run ended in st.stop()/st.rerun()
+    st.session_state["perf_rerun"] = {"page": page, "calls": [], "started": time.perf_counter(), "done": False}
+
+
+def _finish(rerun: dict | None) -> None:
+    if rerun and not rerun["done"]:
+        rerun["done"] = True
+        get_recorder().rerun_done(rerun["page"], len(rerun["calls"]), time.perf_counter() - rerun["started"])
+
+
+def end_rerun() -> None:
+    """Call at the bottom of a page: records the rerun and draws the debug panel for admins."""
+    rerun = st.session_state.get("perf_rerun")
+    if rerun is None:
+        return
+    _finish(rerun)
+    if str(setting("debug_panel", "")).lower() in ("1", "true", "yes") and _debug_unlocked():
+        debug_panel(rerun)
+
+
+def _debug_unlocked() -> bool:
+    """True once this session entered app_password; until then the sidebar asks for it."""
+    password = setting("app_password")
+    if password and st.session_state.get("debug_pw") == password:
+        st.session_state["debug_admin"] = True
+    if st.session_state.get("debug_admin"):
+        return True
+    with st.sidebar.expander("🛠 Backend calls", expanded=False):
+        st.text_input("Admin password", type="password", key="debug_pw")
+    return False
+
+
+def page_fragment(page: str, name: str):
+    """`st.fragment` whose reruns of its own are recorded like a page rerun, as "<page> / <name>".
+
+    In a full rerun the page's begin_rerun/end_rerun already cover it, and so
+    does an enclosing fragment's rerun for a nested one.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            ctx = get_script_run_ctx(suppress_warning=True)
+            alone = bool(ctx and ctx.fragment_ids_this_run) and not getattr(_bound, "in_fragment", False)
+            if not alone:
+                return fn(*args, **kwargs)
+            begin_rerun(f"{page} / {name}")
+            _bound.in_fragment = True
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _bound.in_fragment = False
+                _finish(st.session_state.get("perf_rerun"))
+        return st.fragment(run)
+    return decorate
+
+
+def rerun_fragment() -> None:
+    """Rerun just the current fragment; a full rerun when the whole script is running (scope would be refused)."""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    st.rerun(scope="fragment" if ctx and ctx.fragment_ids_this_run else "app")
+
+
+def suspected_n_plus_one(calls: list[Call]) -> list[str]:
+    shapes = Counter((c.table, c.op, c.filters) for c in calls)
+    return [f"{n} × {op} {table} [{filters or 'no filter'}]"
+            for (table, op, filters), n in shapes.most_common() if n >= N_PLUS_ONE_THRESHOLD]
+
+
+def debug_panel(rerun: dict) -> None:
+    calls = rerun["calls"]
+    with st.sidebar.expander("🛠 Backend calls", expanded=False):
+        c1, c2 = st.columns(2)
+        c1.metric("Requests", len(calls))
+        c2.metric("Backend ms", f"{sum(c.ms for c in calls):.0f}")
+        c1.metric("Rows", sum(c.rows for c in calls))
+        c2.metric("KiB", f"{sum(c.bytes for c in calls) / 1024:.1f}")
+        st.caption(f"Rerun took {(time.perf_counter() - rerun['started']) * 1000:.0f} ms")
+        for warning in suspected_n_plus_one(calls):
+            st.warning(f"Possible N+1: {warning}")
+        if calls:
+            st.dataframe(pd.DataFrame([asdict(c) for c in calls])[["table", "op", "filters", "rows", "bytes", "ms"]],
+                         hide_index=True)
+
+        recorder = get_recorder()
+        st.markdown("**Per page (since start)**")
+        summary = recorder.page_summary()
+        if not summary.empty:
+            st.dataframe(summary.round(1), hide_index=True)
+        executor = getattr(get_client(), "executor", None)
+        retried = [s for s in executor.stats() if s["retries"] or s["failures"] or s["hedges"]] if executor else []
+        if retried:
+            st.markdown("**Retries and hedges (since start)**")
+            st.dataframe(pd.DataFrame(retried).round(1), hide_index=True)
+        st.markdown("**Shared table snapshots**")
+        snapshots = pd.DataFrame([s.stats() for s in get_snapshots().values()])
+        st.dataframe(snapshots.assign(KiB=(snapshots["bytes"] / 1024).round(1)).drop(columns="bytes"),
+                     hide_index=True)
+        slowest = sorted(list(recorder.recent), key=lambda c: c.ms, reverse=True)[:5]
+        if slowest:
+            st.markdown("**Slowest recent calls**")
+            st.dataframe(pd.DataFrame([asdict(c) for c in slowest])[["page", "table", "op", "filters", "rows", "ms"]],
+                         hide_index=True)
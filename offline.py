@@ -0,0 +1,489 @@
+"""Offline mode for the point of sale: a local SQLite mirror and a durable write queue.
+
+With the `offline_mirror` setting (a file path, e.g. offline.db) db.get_client()
+wraps the client in `OfflineClient`:
+
+- while the server answers, requests go to it as before, and every
+  MIRROR_EVERY seconds a background sync copies SaleProducts, Products,
+  Services and today's customers (with their visits and products used) into
+  the mirror, an SQLiteBackend file;
+- cart writes (SaleCart) that reach the server are repeated on the mirror,
+  and a sale confirmed on the server clears the mirror's copy, so a cart
+  saved before an outage can still be sold during it;
+- when a request can't reach the server (resilience.classify says the
+  connection failed or timed out, after its retries), the client goes
+  offline. The mirror then answers reads of those tables and
+  search_customers in well under a millisecond, and holds the cart
+  (SaleCart). New visits, products used and confirmed sales are appended to
+  the PendingWrites queue in the same file, then applied to the mirror.
+  Any other write raises OfflineError;
+- every PROBE_EVERY seconds one small request checks whether the server is
+  back. When it is, the queue is replayed in order before anything else is
+  sent.
+
+Replays check for conflicts instead of overwriting: a sale goes through
+confirm_sale again, against the server's current stock; a visit needs its
+customer to still exist; products used need their visit to have been
+replayed. A write that conflicts is parked (status 'conflict') for someone
+to retry or discard in status_panel(); the writes after it still go through.
+Offline visits get negative VisitPKs in the mirror, mapped to the server's
+keys in IdMap once sent. A write whose outcome was lost (still 'sending'
+after a timeout or a crash) is looked up on the server before it is sent
+again; every queued sale has its own SessionID for that.
+
+For testing, the fault stub can take the network down and bring it back
+(resilience.FaultyBackend `down`, switched from status_panel's sidebar):
+
+    SALON_BACKEND=sqlite SALON_OFFLINE_MIRROR=offline.db SALON_FAULTS="down=0" streamlit run app.py
+"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable
+
+from resilience import READ_RPCS, classify
+from sqlite_backend import BUSINESS_TZ, SQLiteBackend
+
+PROBE_EVERY = 15.0          # seconds between reconnect attempts while offline
+MIRROR_EVERY = 300.0        # seconds between mirror syncs while online
+KEY_CHUNK = 200             # keys per in_() filter when syncing
+MIRROR_TABLES = ["Products", "Services", "SaleProducts", "Customers", "Visits", "ProductsUsed"]
+OFFLINE_READS = set(MIRROR_TABLES) | {"SaleCart", "DeletedRows"}
+QUEUED_INSERTS = {"Visits", "ProductsUsed"}
+# Columns that find a replayed insert on the server when its response was lost
+LOOKUP_COLUMNS = {
+    "Visits": ("VisitPK", ["CustomerNo", "Date", "Service", "TotalPrice_Gross"]),
+    "ProductsUsed": ("ProductUsedPK", ["VisitPK", "Product", "WeightUsed_g"]),
+}
+
+QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS "PendingWrites" (
+  "id" INTEGER PRIMARY KEY AUTOINCREMENT,
+  "Kind" TEXT NOT NULL,
+  "Target" TEXT NOT NULL,
+  "Payload" TEXT NOT NULL,
+  "CreatedAt" TEXT NOT NULL,
+  "Status" TEXT NOT NULL DEFAULT 'pending',
+  "Error" TEXT
+);
+CREATE TABLE IF NOT EXISTS "IdMap" (
+  "TableName" TEXT NOT NULL,
+  "LocalId" INTEGER NOT NULL,
+  "RemoteId" INTEGER NOT NULL,
+  PRIMARY KEY ("TableName", "LocalId")
+);
+"""
+
+
+class OfflineError(RuntimeError):
+    """A change that needs the server was made while offline."""
+
+
+class Conflict(Exception):
+    """A queued write the server no longer accepts."""
+
+
+# ---------- WRITE QUEUE ----------
+class WriteQueue:
+    """PendingWrites and IdMap, on their own connection to the mirror file.
+
+    Kind 'insert' targets a table (Payload: rows, local_ids); kind 'sale'
+    targets a SessionID (Payload: the cart lines). Status goes pending ->
+    sending -> (deleted) or conflict.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(QUEUE_SCHEMA)
+
+    def add(self, kind: str, target: str, payload: dict) -> int:
+        with self._lock:
+            return self.conn.execute(
+                'INSERT INTO "PendingWrites" ("Kind", "Target", "Payload", "CreatedAt") VALUES (?, ?, ?, ?) '
+                "RETURNING id",
+                [kind, target, json.dumps(payload), datetime.now(timezone.utc).isoformat(timespec="seconds")],
+            ).fetchone()[0]
+
+    def _select(self, where: str) -> list[dict]:
+        with self._lock:
+            rows = self.conn.execute(f'SELECT * FROM "PendingWrites" WHERE {where} ORDER BY id').fetchall()
+        return [{**dict(r), "Payload": json.loads(r["Payload"])} for r in rows]
+
+    def pending(self) -> list[dict]:
+        return self._select("\"Status\" IN ('pending', 'sending')")
+
+    def conflicts(self) -> list[dict]:
+        return self._select("\"Status\" = 'conflict'")
+
+    def mark(self, op_id: int, status: str, error: str | None = None) -> None:
+        with self._lock:
+            self.conn.execute('UPDATE "PendingWrites" SET "Status" = ?, "Error" = ? WHERE id = ?',
+                              [status, error, op_id])
+
+    def remove(self, op_id: int) -> None:
+        with self._lock:
+            self.conn.execute('DELETE FROM "PendingWrites" WHERE id = ?', [op_id])
+
+    def map_id(self, table: str, local_id: int, remote_id: int) -> None:
+        with self._lock:
+            self.conn.execute('INSERT OR REPLACE INTO "IdMap" VALUES (?, ?, ?)', [table, local_id, remote_id])
+
+    def remote_id(self, table: str, local_id: int) -> int | None:
+        with self._lock:
+            row = self.conn.execute('SELECT "RemoteId" FROM "IdMap" WHERE "TableName" = ? AND "LocalId" = ?',
+                                    [table, local_id]).fetchone()
+        return row[0] if row else None
+
+    def clear_ids(self) -> None:
+        with self._lock:
+            self.conn.execute('DELETE FROM "IdMap"')
+
+    def counts(self) -> dict[str, int]:
+        with self._lock:
+            rows = self.conn.execute('SELECT "Status", count(*) FROM "PendingWrites" GROUP BY 1').fetchall()
+        return {status: n for status, n in rows}
+
+
+# ---------- CLIENT ----------
+class _RecordedQuery:
+    """Query builder that records its calls so one chain can run on the server or on the mirror."""
+
+    def __init__(self, client: "OfflineClient", table: str | None, rpc: str | None = None, params=None):
+        self._client = client
+        self.table = table
+        self.rpc = rpc
+        self.params = params or {}
+        self.action = "rpc" if rpc else "select"
+        self.payload = None
+        self._calls: list[tuple[str, tuple | None]] = []
+
+    @property
+    def not_(self):
+        self._calls.append(("not_", None))
+        return self
+
+    def __getattr__(self, name):
+        def record(*args, **kwargs):
+            if name in ("select", "insert", "upsert", "update", "delete"):
+                self.action = name
+                self.payload = args[0] if args and name != "select" else None
+            self._calls.append((name, (args, kwargs)))
+            return self
+        return record
+
+    def is_read(self) -> bool:
+        return self.action == "select" or self.rpc in READ_RPCS
+
+    def build(self, client):
+        q = client.rpc(self.rpc, self.params) if self.rpc else client.table(self.table)
+        for name, call in self._calls:
+            q = getattr(q, name) if call is None else getattr(q, name)(*call[0], **call[1])
+        return q
+
+    def execute(self):
+        return self._client.execute(self)
+
+
+class OfflineClient:
+    """Wraps the (resilient) client; falls back to the mirror and the queue while the server is unreachable."""
+
+    def __init__(self, remote, path: str, clock: Callable[[], float] = time.monotonic):
+        self.remote = remote
+        self.mirror = SQLiteBackend(path)
+        self.queue = WriteQueue(path)
+        self.clock = clock
+        self.online = True
+        self.synced_at: datetime | None = None
+        self._next_probe = self._next_sync = 0.0
+        self._lock = threading.RLock()      # connection state, replay and offline writes
+        self._sync_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mirror")
+        self._syncing = None
+
+    def table(self, name: str) -> _RecordedQuery:
+        return _RecordedQuery(self, name)
+
+    def from_(self, name: str) -> _RecordedQuery:
+        return self.table(name)
+
+    def rpc(self, name: str, params: dict | None = None) -> _RecordedQuery:
+        return _RecordedQuery(self, None, rpc=name, params=params)
+
+    def __getattr__(self, name):
+        return getattr(self.remote, name)
+
+    # --- routing ---
+    def execute(self, query: _RecordedQuery):
+        if self._reachable():
+            try:
+                result = query.build(self.remote).execute()
+            except Exception as e:
+                kind = classify(e)
+                if kind is None:
+                    raise
+                self._go_offline()
+                if kind == "transient" and not query.is_read():
+                    raise           # it may have been applied: queueing it would apply it twice
+            else:
+                self._mirror_cart(query, result)
+                self._maybe_sync()
+                return result
+        return self._serve_offline(query)
+
+    def _mirror_cart(self, query: _RecordedQuery, result) -> None:
+        """Repeat a cart write on the mirror; the server already has it, so a failure here is not raised."""
+        try:
+            if query.table == "SaleCart" and not query.is_read():
+                query.build(self.mirror).execute()
+            elif query.rpc == "confirm_sale" and (result.data or {}).get("ok"):
+                self.mirror.table("SaleCart").delete().eq("SessionID", query.params["p_session_id"]).execute()
+        except Exception:
+            pass
+
+    def _reachable(self) -> bool:
+        with self._lock:
+            if self.online:
+                return True
+            if self.clock() < self._next_probe:
+                return False
+            self._next_probe = self.clock() + PROBE_EVERY
+            try:
+                self.remote.table("Services").select("id").limit(1).execute()
+                if not self.replay():
+                    return False
+            except Exception as e:
+                if classify(e) is None:
+                    raise
+                return False
+            self.online = True
+            self._expire_reads()
+            return True
+
+    def _go_offline(self) -> None:
+        with self._lock:
+            if self.online:
+                self.online = False
+                self._next_probe = self.clock() + PROBE_EVERY
+
+    def _serve_offline(self, query: _RecordedQuery):
+        if query.rpc == "confirm_sale":
+            return self._offline_sale(query.params["p_session_id"])
+        if query.rpc == "search_customers" or (query.table in OFFLINE_READS and query.action == "select"):
+            return query.build(self.mirror).execute()
+        if query.table == "SaleCart":
+            return query.build(self.mirror).execute()
+        if query.table in QUEUED_INSERTS and query.action == "insert":
+            return self._offline_insert(query)
+        raise OfflineError(f"No connection to the database: {query.rpc or query.table} can't be changed offline. "
+                           "Try again when the connection is back.")
+
+    # --- offline writes ---
+    def _offline_insert(self, query: _RecordedQuery):
+        rows = [query.payload] if isinstance(query.payload, dict) else list(query.payload)
+        with self._lock:
+            local_ids = []
+            if query.table == "Visits":
+                lowest = self.mirror.conn.execute(
+                    'SELECT min(0, coalesce(min("VisitPK"), 0)) FROM "Visits"').fetchone()[0]
+                local_ids = list(range(lowest - 1, lowest - 1 - len(rows), -1))
+            # Queued first: if the process dies before the mirror write, the change is still sent
+            self.queue.add("insert", query.table, {"rows": rows, "local_ids": local_ids})
+            local_rows = [{**row, "VisitPK": pk} for row, pk in zip(rows, local_ids)] if local_ids else rows
+            return self.mirror.table(query.table).insert(local_rows).execute()
+
+    def _offline_sale(self, session_id: str):
+        with self._lock:
+            lines = self.mirror.table("SaleCart").select("*").eq("SessionID", session_id).execute().data
+            lines = [{k: v for k, v in line.items() if k not in ("id", "SessionID", "UpdatedAt")} for line in lines]
+            op_id = self.queue.add("sale", f"offline-{uuid.uuid4()}", {"lines": lines, "cart": session_id})
+            try:
+                result = self.mirror.rpc("confirm_sale", {"p_session_id": session_id}).execute()
+            except Exception:
+                self.queue.remove(op_id)
+                raise
+            if not (result.data or {}).get("ok"):
+                self.queue.remove(op_id)     # refused locally (stock, empty cart): nothing to send
+            return result
+
+    # --- replay ---
+    def replay(self) -> bool:
+        """Send the queued writes in order; False if the connection dropped again on the way."""
+        with self._lock:
+            for op in self.queue.pending():
+                resend = op["Status"] == "sending"
+                self.queue.mark(op["id"], "sending")
+                try:
+                    if op["Kind"] == "sale":
+                        self._send_sale(op["Target"], op["Payload"], resend)
+                    else:
+                        self._send_insert(op["Target"], op["Payload"], resend)
+                except Conflict as c:
+                    self.queue.mark(op["id"], "conflict", str(c))
+                    continue
+                except Exception as e:
+                    if classify(e) is not None:
+                        return False
+                    self.queue.mark(op["id"], "conflict", getattr(e, "message", None) or str(e))
+                    continue
+                self.queue.remove(op["id"])
+            return True
+
+    def _send_insert(self, table: str, payload: dict, resend: bool) -> None:
+        rows = payload["rows"]
+        if table == "ProductsUsed":
+            rows = [{**row, "VisitPK": self._remote_visit(row["VisitPK"])} for row in rows]
+        stored = self._find(table, rows) if resend else None
+        if stored is None:
+            stored = self.remote.table(table).insert(rows).execute().data or []
+        for local_id, row in zip(payload["local_ids"], stored):
+            self.queue.map_id(table, local_id, row[LOOKUP_COLUMNS[table][0]])
+
+    def _remote_visit(self, visit_pk: int) -> int:
+        if visit_pk >= 0:
+            return visit_pk
+        remote = self.queue.remote_id("Visits", visit_pk)
+        if remote is None:
+            raise Conflict("its visit was not saved on the server")
+        return remote
+
+    def _find(self, table: str, rows: list[dict]) -> list[dict] | None:
+        """The server's copies of `rows` if an earlier attempt stored them all, else None."""
+        key, columns = LOOKUP_COLUMNS[table]
+        found = []
+        for row in rows:
+            q = self.remote.table(table).select("*")
+            for column in columns:
+                q = q.eq(column, row.get(column))
+            match = q.order(key, desc=True).limit(1).execute().data
+            if not match:
+                return None
+            found += match
+        return found
+
+    def _send_sale(self, session_id: str, payload: dict, resend: bool) -> None:
+        from db import describe_checkout_error
+
+        if not (resend and self.remote.table("Sales").select("id").eq("SessionID", session_id).execute().data):
+            lines = [{**line, "SessionID": session_id} for line in payload["lines"]]
+            if lines:
+                self.remote.table("SaleCart").upsert(lines, on_conflict="SessionID,ProductID").execute()
+            result = self.remote.rpc("confirm_sale", {"p_session_id": session_id}).execute().data or {}
+            if not result.get("ok"):
+                self.remote.table("SaleCart").delete().eq("SessionID", session_id).execute()
+                raise Conflict("; ".join(describe_checkout_error(e) for e in result.get("errors", [])) or
+                               "checkout failed")
+        if payload.get("cart"):
+            # The till's cart as it was saved before the outage: it was sold offline
+            self.remote.table("SaleCart").delete().eq("SessionID", payload["cart"]).execute()
+
+    def retry(self, op_id: int) -> None:
+        self.queue.mark(op_id, "pending")
+        if self.online:
+            self.replay()
+            self._expire_reads()
+
+    def discard(self, op_id: int) -> None:
+        self.queue.remove(op_id)
+
+    def _expire_reads(self) -> None:
+        from db import get_cache, get_snapshots     # db builds this client
+
+        get_cache().clear()
+        for snapshot in get_snapshots().values():
+            snapshot.expire()
+
+    # --- mirror ---
+    def _maybe_sync(self) -> None:
+        if self.clock() < self._next_sync or (self._syncing is not None and not self._syncing.done()):
+            return
+        self._next_sync = self.clock() + MIRROR_EVERY
+        self._syncing = self._sync_pool.submit(self.sync_mirror)
+
+    def sync_mirror(self) -> dict[str, int] | None:
+        """Copy the catalog and today's customers into the mirror (skipped while writes are queued)."""
+        from db import fetch_all
+
+        if self.queue.pending():
+            return None
+        remote = self.remote
+        frames = {t: fetch_all(lambda t=t: remote.table(t).select("*"))
+                  for t in ["Products", "Services", "SaleProducts"]}
+        now = datetime.now(BUSINESS_TZ)
+        day_start = now.replace(hour=0, minute=0, second=0, microsecond=0).astimezone(timezone.utc)
+        customers = fetch_all(lambda: remote.table("Customers").select("*")
+                              .gte("UpdatedAt", day_start.isoformat()), "CustomerNo")
+        visited = fetch_all(lambda: remote.table("Visits").select("VisitPK, CustomerNo")
+                            .eq("Date", now.date().isoformat()), "VisitPK")
+        missing = sorted({v["CustomerNo"] for v in visited} - {c["CustomerNo"] for c in customers})
+        customers += self._fetch_in("Customers", "CustomerNo", missing, "CustomerNo")
+        frames["Customers"] = customers
+        frames["Visits"] = self._fetch_in("Visits", "CustomerNo", [c["CustomerNo"] for c in customers], "VisitPK")
+        frames["ProductsUsed"] = self._fetch_in("ProductsUsed", "VisitPK", [v["VisitPK"] for v in frames["Visits"]],
+                                                "ProductUsedPK")
+        with self._lock:
+            if self.queue.pending() or not self.online:
+                return None
+            counts = self.mirror.replace(frames)
+            self.mirror.rpc("expire_sale_carts", {}).execute()     # the server's sweeper never sees these
+            self.queue.clear_ids()
+            self.synced_at = datetime.now(timezone.utc)
+        return counts
+
+    def _fetch_in(self, table: str, column: str, values: list, key: str) -> list[dict]:
+        from db import fetch_all
+
+        rows = []
+        for i in range(0, len(values), KEY_CHUNK):
+            chunk = values[i:i + KEY_CHUNK]
+            rows += fetch_all(lambda: self.remote.table(table).select("*").in_(column, chunk), key)
+        return rows
+
+    def status(self) -> dict:
+        counts = self.queue.counts()
+        return {
+            "online": self.online,
+            "pending": counts.get("pending", 0) + counts.get("sending", 0),
+            "conflicts": self.queue.conflicts() if counts.get("conflict") else [],
+            "synced_at": self.synced_at,
+        }
+
+
+# ---------- PAGE STATUS ----------
+def status_panel() -> None:
+    """Offline banner, parked conflicts and (with the fault stub) a network switch; no-op without a mirror."""
+    import streamlit as st
+
+    from db import get_client
+
+    client = get_client()
+    if not isinstance(client, OfflineClient):
+        return
+    if hasattr(client, "set_down"):
+        down = st.sidebar.toggle("🔌 Simulate network outage", value=bool(client.down))
+        if down != client.down:
+            client.set_down(down)
+
+    state = client.status()
+    if not state["online"]:
+        synced = f" (copied {state['synced_at'].astimezone(BUSINESS_TZ):%H:%M})" if state["synced_at"] else ""
+        st.warning(f"📴 Offline: showing the local copy{synced}. Sales, visits and products used are saved "
+                   f"locally and sent when the connection is back ({state['pending']} waiting).")
+    elif state["pending"]:
+        st.info(f"🔄 {state['pending']} offline change(s) waiting to be sent.")
+    if state["conflicts"]:
+        with st.expander(f"⚠️ {len(state['conflicts'])} offline change(s) could not be saved", expanded=True):
+            for op in state["conflicts"]:
+                c1, c2, c3 = st.columns([6, 1, 1])
+                what = "Sale" if op["Kind"] == "sale" else f"{op['Target']} ({len(op['Payload']['rows'])} row(s))"
+                c1.markdown(f"**{what}**, {op['CreatedAt']}: {op['Error']}")
+                if c2.button("Retry", key=f"offline_retry_{op['id']}"):
+                    client.retry(op["id"])
+                    st.rerun()
+                if c3.button("Discard", key=f"offline_discard_{op['id']}"):
+                    client.discard(op["id"])
+                    st.rerun()
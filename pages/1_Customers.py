@@ -1,88 +1,95 @@
 import streamlit as st
-import pandas as pd
-from supabase import create_client, Client
 
-st.set_page_config(page_title="Customers", layout="wide")
-
-# ---------- SUPABASE CONNECTION ----------
-@st.cache_resource
-def init_connection() -> Client:
-    url = st.secrets["supabase"]["url"]
-    key = st.secrets["supabase"]["key"]
-    return create_client(url, key)
-
-supabase = init_connection()
+from db import (
+    search_customers, get_customers_page, prefetch_customers_page,
+    add_customer, CUSTOMER_PAGE_SIZE, SEARCH_LIMIT, SEARCH_MIN_CHARS,
+)
+from metrics import begin_rerun, end_rerun
+from offline import OfflineError
 
-# ---------- DATA HELPERS ----------
-def get_customers():
-    res = supabase.table("Customers").select("CustomerNo, FullName, Phone, Email").order("CustomerNo").execute()
-    return pd.DataFrame(res.data) if res.data else pd.DataFrame()
+st.set_page_config(page_title="Customers", layout="wide")
+begin_rerun("Customers")
 
-def get_next_customer_no():
-    res = supabase.table("Customers").select("CustomerNo").order("CustomerNo", desc=True).limit(1).execute()
-    if res.data and res.data[0].get("CustomerNo"):
-        return int(res.data[0]["CustomerNo"]) + 1
-    return 7394
+PAGE_SIZES = [25, 50, 100, 200]
 
-def add_customer(full_name, phone, email):
-    next_no = get_next_customer_no()
-    supabase.table("Customers").insert({
-        "CustomerNo": next_no,
-        "FullName": full_name,
-        "Phone": phone,
-        "Email": email
-    }).execute()
-    return next_no
+# ---------- RENDER HELPERS ----------
+def render_customer(row):
+    with st.container(border=True):
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            st.markdown(f"### 🌸 {row['FullName']}")
+            st.write(f"**Customer #:** {row['CustomerNo']}")
+            st.write(f"📞 {row['Phone']}")
+            if row['Email']:
+                st.write(f"✉️ {row['Email']}")
+        with col2:
+            if st.button("👁 View", key=f"view_{row['CustomerNo']}"):
+                st.session_state["selected_customer_no"] = row["CustomerNo"]
+                st.switch_page("pages/2_Customer_Detail.py")
 
 # ---------- PAGE ----------
 st.title("🌸 Salon Customers Dashboard")
 st.markdown("Manage clients — add, search, and view visit history.")
 
-next_no = get_next_customer_no()
 with st.expander("➕ Add New Customer"):
-    st.markdown(f"**Next Customer #:** {next_no}")
+    st.caption("The customer number is assigned automatically when you save.")
     with st.form("add_customer_form"):
         full_name = st.text_input("Full Name")
         phone = st.text_input("Phone")
         email = st.text_input("Email")
         if st.form_submit_button("Add Customer"):
             if full_name.strip() and phone.strip():
-                new_no = add_customer(full_name, phone, email)
-                st.success(f"✅ Customer #{new_no} added!")
-                st.rerun()
+                try:
+                    new_no = add_customer(full_name, phone, email)
+                except OfflineError as e:
+                    st.error(f"📴 {e}")
+                else:
+                    st.success(f"✅ Customer #{new_no} added!")
+                    st.rerun()
             else:
                 st.error("Full name and phone are required.")
 
 st.divider()
 
 search_term = st.text_input("🔍 Search customers")
-customers = get_customers()
+page_size = st.selectbox("Customers per page", PAGE_SIZES, index=PAGE_SIZES.index(CUSTOMER_PAGE_SIZE))
 
-if customers.empty:
-    st.info("No customers yet.")
+if search_term.strip():
+    # Ranked, limited server-side search; results are cached per normalized term,
+    # so reruns with the same text (and too-short terms) never hit the network.
+    if len(search_term.strip()) < SEARCH_MIN_CHARS and not search_term.strip().isdigit():
+        st.caption(f"Type at least {SEARCH_MIN_CHARS} characters to search.")
+    else:
+        customers = search_customers(search_term, SEARCH_LIMIT)
+        if customers.empty:
+            st.info("No matching customers.")
+        else:
+            st.caption(f"Top {len(customers)} matches")
+        for _, row in customers.iterrows():
+            render_customer(row)
 else:
-    if search_term:
-        customers = customers[
-            customers.apply(
-                lambda x: search_term.lower() in str(x["CustomerNo"]).lower()
-                or search_term.lower() in str(x["FullName"]).lower()
-                or search_term.lower() in str(x["Phone"]).lower()
-                or search_term.lower() in str(x["Email"]).lower(),
-                axis=1,
-            )
-        ]
+    # Cursor stack: each entry is the last CustomerNo of the previous page (None = first page).
+    if st.session_state.get("customer_page_size") != page_size:
+        st.session_state["customer_page_size"] = page_size
+        st.session_state["customer_cursors"] = [None]
+    cursors = st.session_state.setdefault("customer_cursors", [None])
+
+    customers, next_after = get_customers_page(cursors[-1], page_size)
+    if next_after is not None:
+        prefetch_customers_page(next_after, page_size)
 
+    if customers.empty:
+        st.info("No customers yet.")
     for _, row in customers.iterrows():
-        with st.container(border=True):
-            col1, col2 = st.columns([3, 1])
-            with col1:
-                st.markdown(f"### 🌸 {row['FullName']}")
-                st.write(f"**Customer #:** {row['CustomerNo']}")
-                st.write(f"📞 {row['Phone']}")
-                if row['Email']:
-                    st.write(f"✉️ {row['Email']}")
-            with col2:
-                if st.button("👁 View", key=f"view_{row['CustomerNo']}"):
-                    st.session_state["selected_customer_no"] = row["CustomerNo"]
-                    st.switch_page("pages/2_Customer_Detail.py")
+        render_customer(row)
+
+    prev_col, info_col, next_col = st.columns([1, 2, 1])
+    if prev_col.button("◀ Previous", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+    info_col.caption(f"Page {len(cursors)}")
+    if next_col.button("Next ▶", disabled=next_after is None):
+        cursors.append(next_after)
+        st.rerun()
 
+end_rerun()
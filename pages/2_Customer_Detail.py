@@ -1,98 +1,27 @@
 import streamlit as st
 import pandas as pd
 from datetime import date
-from supabase import create_client, Client
 
-st.set_page_config(page_title="Customer Detail", layout="wide")
+from db import (
+    get_customer_detail, detail_visits, detail_products_used, update_customer,
+    add_visit, get_products_list, add_products_used, fan_out, Deadline, DeadlineExceeded,
+)
+from metrics import begin_rerun, end_rerun, page_fragment, rerun_fragment
+from offline import OfflineError, status_panel
 
-# ---------- SUPABASE CONNECTION ----------
-@st.cache_resource
-def init_connection() -> Client:
-    url = st.secrets["supabase"]["url"]
-    key = st.secrets["supabase"]["key"]
-    return create_client(url, key)
-
-supabase = init_connection()
-
-# ---------- DATA HELPERS ----------
-def get_customer(customer_no):
-    res = supabase.table("Customers").select("*").eq("CustomerNo", customer_no).execute()
-    return res.data[0] if res.data else None
-
-def update_customer(customer_no, name, phone, email):
-    supabase.table("Customers").update({
-        "FullName": name,
-        "Phone": phone,
-        "Email": email
-    }).eq("CustomerNo", customer_no).execute()
-
-def get_visits(customer_no):
-    res = supabase.table("Visits").select("*").eq("CustomerNo", customer_no).order("Date", desc=True).execute()
-    df = pd.DataFrame(res.data) if res.data else pd.DataFrame()
-    if not df.empty:
-        df = df.drop(columns=["VisitPK"], errors="ignore")
-        df.index = range(1, len(df) + 1)
-    return df
+st.set_page_config(page_title="Customer Detail", layout="wide")
+begin_rerun("Customer Detail")
 
-def get_products_used(visit_pk):
-    res = supabase.table("ProductsUsed").select("*").eq("VisitPK", visit_pk).execute()
-    df = pd.DataFrame(res.data) if res.data else pd.DataFrame()
+# ---------- DISPLAY HELPERS ----------
+def numbered(df: pd.DataFrame, drop: list[str]) -> pd.DataFrame:
     if not df.empty:
-        df = df.drop(columns=["ProductPK", "VisitPK","ProductUsedPK"], errors="ignore")
+        df = df.drop(columns=drop, errors="ignore")
         df.index = range(1, len(df) + 1)
     return df
 
-def get_products_list():
-    res = supabase.table("Products").select("ProductName, Brand, ColorNo, PricePerGram").order("Brand").execute()
-    return pd.DataFrame(res.data) if res.data else pd.DataFrame()
-
-def add_visit(customer_no, visit_date, service, total_price):
-    vat = round(total_price-(total_price/1.255), 2)
-    net_income = round(total_price - vat - 2, 2)
-    existing = supabase.table("Visits").select("VisitID").eq("CustomerNo", customer_no).order("VisitID", desc=True).limit(1).execute()
-    next_visit_id = existing.data[0]["VisitID"] + 1 if existing.data else 1
-    res = supabase.table("Visits").insert({
-        "CustomerNo": customer_no,
-        "VisitID": next_visit_id,
-        "Date": str(visit_date),
-        "Service": service,
-        "TotalPrice_Gross": total_price,
-        "VAT": vat,
-        "NetIncome": net_income
-    }).execute()
-    return res.data[0]["VisitPK"] if res.data else None
-
-def add_product_used(visit_pk, product_name, weight_used):
-    pinfo = supabase.table("Products").select("Brand, ColorNo, PricePerGram").eq("ProductName", product_name).execute()
-    if pinfo.data:
-        brand = pinfo.data[0]["Brand"]
-        color = pinfo.data[0]["ColorNo"]
-        price = float(pinfo.data[0]["PricePerGram"])
-        cost = round(weight_used * price, 2)
-    else:
-        brand, color, cost = None, None, 0.0
-
-    supabase.table("ProductsUsed").insert({
-        "VisitPK": visit_pk,
-        "Product": product_name,
-        "Brand": brand,
-        "ColorNo": color,
-        "WeightUsed_g": weight_used,
-        "ProductCost": cost
-    }).execute()
-
-    used = supabase.table("ProductsUsed").select("ProductCost").eq("VisitPK", visit_pk).execute()
-    total_cost = sum(float(p["ProductCost"]) for p in used.data)
-    visit = supabase.table("Visits").select("TotalPrice_Gross, VAT").eq("VisitPK", visit_pk).execute()
-
-    if visit.data:
-        gross = float(visit.data[0]["TotalPrice_Gross"])
-        vat = float(visit.data[0]["VAT"])
-        new_net = round(gross - vat - total_cost - 2, 2)
-        supabase.table("Visits").update({"NetIncome": new_net}).eq("VisitPK", visit_pk).execute()
-
 # ---------- PAGE BODY ----------
 st.title("🌸 Customer Detail")
+status_panel()
 
 customer_no = st.session_state.get("selected_customer_no")
 
@@ -100,7 +29,17 @@ if not customer_no:
     st.warning("No customer selected. Please go back to the Customers page.")
     st.stop()
 
-customer = get_customer(customer_no)
+# Customer (with visits and products used) and the product catalog load side by side;
+# the fragments below read both again from their caches
+try:
+    loaded = fan_out({
+        "customer": lambda: get_customer_detail(customer_no),
+        "catalog": get_products_list,
+    }, Deadline())
+except DeadlineExceeded as e:
+    st.error(f"⏱️ The database is slow to answer ({e}). Please reload the page.")
+    st.stop()
+customer = loaded["customer"]
 if not customer:
     st.error(f"No customer found with number {customer_no}.")
     st.stop()
@@ -114,9 +53,13 @@ with st.expander("✏️ Edit Customer Info"):
         phone = st.text_input("Phone", customer["Phone"])
         email = st.text_input("Email", customer["Email"])
         if st.form_submit_button("Save Changes"):
-            update_customer(customer_no, name, phone, email)
-            st.success("✅ Customer updated!")
-            st.rerun()
+            try:
+                update_customer(customer_no, name, phone, email)
+            except OfflineError as e:
+                st.error(f"📴 {e}")
+            else:
+                st.success("✅ Customer updated!")
+                st.rerun()
 
 if st.button("🔙 Back to Customers"):
     st.switch_page("pages/1_Customers.py")
@@ -127,73 +70,100 @@ st.divider()
 show_price = st.toggle("Show Price Details", value=False)
 
 # ---------- VISITS ----------
-st.subheader("💈 Visits")
-visits = get_visits(customer_no)
-
-if not show_price and not visits.empty:
-    visits = visits.drop(columns=["TotalPrice_Gross", "VAT", "NetIncome"], errors="ignore")
-
-st.dataframe(visits, use_container_width=True)
-
-with st.expander("➕ Add New Visit"):
-    with st.form("add_visit_form"):
-        visit_date = st.date_input("Visit Date", date.today())
-        service = st.text_input("Service")
-        total_price = st.number_input("Total Price (€)", min_value=0.0, step=0.5)
-        if st.form_submit_button("Add Visit"):
-            new_pk = add_visit(customer_no, visit_date, service, total_price)
-            if new_pk:
-                st.success("✅ Visit added!")
-                st.rerun()
+# The visit list and, nested in it, the product-usage panel rerun on their own. Both re-read the
+# customer from its cache entry, which only a write for this customer drops.
+@page_fragment("Customer Detail", "visits")
+def visits_section(show_price: bool) -> None:
+    st.subheader("💈 Visits")
+    visits_df = detail_visits(get_customer_detail(customer_no) or customer)
+    visits = numbered(visits_df, ["VisitPK"])
+
+    if not show_price and not visits.empty:
+        visits = visits.drop(columns=["TotalPrice_Gross", "VAT", "NetIncome"], errors="ignore")
+
+    st.dataframe(visits, use_container_width=True)
+
+    with st.expander("➕ Add New Visit"):
+        with st.form("add_visit_form"):
+            visit_date = st.date_input("Visit Date", date.today())
+            service = st.text_input("Service")
+            total_price = st.number_input("Total Price (€)", min_value=0.0, step=0.5)
+            if st.form_submit_button("Add Visit"):
+                new_pk = add_visit(customer_no, visit_date, service, total_price)
+                if new_pk:
+                    st.success("✅ Visit added!")
+                    rerun_fragment()
+
+    st.divider()
+    products_used_section(show_price)
 
-st.divider()
 
 # ---------- PRODUCTS USED ----------
-st.subheader("🧴 Products Used")
-all_visits = supabase.table("Visits").select("*").eq("CustomerNo", customer_no).order("Date", desc=True).execute()
-visits_df = pd.DataFrame(all_visits.data) if all_visits.data else pd.DataFrame()
+# Adding products changes NetIncome in the visit list above, and a nested fragment can only rerun
+# itself, so that write reruns the page. Switching visits or searching stays inside this panel.
+@page_fragment("Customer Detail", "products used")
+def products_used_section(show_price: bool) -> None:
+    st.subheader("🧴 Products Used")
+    detail = get_customer_detail(customer_no) or customer
+    visits_df = detail_visits(detail)
+    if visits_df.empty:
+        st.info("No visits yet.")
+        return
 
-if not visits_df.empty:
     visit_options = {f"{v['Date']} – {v['Service']} (ID {v['VisitID']})": v["VisitPK"] for _, v in visits_df.iterrows()}
     selected_visit_label = st.selectbox("Select Visit", list(visit_options.keys()))
     selected_visit_pk = visit_options[selected_visit_label]
 
-    products_used = get_products_used(selected_visit_pk)
+    products_used = numbered(detail_products_used(detail, selected_visit_pk), ["ProductPK", "VisitPK", "ProductUsedPK"])
 
     if not show_price:
         products_used = products_used.drop(columns=["ProductCost"], errors="ignore")
 
     st.dataframe(products_used, use_container_width=True)
 
-    with st.expander("➕ Add Product Used"):
+    with st.expander("➕ Add Products Used"):
         products_df = get_products_list()
         search_term = st.text_input("Search product")
-        if search_term:
-            products_df = products_df[
-                products_df.apply(
-                    lambda x: search_term.lower() in str(x["ProductName"]).lower()
-                    or search_term.lower() in str(x["Brand"]).lower()
-                    or search_term.lower() in str(x["ColorNo"]).lower(),
-                    axis=1,
-                )
-            ]
+        if search_term and not products_df.empty:
+            haystack = (products_df["ProductName"].fillna("").astype(str)
+                        + " " + products_df["Brand"].fillna("").astype(str)
+                        + " " + products_df["ColorNo"].fillna("").astype(str)).str.lower()
+            products_df = products_df[haystack.str.contains(search_term.lower(), regex=False)]
         if products_df.empty:
             st.warning("No products found.")
-        else:
-            product_names = products_df["ProductName"].tolist()
-            with st.form("add_product_form"):
-                selected_product = st.selectbox("Product", product_names)
-                pinfo = products_df.loc[products_df["ProductName"] == selected_product].iloc[0]
-                st.markdown(
-                    f"**Brand:** {pinfo['Brand']}  \n"
-                    f"**ColorNo:** {pinfo['ColorNo']}  \n"
-                    f"**Price/g:** {pinfo['PricePerGram']} €"
-                )
-                weight_used = st.number_input("Weight Used (g)", min_value=0.0, step=0.5)
-                if st.form_submit_button("Add Product"):
-                    add_product_used(selected_visit_pk, selected_product, weight_used)
-                    st.success(f"✅ Added {selected_product}")
+            return
+        # One label per catalog id; the id suffix keeps same-named products apart. Blanks are filled first:
+        # pandas keeps NaN through astype(str), and one NaN option breaks the whole SelectboxColumn.
+        labels = (products_df["Brand"].fillna("").astype(str) + " " + products_df["ProductName"].fillna("").astype(str)
+                  + " " + products_df["ColorNo"].fillna("").astype(str)
+                  + " · " + products_df["PricePerGram"].fillna("?").astype(str) + " €/g (#"
+                  + products_df["id"].astype(str) + ")").str.strip()
+        label_to_id = dict(zip(labels, products_df["id"]))
+        with st.form("add_product_form"):
+            st.caption("Add one row per product used, then save them all at once.")
+            batch = st.data_editor(
+                pd.DataFrame({"Product": pd.Series(dtype="object"), "Weight Used (g)": pd.Series(dtype="float")}),
+                num_rows="dynamic",
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    "Product": st.column_config.SelectboxColumn("Product", options=list(labels), required=True),
+                    "Weight Used (g)": st.column_config.NumberColumn("Weight Used (g)", min_value=0.0, step=0.5, required=True),
+                },
+                key="products_used_batch",
+            )
+            if st.form_submit_button("Add Products"):
+                batch = batch.dropna()
+                items = [(label_to_id[p], float(w)) for p, w in zip(batch["Product"], batch["Weight Used (g)"])
+                         if p in label_to_id]
+                if items:
+                    added = add_products_used(customer_no, selected_visit_pk, items)
+                    st.success(f"✅ Added {added} product(s)")
                     st.rerun()
-else:
-    st.info("No visits yet.")
+                else:
+                    st.warning("Add at least one product and weight.")
+
+
+visits_section(show_price)
 
+end_rerun()
@@ -0,0 +1,78 @@
+import streamlit as st
+from datetime import date
+
+from db import get_rollup_report
+from metrics import begin_rerun, end_rerun
+from rollup import BUSINESS_TZ, GRAINS, per_period, report_frames
+
+st.set_page_config(page_title="📈 Analytics", layout="wide")
+begin_rerun("Analytics")
+
+st.title("📈 Revenue & VAT Analytics")
+st.caption("From the daily rollup (sql/007_daily_rollup.sql); new visits and sales show up as they are saved. "
+           f"Sales count toward their day in {BUSINESS_TZ} time.")
+
+# ---------- FILTERS ----------
+today = date.today()
+c1, c2, c3 = st.columns(3)
+start = c1.date_input("From", date(today.year - 1, 1, 1))
+end = c2.date_input("To", today)
+grain = c3.selectbox("Group by", list(GRAINS), index=list(GRAINS).index("Month"))
+if start > end:
+    st.error("'From' must be before 'To'.")
+    st.stop()
+
+periods, services = report_frames(get_rollup_report(start, end, GRAINS[grain]))
+if periods.empty:
+    st.info("No visits or sales in this range. If there is history, backfill the rollup with `python rollup.py`.")
+    st.stop()
+
+# ---------- TOTALS ----------
+# Retail rows carry revenue excl. VAT where service rows carry net income (see rollup.per_period)
+totals = per_period(periods)
+t1, t2, t3, t4, t5, t6 = st.columns(6)
+t1.metric("Revenue (incl. VAT)", f"€{totals['Gross'].sum():,.2f}")
+t2.metric("VAT", f"€{totals['VAT'].sum():,.2f}")
+t3.metric("Service net income", f"€{totals['ServiceNetIncome'].sum():,.2f}")
+t4.metric("Retail sales (excl. VAT)", f"€{totals['RetailSalesEx'].sum():,.2f}")
+t5.metric("Product cost", f"€{totals['ProductCost'].sum():,.2f}")
+visits = int(periods.loc[periods["Kind"] == "service", "Count"].sum())
+t6.metric("Visits / sales", f"{visits} / {int(periods['Count'].sum()) - visits}")
+
+# ---------- PER PERIOD ----------
+st.subheader(f"Per {grain.lower()}")
+st.bar_chart(totals[["Gross", "VAT", "ServiceNetIncome", "RetailSalesEx"]], stack=False)
+
+by_kind = periods.pivot_table(index="Period", columns="Kind", values="Gross", aggfunc="sum", fill_value=0.0)
+st.markdown("**Revenue: services vs retail**")
+st.area_chart(by_kind)
+
+with st.expander("Table"):
+    st.dataframe(
+        totals.reset_index().assign(Period=lambda d: d["Period"].dt.date),
+        hide_index=True, use_container_width=True,
+        column_config={c: st.column_config.NumberColumn(format="€%.2f") for c in totals.columns}
+        | {"ServiceNetIncome": st.column_config.NumberColumn("Service net income", format="€%.2f"),
+           "RetailSalesEx": st.column_config.NumberColumn("Retail sales (excl. VAT)", format="€%.2f")},
+    )
+
+# ---------- PER SERVICE ----------
+st.subheader("💇 Product cost share per service")
+if services.empty:
+    st.info("No visits in this range.")
+else:
+    st.dataframe(
+        services[["Service", "Count", "Gross", "NetSales", "ProductCost", "CostShare", "NetIncome"]]
+        .assign(CostShare=lambda d: d["CostShare"] * 100),
+        hide_index=True, use_container_width=True,
+        column_config={
+            "Count": st.column_config.NumberColumn("Visits"),
+            "Gross": st.column_config.NumberColumn("Revenue (incl. VAT)", format="€%.2f"),
+            "NetSales": st.column_config.NumberColumn("Revenue (excl. VAT)", format="€%.2f"),
+            "ProductCost": st.column_config.NumberColumn("Product cost", format="€%.2f"),
+            "CostShare": st.column_config.ProgressColumn("Cost share", format="%.1f%%", min_value=0, max_value=100),
+            "NetIncome": st.column_config.NumberColumn("Net income", format="€%.2f"),
+        },
+    )
+
+end_rerun()
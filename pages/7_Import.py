@@ -0,0 +1,76 @@
+import streamlit as st
+
+from importer import CHUNK_ROWS, TARGETS, map_headers, read_chunks, run_import
+from metrics import begin_rerun, end_rerun
+
+st.set_page_config(page_title="📥 Import", layout="wide")
+begin_rerun("Import")
+
+st.title("📥 Bulk Import")
+st.caption(f"CSV or Excel, read {CHUNK_ROWS:,} rows at a time. Headers are matched loosely "
+           "('Full name', 'full_name' and 'FullName' all work).")
+
+# ---------- SETTINGS ----------
+c1, c2 = st.columns(2)
+target_name = c1.selectbox("Import into", list(TARGETS))
+mode = c2.radio("Rows that already exist", ["Skip", "Update"], horizontal=True,
+                help="Matched by phone/email/name for customers, brand + name (+ color) for products, "
+                     "category + name for services.")
+target = TARGETS[target_name]
+st.caption("Columns: " + ", ".join(c for c in target.columns if c not in {"UpdatedAt"}))
+
+upload = st.file_uploader("File", type=["csv", "txt", "xlsx"])
+if upload is None:
+    st.stop()
+
+# ---------- PREVIEW ----------
+try:
+    first, _ = next(read_chunks(upload, upload.name, chunk_rows=20))
+except StopIteration:
+    st.warning("The file has no rows.")
+    st.stop()
+except Exception as e:
+    st.error(f"❌ Could not read the file: {e}")
+    st.stop()
+st.markdown("**Preview**")
+st.dataframe(map_headers(first, target), hide_index=True, use_container_width=True)
+
+# ---------- IMPORT ----------
+pw = st.text_input("🔐 Admin password", type="password")
+if st.button("📥 Import", type="primary"):
+    if pw != st.secrets.get("app_password"):
+        st.error("❌ Incorrect password — nothing imported.")
+        st.stop()
+
+    bar = st.progress(0.0, text="Reading existing rows…")
+
+    def show_progress(fraction: float, summary: dict) -> None:
+        bar.progress(fraction, text=f"{summary['read']:,} rows read · {summary['inserted']:,} added · "
+                                    f"{summary['updated']:,} updated")
+
+    upload.seek(0)
+    try:
+        result = run_import(upload, upload.name, target_name, update_existing=mode == "Update",
+                            on_progress=show_progress)
+    except Exception as e:
+        st.error(f"❌ Import stopped: {e}")
+        st.stop()
+    bar.progress(1.0, text="Done")
+
+    m1, m2, m3, m4, m5 = st.columns(5)
+    m1.metric("Rows read", f"{result['read']:,}")
+    m2.metric("Added", f"{result['inserted']:,}")
+    m3.metric("Updated", f"{result['updated']:,}")
+    m4.metric("Duplicates skipped", f"{result['duplicates']:,}")
+    m5.metric("Invalid", f"{result['invalid']:,}")
+
+    errors = result["errors"]
+    if not errors.empty:
+        st.warning(f"⚠️ {result['invalid']:,} row(s) were not imported.")
+        st.dataframe(errors, hide_index=True, use_container_width=True)
+        st.download_button("⬇️ Download errors (CSV)", errors.to_csv(index=False).encode("utf-8"),
+                           file_name=f"import_errors_{target.table}.csv", mime="text/csv")
+    else:
+        st.success("✅ All rows imported.")
+
+end_rerun()
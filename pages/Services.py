@@ -1,46 +1,11 @@
 import streamlit as st
-import pandas as pd
-from supabase import create_client, Client
 
-st.set_page_config(page_title="💇‍♀️ Services Manager", layout="wide")
-
-# --- DB Connection ---
-@st.cache_resource
-def get_client() -> Client:
-    url = st.secrets["SUPABASE_URL"]
-    key = st.secrets["SUPABASE_KEY"]
-    return create_client(url, key)
-
-supabase = get_client()
+from db import load_services, save_services, add_service
+from metrics import begin_rerun, end_rerun
+from offline import OfflineError
 
-# --- Load Services ---
-def load_services(search_query=""):
-    query = supabase.table("Services").select("*")
-    if search_query:
-        query = query.ilike("ServiceName", f"%{search_query}%") \
-                     .or_().ilike("Category", f"%{search_query}%")
-    res = query.execute()
-    return pd.DataFrame(res.data) if res.data else pd.DataFrame()
-
-# --- Update Service ---
-def update_service(row):
-    supabase.table("Services").update({
-        "Category": row["Category"],
-        "ServiceName": row["ServiceName"],
-        "Duration": row["Duration"],
-        "Price_EUR": row["Price_EUR"],
-        "Active": row["Active"]
-    }).eq("id", row["id"]).execute()
-
-# --- Add New Service ---
-def add_service(category, name, duration, price, active):
-    supabase.table("Services").insert({
-        "Category": category,
-        "ServiceName": name,
-        "Duration": duration,
-        "Price_EUR": price,
-        "Active": active
-    }).execute()
+st.set_page_config(page_title="💇‍♀️ Services Manager", layout="wide")
+begin_rerun("Services")
 
 # --- UI ---
 st.title("💇‍♀️ Services Manager")
@@ -52,15 +17,19 @@ if services.empty:
     st.warning("No services found.")
 else:
     st.write(f"Found {len(services)} services.")
-    edited_df = st.data_editor(services, use_container_width=True, hide_index=True, key="editable_services")
+    edited_df = st.data_editor(services, use_container_width=True, hide_index=True,
+                               column_config={"UpdatedAt": None}, key="editable_services")
 
     if st.button("💾 Save Changes"):
         pw = st.text_input("🔐 Enter admin password to confirm changes", type="password")
         if pw == st.secrets.get("app_password"):
-            with st.spinner("Saving updates..."):
-                for _, row in edited_df.iterrows():
-                    update_service(row)
-            st.success("✅ Changes saved successfully!")
+            try:
+                with st.spinner("Saving updates..."):
+                    changed = save_services(services, edited_df)
+            except OfflineError as e:
+                st.error(f"📴 {e}")
+            else:
+                st.success(f"✅ Saved {changed} changed service(s).")
         else:
             st.error("❌ Incorrect password — no changes saved.")
 
@@ -81,6 +50,12 @@ with st.form("add_service_form"):
         if not name.strip():
             st.error("Service Name cannot be empty.")
         else:
-            add_service(category, name, duration, price, active)
-            st.success(f"✅ Added new service: {name}")
-            st.rerun()
+            try:
+                add_service(category, name, duration, price, active)
+            except OfflineError as e:
+                st.error(f"📴 {e}")
+            else:
+                st.success(f"✅ Added new service: {name}")
+                st.rerun()
+
+end_rerun()
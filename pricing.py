@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+# ---------- CONSTANTS ----------
+VAT_DEFAULT = 0.255   # 25.5% VAT
+PROFIT_MARGIN = 0.5   # 50% margin on BuyPriceEx
+VISIT_OVERHEAD = 2.0  # fixed cost taken off every visit's net income
+
+
+# ---------- ROUNDING ----------
+def round_cents(values):
+    """Round half away from zero to whole cents (2.675 -> 2.68, unlike np.round's 2.67)."""
+    x = np.asarray(values, dtype=float)
+    # the epsilon absorbs binary representation error (2.675 is stored as 2.67499...)
+    return np.sign(x) * np.floor(np.abs(x) * 100 + 0.5 + 1e-9) / 100
+
+
+# ---------- PRODUCTS ----------
+def price_products(df: pd.DataFrame, margin: float = PROFIT_MARGIN, vat: float = VAT_DEFAULT) -> pd.DataFrame:
+    """Derive BuyPriceInc, SellPriceEx, SellPriceInc and ProfitAbs from BuyPriceEx for every row at once."""
+    out = df.copy()
+    buy_ex = pd.to_numeric(out["BuyPriceEx"], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+    sell_ex = round_cents(buy_ex * (1 + margin))
+    out["BuyPriceEx"] = buy_ex
+    out["BuyPriceInc"] = round_cents(buy_ex * (1 + vat))
+    out["SellPriceEx"] = sell_ex
+    out["SellPriceInc"] = round_cents(sell_ex * (1 + vat))
+    out["ProfitAbs"] = round_cents(buy_ex * margin)
+    return out
+
+
+# ---------- SALE LINES ----------
+def price_lines(df: pd.DataFrame, vat: float = VAT_DEFAULT) -> pd.DataFrame:
+    """Price cart/sale lines from BasePriceEx, Qty and DiscountPct (optionally BuyPriceEx).
+
+    Adds UnitSellEx/Inc, LineTotalEx/Inc, LineVAT and, when buy prices are
+    known, LineProfit. Unit prices are rounded to cents before multiplying so
+    the line total always equals what the receipt shows per unit.
+    """
+    out = df.copy()
+    base_ex = out["BasePriceEx"].to_numpy(dtype=float)
+    qty = out["Qty"].to_numpy(dtype=float)
+    discount = np.clip(out["DiscountPct"].fillna(0.0).to_numpy(dtype=float), 0.0, 100.0)
+
+    unit_ex = round_cents(base_ex * (1 - discount / 100.0))
+    unit_inc = round_cents(unit_ex * (1 + vat))
+    out["DiscountPct"] = discount
+    out["VATRate"] = vat
+    out["UnitSellEx"] = unit_ex
+    out["UnitSellInc"] = unit_inc
+    out["LineTotalEx"] = round_cents(unit_ex * qty)
+    out["LineTotalInc"] = round_cents(unit_inc * qty)
+    out["LineVAT"] = round_cents(out["LineTotalInc"] - out["LineTotalEx"])
+    if "BuyPriceEx" in out:
+        out["LineProfit"] = round_cents((unit_ex - out["BuyPriceEx"].to_numpy(dtype=float)) * qty)
+    return out
+
+
+def totals(lines: pd.DataFrame) -> dict:
+    """Basket totals from priced lines."""
+    if lines.empty:
+        return {"items": 0, "total_ex": 0.0, "total_inc": 0.0, "vat": 0.0}
+    total_ex = float(round_cents(lines["LineTotalEx"].sum()))
+    total_inc = float(round_cents(lines["LineTotalInc"].sum()))
+    return {
+        "items": int(lines["Qty"].sum()),
+        "total_ex": total_ex,
+        "total_inc": total_inc,
+        "vat": float(round_cents(total_inc - total_ex)),
+    }
+
+
+# ---------- SERVICES ----------
+def vat_from_gross(gross, vat: float = VAT_DEFAULT):
+    """VAT contained in a VAT-inclusive price."""
+    gross = np.asarray(gross, dtype=float)
+    return round_cents(gross - gross / (1 + vat))
@@ -0,0 +1,337 @@
+"""Retries, deadlines and hedged reads for every backend request.
+
+db.get_client() wraps the client in `ResilientClient`, so each `execute()`
+goes through one process-wide `Executor`:
+
+- transient failures (connection errors, timeouts, 5xx/429, PostgREST's
+  connection codes, serialization failures and deadlocks) are retried with
+  full-jitter exponential backoff;
+- only idempotent requests are retried after they may have reached the
+  server: reads, upserts, updates, deletes and the read-only RPCs. Inserts
+  and confirm_sale are retried only when the request was never sent;
+- one user action (a page rerun, see metrics.begin_rerun) gets ACTION_BUDGET
+  seconds in total, and no backoff sleeps past it;
+- with the `hedge_reads` setting on, a read still running after its recent
+  p95 latency gets one duplicate request and the first answer wins.
+
+Every attempt is recorded by metrics.py; retries and hedges are counted there
+too, and `Executor.stats()` has per-request latencies. For testing, the
+`faults` setting wraps the backend in `FaultyBackend`, e.g.
+
+    SALON_BACKEND=sqlite SALON_FAULTS="error=0.2,timeout=0.1,slow=0.1,seed=7" streamlit run app.py
+
+tests/test_resilience.py pins the retry rules the same way, over FaultyBackend(SQLiteBackend).
+"""
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass
+from typing import Callable
+
+import httpx
+from postgrest.exceptions import APIError
+
+RETRY_ATTEMPTS = 4          # attempts per request, first one included
+BACKOFF_BASE = 0.1          # seconds; attempt n waits up to BACKOFF_BASE * 2**n
+BACKOFF_CAP = 2.0           # longest single backoff
+ACTION_BUDGET = 10.0        # seconds one user action may spend, retries included
+HEDGE_MIN_SAMPLES = 20      # latencies needed before a p95 is trusted
+LATENCY_WINDOW = 200        # recent latencies kept per request shape
+
+WRITE_OPS = {"insert", "upsert", "update", "delete"}
+IDEMPOTENT_OPS = {"select", "upsert", "update", "delete"}   # repeating them changes nothing
+READ_RPCS = {"search_customers", "rollup_report"}
+IDEMPOTENT_RPCS = READ_RPCS | {"rebuild_daily_rollup"}
+# PostgREST: can't connect / pool timeout; Postgres: connection class, serialization, deadlock, shutdown
+TRANSIENT_CODES = {"PGRST000", "PGRST001", "PGRST002", "PGRST003", "40001", "40P01", "57P01", "53300"}
+
+
+# ---------- CLASSIFICATION ----------
+def classify(exc: BaseException) -> str | None:
+    """'unsent' (never reached the server: safe to retry anything), 'transient'
+    (may have been applied: retry idempotent requests only) or None (permanent)."""
+    if isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return "unsent"
+    if isinstance(exc, httpx.TransportError):
+        return "transient"
+    if isinstance(exc, APIError):
+        code = str(exc.code or "")
+        if code == "429":
+            return "unsent"
+        if code.isdigit() and 500 <= int(code) < 600 and code != "501":
+            return "transient"
+        if code in TRANSIENT_CODES or code.startswith("08"):
+            return "transient"
+    return None
+
+
+# ---------- EXECUTOR ----------
+@dataclass(frozen=True)
+class RetryPolicy:
+    attempts: int = RETRY_ATTEMPTS
+    base: float = BACKOFF_BASE
+    cap: float = BACKOFF_CAP
+    budget: float = ACTION_BUDGET
+
+    def backoff(self, attempt: int, rng: Callable[[], float] = random.random) -> float:
+        """Full jitter: uniform in [0, min(cap, base * 2**attempt)]."""
+        return rng() * min(self.cap, self.base * 2 ** attempt)
+
+
+class Executor:
+    """Runs request callables with retries, a deadline and optional hedging."""
+
+    def __init__(self, policy: RetryPolicy = RetryPolicy(), hedge: bool = False, recorder=None,
+                 sleep: Callable[[float], None] = time.sleep, rng: Callable[[], float] = random.random,
+                 clock: Callable[[], float] = time.perf_counter):
+        self.policy = policy
+        self.hedge = hedge
+        self.recorder = recorder        # metrics.Recorder, or None
+        self._sleep = sleep
+        self._rng = rng
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._latency: dict[tuple, deque] = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+        self._counts: dict[tuple, dict] = defaultdict(lambda: dict.fromkeys(
+            ["requests", "retries", "failures", "hedges", "hedge_wins"], 0))
+        self._pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge") if hedge else None
+
+    def run(self, call: Callable, *, table: str, op: str, idempotent: bool, read: bool = False,
+            deadline: float | None = None):
+        """`call()` until it succeeds, fails permanently or the deadline (perf_counter time) is near."""
+        key = (table, op)
+        deadline = deadline if deadline is not None else self._clock() + self.policy.budget
+        self._count(key, "requests")
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                result = self._hedged(call, key) if read and self.hedge else call()
+            except Exception as e:
+                kind = classify(e)
+                retryable = kind == "unsent" or (kind == "transient" and idempotent)
+                delay = self.policy.backoff(attempt, self._rng)
+                attempt += 1
+                if not retryable or attempt >= self.policy.attempts or self._clock() + delay > deadline:
+                    self._count(key, "failures")
+                    raise
+                self._count(key, "retries")
+                if self.recorder is not None:
+                    self.recorder.record_retry(table, op, kind)
+                self._sleep(delay)
+                continue
+            with self._lock:
+                self._latency[key].append(time.perf_counter() - started)
+            return result
+
+    def _hedged(self, call: Callable, key: tuple):
+        p95 = self.p95(key)
+        if p95 is None:
+            return call()
+        first = self._pool.submit(call)
+        try:
+            return first.result(timeout=p95)
+        except FutureTimeout:
+            pass
+        self._count(key, "hedges")
+        second = self._pool.submit(call)
+        pending = {first, second}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    won = future is second
+                    if won:
+                        self._count(key, "hedge_wins")
+                    if self.recorder is not None:
+                        self.recorder.record_hedge(key[0], key[1], won)
+                    return future.result()
+        raise first.exception()
+
+    def p95(self, key: tuple) -> float | None:
+        with self._lock:
+            samples = sorted(self._latency.get(key, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[int(0.95 * (len(samples) - 1))]
+
+    def _count(self, key: tuple, name: str) -> None:
+        with self._lock:
+            self._counts[key][name] += 1
+
+    def stats(self) -> list[dict]:
+        """Per (table, op): request/retry/failure/hedge counts and p50/p95 latency in ms."""
+        with self._lock:
+            keys = sorted(set(self._counts) | set(self._latency))
+            snapshot = {k: (dict(self._counts.get(k, {})), sorted(self._latency.get(k, ()))) for k in keys}
+        out = []
+        for (table, op), (counts, samples) in snapshot.items():
+            pick = (lambda q: samples[int(q * (len(samples) - 1))] * 1000) if samples else (lambda q: None)
+            out.append({"table": table, "op": op, **counts, "p50_ms": pick(0.5), "p95_ms": pick(0.95)})
+        return out
+
+
+# ---------- CLIENT WRAPPER ----------
+class _RetryingQuery:
+    """Query-builder proxy: notes the operation and sends `execute()` through the executor."""
+
+    def __init__(self, target, client: "ResilientClient", table: str, op: str, rpc: str | None = None):
+        self._target = target
+        self._client = client
+        self._table = table
+        self._op = op
+        self._rpc = rpc
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name == "execute":
+            return self._execute
+        if not callable(attr):          # e.g. the `not_` property
+            return self._wrap(attr, name)
+        return lambda *args, **kwargs: self._wrap(attr(*args, **kwargs), name)
+
+    def _wrap(self, result, name: str):
+        if not hasattr(result, "execute"):
+            return result
+        op = name if name in WRITE_OPS or name == "select" else self._op
+        return _RetryingQuery(result, self._client, self._table, op, self._rpc)
+
+    def _execute(self):
+        target = self._target
+        if hasattr(target, "retry"):
+            target = target.retry(False)    # postgrest's own GET retry; one layer decides
+        if self._rpc is not None:
+            idempotent, read = self._rpc in IDEMPOTENT_RPCS, self._rpc in READ_RPCS
+        else:
+            idempotent, read = self._op in IDEMPOTENT_OPS, self._op == "select"
+        return self._client.executor.run(self._client.bound(target.execute), table=self._table, op=self._op,
+                                         idempotent=idempotent, read=read, deadline=self._client.deadline())
+
+
+class ResilientClient:
+    """Wraps a (metrics-instrumented) client; everything else passes straight through."""
+
+    def __init__(self, client, executor: Executor):
+        self._client = client
+        self.executor = executor
+
+    def table(self, name: str):
+        return _RetryingQuery(self._client.table(name), self, name, "select")
+
+    def from_(self, name: str):
+        return self.table(name)
+
+    def rpc(self, name: str, *args, **kwargs):
+        return _RetryingQuery(self._client.rpc(name, *args, **kwargs), self, f"rpc:{name}", "rpc", rpc=name)
+
+    def deadline(self) -> float:
+        """End of the current user action's budget (perf_counter time)."""
+        from metrics import current_rerun
+
+        rerun = current_rerun()
+        started = rerun["started"] if rerun and not rerun["done"] else time.perf_counter()
+        return started + self.executor.policy.budget
+
+    @staticmethod
+    def bound(execute: Callable) -> Callable:
+        """`execute` filed under the calling page's rerun, even on a hedge thread."""
+        from metrics import bind_rerun, current_rerun
+
+        rerun = current_rerun()
+
+        def call():
+            with bind_rerun(rerun):
+                return execute()
+        return call
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def resilient(client, hedge: bool = False, recorder=None) -> ResilientClient:
+    return ResilientClient(client, Executor(hedge=hedge, recorder=recorder))
+
+
+# ---------- FAULT INJECTION ----------
+class _FaultyQuery:
+    def __init__(self, target, backend: "FaultyBackend"):
+        self._target = target
+        self._backend = backend
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name == "execute":
+            return lambda: self._backend.inject(attr)
+        if not callable(attr):
+            return _FaultyQuery(attr, self._backend) if hasattr(attr, "execute") else attr
+
+        def chained(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            return _FaultyQuery(result, self._backend) if hasattr(result, "execute") else result
+        return chained
+
+
+class FaultyBackend:
+    """Local stub that makes a backend misbehave like a flaky network.
+
+    `spec` is "name=value" pairs, probabilities per request:
+      refused - httpx.ConnectError before the request is applied
+      error   - a 503 APIError before the request is applied
+      timeout - httpx.ReadTimeout *after* the request was applied (the case
+                that makes retrying non-idempotent writes unsafe)
+      slow    - the request takes `delay` seconds longer (default 0.5)
+      seed    - makes the sequence of faults reproducible
+      down    - 1 starts with the network down: every request is refused
+                until set_down(False) (offline.status_panel has a switch)
+    """
+
+    def __init__(self, backend, spec: str | dict):
+        if isinstance(spec, str):
+            spec = dict(part.split("=", 1) for part in spec.replace(" ", "").split(",") if part)
+        self._backend = backend
+        self.rates = {name: float(spec.get(name, 0)) for name in ("refused", "error", "timeout", "slow")}
+        self.delay = float(spec.get("delay", 0.5))
+        self._rng = random.Random(int(spec["seed"])) if "seed" in spec else random.Random()
+        self.down = str(spec.get("down", "0")).lower() in ("1", "true", "yes")
+        self._lock = threading.Lock()
+        self.injected = defaultdict(int)
+
+    def set_down(self, down: bool) -> None:
+        self.down = down
+
+    def _roll(self, name: str) -> bool:
+        with self._lock:
+            hit = self._rng.random() < self.rates[name]
+            if hit:
+                self.injected[name] += 1
+            return hit
+
+    def inject(self, execute: Callable):
+        if self.down:
+            raise httpx.ConnectError("injected: network down")
+        if self._roll("refused"):
+            raise httpx.ConnectError("injected: connection refused")
+        if self._roll("error"):
+            raise APIError({"message": "JSON could not be generated", "code": 503,
+                            "hint": "injected", "details": "Service Unavailable"})
+        if self._roll("slow"):
+            time.sleep(self.delay)
+        result = execute()
+        if self._roll("timeout"):
+            raise httpx.ReadTimeout("injected: read timed out after the request was applied")
+        return result
+
+    def table(self, name: str):
+        return _FaultyQuery(self._backend.table(name), self)
+
+    def from_(self, name: str):
+        return self.table(name)
+
+    def rpc(self, name: str, *args, **kwargs):
+        return _FaultyQuery(self._backend.rpc(name, *args, **kwargs), self)
+
+    def __getattr__(self, name):
+        return getattr(self._backend, name)
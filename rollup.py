@@ -0,0 +1,137 @@
+"""Daily revenue rollup (sql/007_daily_rollup.sql) in pandas.
+
+The database keeps DailyRollup current with triggers. This module is the
+vectorized backfill path (build the same rows from Visits/Sales frames in one
+groupby, e.g. after an import or for generated data) and turns the
+rollup_report() result into the frames pages/6_Analytics.py charts.
+
+    python rollup.py            # rebuild DailyRollup here from Visits and Sales
+    python rollup.py --server   # rebuild_daily_rollup() in SQL, in one transaction
+
+The local rebuild replaces the table after reading everything, so run it
+while nobody is adding visits or selling.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from changeset import to_records
+from pricing import VISIT_OVERHEAD, round_cents
+from sqlite_backend import BUSINESS_TZ     # sales count toward the salon's local day, as in sql/007
+
+ROLLUP_COLUMNS = ["Day", "Kind", "Service", "Count", "Gross", "VAT", "NetIncome"]
+MONEY_COLUMNS = ["Gross", "VAT", "NetIncome"]
+GRAINS = {"Day": "day", "Week": "week", "Month": "month", "Year": "year"}
+
+
+# ---------- BUILD ----------
+def _sum_by(df: pd.DataFrame, keys: list[str]) -> pd.DataFrame:
+    return (df.groupby(keys, sort=False)
+              .agg(Count=("Gross", "size"), Gross=("Gross", "sum"), VAT=("VAT", "sum"),
+                   NetIncome=("NetIncome", "sum"))
+              .reset_index())
+
+
+def build_daily_rollup(visits: pd.DataFrame, sales: pd.DataFrame | None = None) -> pd.DataFrame:
+    """DailyRollup rows for the given Visits (and Sales) rows, same as rebuild_daily_rollup()."""
+    parts = []
+    if not visits.empty:
+        v = pd.DataFrame({
+            "Day": pd.to_datetime(visits["Date"], errors="coerce").dt.strftime("%Y-%m-%d"),
+            "Service": visits["Service"].fillna("").astype(str),
+            "Gross": pd.to_numeric(visits["TotalPrice_Gross"], errors="coerce").fillna(0.0),
+            "VAT": pd.to_numeric(visits["VAT"], errors="coerce").fillna(0.0),
+            "NetIncome": pd.to_numeric(visits["NetIncome"], errors="coerce").fillna(0.0),
+        }).dropna(subset=["Day"])
+        parts.append(_sum_by(v, ["Day", "Service"]).assign(Kind="service"))
+    if sales is not None and not sales.empty:
+        s = pd.DataFrame({
+            "Day": pd.to_datetime(sales["CreatedAt"], utc=True).dt.tz_convert(BUSINESS_TZ).dt.strftime("%Y-%m-%d"),
+            "Gross": pd.to_numeric(sales["TotalInc"]),
+            "VAT": pd.to_numeric(sales["VAT"]),
+            "NetIncome": pd.to_numeric(sales["TotalEx"]),
+        })
+        parts.append(_sum_by(s, ["Day"]).assign(Kind="retail", Service=""))
+    if not parts:
+        return pd.DataFrame(columns=ROLLUP_COLUMNS)
+
+    out = pd.concat(parts, ignore_index=True)
+    for column in MONEY_COLUMNS:
+        out[column] = round_cents(out[column])
+    return out[ROLLUP_COLUMNS].sort_values(["Day", "Kind", "Service"], ignore_index=True)
+
+
+# ---------- REPORT ----------
+def with_product_cost(df: pd.DataFrame) -> pd.DataFrame:
+    """Add NetSales (ex VAT), ProductCost and CostShare to service rollup rows.
+
+    Product cost is recovered from NetIncome = Gross - VAT - VISIT_OVERHEAD - cost
+    (db.add_visit, sql/004); retail rows have none recorded.
+    """
+    out = df.copy()
+    for column in MONEY_COLUMNS:
+        out[column] = pd.to_numeric(out[column]).astype(float)
+    out["NetSales"] = round_cents(out["Gross"] - out["VAT"])
+    cost = round_cents(out["NetSales"] - VISIT_OVERHEAD * out["Count"].astype(float) - out["NetIncome"])
+    if "Kind" in out:
+        cost = np.where(out["Kind"] == "service", cost, 0.0)
+    out["ProductCost"] = cost
+    out["CostShare"] = (out["ProductCost"] / out["NetSales"].where(out["NetSales"] != 0)).fillna(0.0)
+    return out
+
+
+def per_period(periods: pd.DataFrame) -> pd.DataFrame:
+    """Totals per period, with service net income and retail sales (excl. VAT) kept apart.
+
+    A retail row's NetIncome is TotalEx: sales don't record what the products
+    cost, so it is revenue without VAT, not income.
+    """
+    net = periods.pivot_table(index="Period", columns="Kind", values="NetIncome", aggfunc="sum", fill_value=0.0)
+    out = periods.groupby("Period")[["Gross", "VAT", "ProductCost"]].sum()
+    out["ServiceNetIncome"] = net["service"] if "service" in net else 0.0
+    out["RetailSalesEx"] = net["retail"] if "retail" in net else 0.0
+    return out
+
+
+def report_frames(report: dict) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """(per period and kind, per service) frames from db.get_rollup_report()."""
+    periods = pd.DataFrame(report.get("periods") or [])
+    services = pd.DataFrame(report.get("services") or [])
+    if not periods.empty:
+        periods = with_product_cost(periods)
+        periods["Period"] = pd.to_datetime(periods["Period"])
+    if not services.empty:
+        services = with_product_cost(services)
+    return periods, services
+
+
+# ---------- BACKFILL ----------
+def rebuild_locally() -> int:
+    """Read Visits and Sales, build the rollup in pandas and replace DailyRollup with it."""
+    # db needs streamlit; generate_data.py only wants build_daily_rollup
+    from db import bulk_insert, get_client, invalidate, read_all
+
+    visits = read_all("Visits", "VisitPK, Date, Service, TotalPrice_Gross, VAT, NetIncome", "VisitPK")
+    sales = read_all("Sales", "id, CreatedAt, TotalInc, VAT, TotalEx", "id")
+    rollup = build_daily_rollup(visits, sales)
+    get_client().table("DailyRollup").delete().gte("Day", "0001-01-01").execute()
+    invalidate("DailyRollup")
+    return len(bulk_insert("DailyRollup", to_records(rollup)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server", action="store_true", help="aggregate in SQL with rebuild_daily_rollup()")
+    args = parser.parse_args()
+
+    from db import rebuild_daily_rollup
+
+    started = time.perf_counter()
+    rows = rebuild_daily_rollup() if args.server else rebuild_locally()
+    print(f"✅ DailyRollup rebuilt: {rows:,} rows in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
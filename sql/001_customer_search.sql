@@ -0,0 +1,49 @@
+-- Ranked customer search used by db.search_customers (pages/1_Customers.py).
+-- Run once in the Supabase SQL editor. Safe to re-run.
+
+create extension if not exists pg_trgm;
+
+-- Phone numbers are typed in many formats ("040 123 4567", "+358401234567");
+-- keep a digits-only copy so "4012345" finds all of them.
+alter table "Customers"
+  add column if not exists "PhoneDigits" text
+  generated always as (regexp_replace(coalesce("Phone", ''), '\D', '', 'g')) stored;
+
+create index if not exists customers_customerno_text_idx
+  on "Customers" (("CustomerNo"::text) text_pattern_ops);
+create index if not exists customers_phonedigits_trgm_idx
+  on "Customers" using gin ("PhoneDigits" gin_trgm_ops);
+create index if not exists customers_fullname_trgm_idx
+  on "Customers" using gin ("FullName" gin_trgm_ops);
+create index if not exists customers_email_trgm_idx
+  on "Customers" using gin ("Email" gin_trgm_ops);
+
+-- Best matches first: exact / prefix customer number, then phone digits,
+-- then trigram similarity on name and email.
+create or replace function search_customers(q text, max_results int default 20)
+returns setof "Customers"
+language sql stable
+as $$
+  with term as (
+    select
+      lower(trim(q)) as t,
+      replace(replace(lower(trim(q)), '%', '\%'), '_', '\_') as pattern,
+      regexp_replace(q, '\D', '', 'g') as digits
+  )
+  select c.*
+  from "Customers" c, term
+  where c."CustomerNo"::text like term.pattern || '%'
+     or (length(term.digits) >= 3 and c."PhoneDigits" like '%' || term.digits || '%')
+     or c."FullName" ilike '%' || term.pattern || '%'
+     or c."Email" ilike '%' || term.pattern || '%'
+  order by
+    case
+      when c."CustomerNo"::text = term.t then 4
+      when c."CustomerNo"::text like term.pattern || '%' then 3
+      when length(term.digits) >= 3 and c."PhoneDigits" like '%' || term.digits || '%' then 2
+      else 1
+    end desc,
+    greatest(similarity(c."FullName", term.t), similarity(coalesce(c."Email", ''), term.t)) desc,
+    c."CustomerNo"
+  limit least(greatest(max_results, 1), 100);
+$$;
@@ -0,0 +1,128 @@
+-- Atomic checkout used by db.confirm_sell (pages/5_Retail_Sales.py).
+-- Run once in the Supabase SQL editor. Safe to re-run.
+--
+-- confirm_sale(session_id) validates stock for every cart line, decrements it,
+-- records the sale and clears the cart in one transaction. The cart's products
+-- are locked (FOR UPDATE, in id order) first, so two tills selling the same
+-- product serialize instead of both passing the stock check.
+--
+-- Returns {"ok": true, "sale_id": n, "errors": []} or
+--         {"ok": false, "sale_id": null, "errors": [{"product_id", "name",
+--          "requested", "available", "error"}, ...]} with nothing changed.
+--
+-- tests/test_checkout.py runs the SQLite port of this function (sqlite_backend.py)
+-- through a sale, an insufficient-stock refusal and a double confirm. This
+-- function itself is not tested: keep the two in step by hand.
+--
+-- Try it against a local Postgres (docker run -e POSTGRES_PASSWORD=x postgres,
+-- or `supabase start`) after creating the SaleProducts/SaleCart tables:
+--
+--   begin;
+--   insert into "SaleProducts" (id, "Name", "Quantity") values (900001, 'Test shampoo', 1);
+--   insert into "SaleCart" ("SessionID", "ProductID", "Name", "Qty", "DiscountPct", "VATRate",
+--                           "UnitSellEx", "UnitSellInc", "LineTotalEx", "LineTotalInc")
+--     values ('smoke', 900001, 'Test shampoo', 2, 0, 0.255, 10, 12.55, 20, 25.1);
+--   select confirm_sale('smoke');                         -- ok = false, available = 1
+--   update "SaleCart" set "Qty" = 1 where "SessionID" = 'smoke';
+--   select confirm_sale('smoke');                         -- ok = true
+--   select "Quantity" from "SaleProducts" where id = 900001;  -- 0
+--   rollback;
+
+create table if not exists "Sales" (
+  id bigint generated by default as identity primary key,
+  "SessionID" text not null,
+  "CreatedAt" timestamptz not null default now(),
+  "Items" numeric not null default 0,
+  "TotalEx" numeric not null default 0,
+  "TotalInc" numeric not null default 0,
+  "VAT" numeric not null default 0
+);
+
+create table if not exists "SaleLines" (
+  id bigint generated by default as identity primary key,
+  "SaleID" bigint not null references "Sales" (id) on delete cascade,
+  "ProductID" bigint not null,
+  "Name" text,
+  "Brand" text,
+  "Qty" numeric not null,
+  "DiscountPct" numeric not null default 0,
+  "VATRate" numeric not null,
+  "UnitSellEx" numeric not null,
+  "UnitSellInc" numeric not null,
+  "LineTotalEx" numeric not null,
+  "LineTotalInc" numeric not null
+);
+
+create index if not exists salelines_saleid_idx on "SaleLines" ("SaleID");
+
+create or replace function confirm_sale(p_session_id text)
+returns jsonb
+language plpgsql
+as $$
+declare
+  v_errors jsonb;
+  v_sale_id bigint;
+begin
+  perform 1
+  from "SaleProducts" p
+  where p.id in (select c."ProductID" from "SaleCart" c where c."SessionID" = p_session_id)
+  order by p.id
+  for update;
+
+  if not exists (select 1 from "SaleCart" where "SessionID" = p_session_id) then
+    return jsonb_build_object('ok', false, 'sale_id', null,
+      'errors', jsonb_build_array(jsonb_build_object('error', 'Cart is empty')));
+  end if;
+
+  with wanted as (
+    select "ProductID", min("Name") as "Name", sum("Qty") as qty
+    from "SaleCart"
+    where "SessionID" = p_session_id
+    group by "ProductID"
+  )
+  select jsonb_agg(jsonb_build_object(
+           'product_id', w."ProductID",
+           'name', w."Name",
+           'requested', w.qty,
+           'available', coalesce(p."Quantity", 0),
+           'error', case when p.id is null then 'Product no longer exists' else 'Not enough stock' end)
+         order by w."ProductID")
+  into v_errors
+  from wanted w
+  left join "SaleProducts" p on p.id = w."ProductID"
+  where p.id is null or p."Quantity" < w.qty;
+
+  if v_errors is not null then
+    return jsonb_build_object('ok', false, 'sale_id', null, 'errors', v_errors);
+  end if;
+
+  update "SaleProducts" p
+  set "Quantity" = round((p."Quantity" - w.qty)::numeric, 2),
+      "UpdatedAt" = now()
+  from (
+    select "ProductID", sum("Qty") as qty
+    from "SaleCart"
+    where "SessionID" = p_session_id
+    group by "ProductID"
+  ) w
+  where p.id = w."ProductID";
+
+  insert into "Sales" ("SessionID", "Items", "TotalEx", "TotalInc", "VAT")
+  select p_session_id, sum("Qty"), sum("LineTotalEx"), sum("LineTotalInc"),
+         round((sum("LineTotalInc") - sum("LineTotalEx"))::numeric, 2)
+  from "SaleCart"
+  where "SessionID" = p_session_id
+  returning id into v_sale_id;
+
+  insert into "SaleLines" ("SaleID", "ProductID", "Name", "Brand", "Qty", "DiscountPct", "VATRate",
+                           "UnitSellEx", "UnitSellInc", "LineTotalEx", "LineTotalInc")
+  select v_sale_id, "ProductID", "Name", "Brand", "Qty", coalesce("DiscountPct", 0), "VATRate",
+         "UnitSellEx", "UnitSellInc", "LineTotalEx", "LineTotalInc"
+  from "SaleCart"
+  where "SessionID" = p_session_id;
+
+  delete from "SaleCart" where "SessionID" = p_session_id;
+
+  return jsonb_build_object('ok', true, 'sale_id', v_sale_id, 'errors', '[]'::jsonb);
+end;
+$$;
@@ -0,0 +1,8 @@
+-- SaleCart write-behind (cart.py / db.save_cart) upserts on (SessionID, ProductID).
+-- Run once in the Supabase SQL editor. Safe to re-run.
+-- If it fails on existing duplicates, merge or delete them first:
+--   delete from "SaleCart" a using "SaleCart" b
+--   where a."SessionID" = b."SessionID" and a."ProductID" = b."ProductID" and a.id < b.id;
+
+create unique index if not exists salecart_session_product_uidx
+  on "SaleCart" ("SessionID", "ProductID");
@@ -0,0 +1,58 @@
+-- Keeps Visits.NetIncome in step with ProductsUsed (db.add_products_used).
+-- Run once in the Supabase SQL editor. Safe to re-run.
+--
+-- NetIncome = TotalPrice_Gross - VAT - 2 - sum(ProductCost). Instead of
+-- re-summing a visit's products on every add, each statement applies only the
+-- cost it inserted, deleted or changed. Statement-level triggers with
+-- transition tables mean a bulk insert of five products is one UPDATE.
+
+create or replace function productsused_apply_cost_delta()
+returns trigger
+language plpgsql
+as $$
+begin
+  if tg_op = 'INSERT' then
+    update "Visits" v
+    set "NetIncome" = round((v."NetIncome" - d.cost)::numeric, 2)
+    from (select "VisitPK", sum(coalesce("ProductCost", 0)) as cost
+          from new_rows group by "VisitPK") d
+    where v."VisitPK" = d."VisitPK";
+  elsif tg_op = 'DELETE' then
+    update "Visits" v
+    set "NetIncome" = round((v."NetIncome" + d.cost)::numeric, 2)
+    from (select "VisitPK", sum(coalesce("ProductCost", 0)) as cost
+          from old_rows group by "VisitPK") d
+    where v."VisitPK" = d."VisitPK";
+  else
+    update "Visits" v
+    set "NetIncome" = round((v."NetIncome" - d.cost)::numeric, 2)
+    from (select "VisitPK", sum(cost) as cost
+          from (select "VisitPK", coalesce("ProductCost", 0) as cost from new_rows
+                union all
+                select "VisitPK", -coalesce("ProductCost", 0) from old_rows) c
+          group by "VisitPK") d
+    where v."VisitPK" = d."VisitPK" and d.cost <> 0;
+  end if;
+  return null;
+end;
+$$;
+
+drop trigger if exists productsused_cost_insert on "ProductsUsed";
+create trigger productsused_cost_insert
+  after insert on "ProductsUsed"
+  referencing new table as new_rows
+  for each statement execute function productsused_apply_cost_delta();
+
+drop trigger if exists productsused_cost_delete on "ProductsUsed";
+create trigger productsused_cost_delete
+  after delete on "ProductsUsed"
+  referencing old table as old_rows
+  for each statement execute function productsused_apply_cost_delta();
+
+drop trigger if exists productsused_cost_update on "ProductsUsed";
+create trigger productsused_cost_update
+  after update on "ProductsUsed"
+  referencing new table as new_rows old table as old_rows
+  for each statement execute function productsused_apply_cost_delta();
+
+create index if not exists productsused_visitpk_idx on "ProductsUsed" ("VisitPK");
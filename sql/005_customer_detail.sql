@@ -0,0 +1,25 @@
+-- Foreign keys and indexes behind db.get_customer_detail, which loads a
+-- customer with its visits and products used in one request:
+--   Customers?select=*,Visits(*,ProductsUsed(*))&CustomerNo=eq.<n>
+-- PostgREST can only embed along foreign keys. Run once; safe to re-run.
+
+do $$
+begin
+  -- Skip if any FK already links the tables: two would make the embed ambiguous.
+  if not exists (select 1 from pg_constraint
+                 where contype = 'f' and conrelid = '"Visits"'::regclass and confrelid = '"Customers"'::regclass) then
+    alter table "Visits"
+      add constraint visits_customerno_fkey
+      foreign key ("CustomerNo") references "Customers" ("CustomerNo");
+  end if;
+  if not exists (select 1 from pg_constraint
+                 where contype = 'f' and conrelid = '"ProductsUsed"'::regclass and confrelid = '"Visits"'::regclass) then
+    alter table "ProductsUsed"
+      add constraint productsused_visitpk_fkey
+      foreign key ("VisitPK") references "Visits" ("VisitPK") on delete cascade;
+  end if;
+end;
+$$;
+
+create index if not exists visits_customerno_date_idx on "Visits" ("CustomerNo", "Date" desc);
+create index if not exists productsused_visitpk_idx on "ProductsUsed" ("VisitPK");
@@ -0,0 +1,48 @@
+-- Server-side allocation of CustomerNo and VisitID (db.add_customer, db.add_visit).
+-- Run once in the Supabase SQL editor. Safe to re-run.
+--
+-- The app used to read "max + 1" before every insert, which costs a query and
+-- lets two front-desk terminals pick the same number. Now:
+--   * CustomerNo comes from a sequence (starting at 7394, or after the current
+--     maximum), so inserts simply omit it and read it back from the response.
+--   * VisitID is numbered per customer (1, 2, 3, ...). A BEFORE INSERT trigger
+--     bumps Customers.LastVisitID; the row lock on the customer serializes
+--     concurrent visits for the same customer without blocking anyone else.
+
+create sequence if not exists customers_customerno_seq start with 7394;
+select setval('customers_customerno_seq',
+              greatest(7394, (select coalesce(max("CustomerNo"), 0) + 1 from "Customers")),
+              false);
+alter table "Customers" alter column "CustomerNo" set default nextval('customers_customerno_seq');
+alter sequence customers_customerno_seq owned by "Customers"."CustomerNo";
+
+alter table "Customers" add column if not exists "LastVisitID" integer not null default 0;
+update "Customers" c
+set "LastVisitID" = v.max_id
+from (select "CustomerNo", max("VisitID") as max_id from "Visits" group by "CustomerNo") v
+where v."CustomerNo" = c."CustomerNo" and c."LastVisitID" < v.max_id;
+
+create or replace function visits_assign_visitid()
+returns trigger
+language plpgsql
+as $$
+begin
+  if new."VisitID" is null then
+    update "Customers"
+    set "LastVisitID" = "LastVisitID" + 1
+    where "CustomerNo" = new."CustomerNo"
+    returning "LastVisitID" into new."VisitID";
+  else
+    -- explicit ids (imports, restores) move the counter forward too
+    update "Customers"
+    set "LastVisitID" = greatest("LastVisitID", new."VisitID")
+    where "CustomerNo" = new."CustomerNo";
+  end if;
+  return new;
+end;
+$$;
+
+drop trigger if exists visits_assign_visitid on "Visits";
+create trigger visits_assign_visitid
+  before insert on "Visits"
+  for each row execute function visits_assign_visitid();
@@ -0,0 +1,193 @@
+-- Daily revenue rollup behind pages/6_Analytics.py.
+-- Run once in the Supabase SQL editor. Safe to re-run; then fill it with
+-- `select rebuild_daily_rollup();` (or `python rollup.py` from a workstation).
+--
+-- One row per business day, kind and service: 'service' rows sum Visits,
+-- 'retail' rows sum Sales (Gross = TotalInc, NetIncome = TotalEx). Sales don't
+-- record what the products cost, so a retail NetIncome is revenue excl. VAT,
+-- not income; pages/6_Analytics.py shows it apart from service net income.
+-- A sale counts toward its day in Europe/Helsinki, the salon's local time
+-- (also sqlite_backend.BUSINESS_TZ, which the Python side reads). The
+-- statement-level triggers below apply only the rows each write touched, so
+-- add_visit, add_products_used (through the Visits.NetIncome update of
+-- 004_visit_net_income.sql) and confirm_sale keep it current without a rescan.
+-- Product cost is not stored: NetIncome already has it subtracted
+-- (NetIncome = Gross - VAT - 2 - product cost), see rollup.with_product_cost.
+--
+-- rollup_report() groups the days into weeks/months/years on the server and
+-- returns one jsonb value, so years of history come back as a few hundred
+-- rows and are not cut off at PostgREST's max-rows.
+
+create table if not exists "DailyRollup" (
+  "Day" date not null,
+  "Kind" text not null,
+  "Service" text not null default '',
+  "Count" bigint not null default 0,
+  "Gross" numeric not null default 0,
+  "VAT" numeric not null default 0,
+  "NetIncome" numeric not null default 0,
+  primary key ("Day", "Kind", "Service")
+);
+
+-- ---------- INCREMENTAL MAINTENANCE ----------
+create or replace function daily_rollup_apply_visits()
+returns trigger
+language plpgsql
+as $$
+begin
+  -- Each visit row counts +1 (new) or -1 (old) toward its day and service
+  if tg_op = 'INSERT' then
+    insert into "DailyRollup" as r ("Day", "Kind", "Service", "Count", "Gross", "VAT", "NetIncome")
+    select "Day", 'service', "Service", sum(n), sum(gross), sum(vat), sum(net)
+    from (select "Date"::date as "Day", coalesce("Service", '') as "Service", 1 as n,
+                 coalesce("TotalPrice_Gross", 0) as gross, coalesce("VAT", 0) as vat,
+                 coalesce("NetIncome", 0) as net
+          from new_rows) d
+    where "Day" is not null
+    group by "Day", "Service"
+    on conflict ("Day", "Kind", "Service") do update
+    set "Count" = r."Count" + excluded."Count",
+        "Gross" = round(r."Gross" + excluded."Gross", 2),
+        "VAT" = round(r."VAT" + excluded."VAT", 2),
+        "NetIncome" = round(r."NetIncome" + excluded."NetIncome", 2);
+  elsif tg_op = 'DELETE' then
+    insert into "DailyRollup" as r ("Day", "Kind", "Service", "Count", "Gross", "VAT", "NetIncome")
+    select "Day", 'service', "Service", sum(n), sum(gross), sum(vat), sum(net)
+    from (select "Date"::date as "Day", coalesce("Service", '') as "Service", -1 as n,
+                 -coalesce("TotalPrice_Gross", 0) as gross, -coalesce("VAT", 0) as vat,
+                 -coalesce("NetIncome", 0) as net
+          from old_rows) d
+    where "Day" is not null
+    group by "Day", "Service"
+    on conflict ("Day", "Kind", "Service") do update
+    set "Count" = r."Count" + excluded."Count",
+        "Gross" = round(r."Gross" + excluded."Gross", 2),
+        "VAT" = round(r."VAT" + excluded."VAT", 2),
+        "NetIncome" = round(r."NetIncome" + excluded."NetIncome", 2);
+  else
+    insert into "DailyRollup" as r ("Day", "Kind", "Service", "Count", "Gross", "VAT", "NetIncome")
+    select "Day", 'service', "Service", sum(n), sum(gross), sum(vat), sum(net)
+    from (select "Date"::date as "Day", coalesce("Service", '') as "Service", 1 as n,
+                 coalesce("TotalPrice_Gross", 0) as gross, coalesce("VAT", 0) as vat,
+                 coalesce("NetIncome", 0) as net
+          from new_rows
+          union all
+          select "Date"::date, coalesce("Service", ''), -1,
+                 -coalesce("TotalPrice_Gross", 0), -coalesce("VAT", 0), -coalesce("NetIncome", 0)
+          from old_rows) d
+    where "Day" is not null
+    group by "Day", "Service"
+    -- e.g. VisitID-only updates: nothing to apply
+    having sum(n) <> 0 or sum(gross) <> 0 or sum(vat) <> 0 or sum(net) <> 0
+    on conflict ("Day", "Kind", "Service") do update
+    set "Count" = r."Count" + excluded."Count",
+        "Gross" = round(r."Gross" + excluded."Gross", 2),
+        "VAT" = round(r."VAT" + excluded."VAT", 2),
+        "NetIncome" = round(r."NetIncome" + excluded."NetIncome", 2);
+  end if;
+  return null;
+end;
+$$;
+
+drop trigger if exists visits_rollup_insert on "Visits";
+create trigger visits_rollup_insert
+  after insert on "Visits"
+  referencing new table as new_rows
+  for each statement execute function daily_rollup_apply_visits();
+
+drop trigger if exists visits_rollup_delete on "Visits";
+create trigger visits_rollup_delete
+  after delete on "Visits"
+  referencing old table as old_rows
+  for each statement execute function daily_rollup_apply_visits();
+
+drop trigger if exists visits_rollup_update on "Visits";
+create trigger visits_rollup_update
+  after update on "Visits"
+  referencing new table as new_rows old table as old_rows
+  for each statement execute function daily_rollup_apply_visits();
+
+-- Sales are only ever inserted (confirm_sale)
+create or replace function daily_rollup_apply_sales()
+returns trigger
+language plpgsql
+as $$
+begin
+  insert into "DailyRollup" as r ("Day", "Kind", "Service", "Count", "Gross", "VAT", "NetIncome")
+  select ("CreatedAt" at time zone 'Europe/Helsinki')::date, 'retail', '',
+         count(*), sum("TotalInc"), sum("VAT"), sum("TotalEx")
+  from new_rows
+  group by 1
+  on conflict ("Day", "Kind", "Service") do update
+  set "Count" = r."Count" + excluded."Count",
+      "Gross" = round(r."Gross" + excluded."Gross", 2),
+      "VAT" = round(r."VAT" + excluded."VAT", 2),
+      "NetIncome" = round(r."NetIncome" + excluded."NetIncome", 2);
+  return null;
+end;
+$$;
+
+drop trigger if exists sales_rollup_insert on "Sales";
+create trigger sales_rollup_insert
+  after insert on "Sales"
+  referencing new table as new_rows
+  for each statement execute function daily_rollup_apply_sales();
+
+-- ---------- BATCH REBUILD ----------
+create or replace function rebuild_daily_rollup()
+returns bigint
+language plpgsql
+as $$
+declare
+  v_rows bigint;
+begin
+  lock table "DailyRollup" in exclusive mode;
+  delete from "DailyRollup";
+
+  insert into "DailyRollup" ("Day", "Kind", "Service", "Count", "Gross", "VAT", "NetIncome")
+  select "Date"::date, 'service', coalesce("Service", ''), count(*),
+         round(sum(coalesce("TotalPrice_Gross", 0)), 2), round(sum(coalesce("VAT", 0)), 2),
+         round(sum(coalesce("NetIncome", 0)), 2)
+  from "Visits"
+  where "Date" is not null
+  group by 1, 3
+  union all
+  select ("CreatedAt" at time zone 'Europe/Helsinki')::date, 'retail', '', count(*),
+         round(sum("TotalInc"), 2), round(sum("VAT"), 2), round(sum("TotalEx"), 2)
+  from "Sales"
+  group by 1;
+
+  select count(*) into v_rows from "DailyRollup";
+  return v_rows;
+end;
+$$;
+
+-- ---------- REPORT ----------
+create or replace function rollup_report(p_from date, p_to date, p_grain text default 'month')
+returns jsonb
+language sql
+stable
+as $$
+  select jsonb_build_object(
+    'periods', coalesce((
+      select jsonb_agg(p order by p."Period", p."Kind")
+      from (
+        select date_trunc(p_grain, "Day")::date as "Period", "Kind",
+               sum("Count") as "Count", sum("Gross") as "Gross", sum("VAT") as "VAT",
+               sum("NetIncome") as "NetIncome"
+        from "DailyRollup"
+        where "Day" between p_from and p_to
+        group by 1, 2
+      ) p), '[]'::jsonb),
+    'services', coalesce((
+      select jsonb_agg(s order by s."Gross" desc)
+      from (
+        select "Service", sum("Count") as "Count", sum("Gross") as "Gross", sum("VAT") as "VAT",
+               sum("NetIncome") as "NetIncome"
+        from "DailyRollup"
+        where "Kind" = 'service' and "Day" between p_from and p_to
+        group by 1
+        having sum("Count") <> 0
+      ) s), '[]'::jsonb)
+  );
+$$;
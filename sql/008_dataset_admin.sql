@@ -0,0 +1,74 @@
+-- Dataset management behind dataset.py (reset, seed, restore).
+-- Run once in the Supabase SQL editor. Safe to re-run.
+--
+-- truncate_app_data() empties every app table in one statement (one
+-- transaction, no row-by-row deletes) and restarts their id sequences.
+-- bulk_load() inserts a whole batch of rows as one INSERT ... SELECT over
+-- jsonb_populate_recordset. Rows come complete (ids, VisitID, NetIncome and
+-- the DailyRollup rows themselves), so the table's triggers are switched off
+-- for the load, and the id sequence is moved past the loaded ids afterwards.
+--
+-- Both are security definer and only the service role may call them:
+-- dataset.py needs the service_role key, never the anon key the app uses.
+
+create or replace function truncate_app_data()
+returns void
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+  truncate table "SaleLines", "Sales", "SaleCart", "ProductsUsed", "Visits", "Customers",
+                 "Products", "Services", "SaleProducts", "DailyRollup"
+    restart identity cascade;
+end;
+$$;
+
+create or replace function bulk_load(p_table text, p_rows jsonb)
+returns bigint
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+  v_columns text;
+  v_rows bigint;
+  v_column text;
+  v_sequence text;
+begin
+  if p_table not in ('Customers', 'Visits', 'ProductsUsed', 'Products', 'Services', 'SaleProducts',
+                     'SaleCart', 'Sales', 'SaleLines', 'DailyRollup') then
+    raise exception 'bulk_load: unknown table %', p_table;
+  end if;
+  if jsonb_array_length(p_rows) = 0 then
+    return 0;
+  end if;
+
+  -- Only the keys the rows carry, so omitted columns keep their defaults
+  select string_agg(format('%I', k), ', ') into v_columns from jsonb_object_keys(p_rows -> 0) k;
+
+  execute format('alter table %I disable trigger user', p_table);
+  execute format('insert into %1$I (%2$s) select %2$s from jsonb_populate_recordset(null::%1$I, $1)',
+                 p_table, v_columns)
+    using p_rows;
+  get diagnostics v_rows = row_count;
+  execute format('alter table %I enable trigger user', p_table);
+
+  for v_column, v_sequence in
+    select a.attname, pg_get_serial_sequence(format('%I', p_table), a.attname)
+    from pg_attribute a
+    where a.attrelid = format('%I', p_table)::regclass and a.attnum > 0 and not a.attisdropped
+  loop
+    if v_sequence is not null then
+      execute format('select setval(%L, max(%I)) from %I having max(%I) is not null',
+                     v_sequence, v_column, p_table, v_column);
+    end if;
+  end loop;
+  return v_rows;
+end;
+$$;
+
+revoke execute on function truncate_app_data() from public, anon, authenticated;
+revoke execute on function bulk_load(text, jsonb) from public, anon, authenticated;
+grant execute on function truncate_app_data() to service_role;
+grant execute on function bulk_load(text, jsonb) to service_role;
@@ -0,0 +1,123 @@
+-- UpdatedAt watermarks and delete tombstones behind db.TableSnapshot.
+-- Run once in the Supabase SQL editor (after 008). Safe to re-run.
+--
+-- The app keeps Products, Services and SaleProducts in memory and refreshes
+-- them with `UpdatedAt >= watermark` queries, so a rerun transfers only the
+-- rows that changed. That only works if every write moves UpdatedAt, whoever
+-- makes it (the pages, importer.py, confirm_sale, the SQL editor), so a
+-- trigger sets it instead of the callers. Customers gets the same column.
+--
+-- Deletes leave no row to find by UpdatedAt: a statement-level trigger
+-- records each deleted key in "DeletedRows", and the snapshots read those
+-- tombstones by "DeletedAt". Tombstones older than a day are purged as new
+-- ones are written; the app re-reads every table in full far more often.
+
+-- ---------- UPDATEDAT ----------
+alter table "Products" add column if not exists "UpdatedAt" timestamptz not null default now();
+alter table "Services" add column if not exists "UpdatedAt" timestamptz not null default now();
+alter table "Customers" add column if not exists "UpdatedAt" timestamptz not null default now();
+update "SaleProducts" set "UpdatedAt" = now() where "UpdatedAt" is null;
+alter table "SaleProducts" alter column "UpdatedAt" set default now();
+
+create index if not exists products_updatedat_idx on "Products" ("UpdatedAt");
+create index if not exists services_updatedat_idx on "Services" ("UpdatedAt");
+create index if not exists customers_updatedat_idx on "Customers" ("UpdatedAt");
+create index if not exists saleproducts_updatedat_idx on "SaleProducts" ("UpdatedAt");
+
+create or replace function set_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+  new."UpdatedAt" := now();
+  return new;
+end;
+$$;
+
+drop trigger if exists products_set_updated_at on "Products";
+create trigger products_set_updated_at
+  before insert or update on "Products"
+  for each row execute function set_updated_at();
+
+drop trigger if exists services_set_updated_at on "Services";
+create trigger services_set_updated_at
+  before insert or update on "Services"
+  for each row execute function set_updated_at();
+
+drop trigger if exists customers_set_updated_at on "Customers";
+create trigger customers_set_updated_at
+  before insert or update on "Customers"
+  for each row execute function set_updated_at();
+
+drop trigger if exists saleproducts_set_updated_at on "SaleProducts";
+create trigger saleproducts_set_updated_at
+  before insert or update on "SaleProducts"
+  for each row execute function set_updated_at();
+
+-- ---------- TOMBSTONES ----------
+create table if not exists "DeletedRows" (
+  id bigserial primary key,
+  "TableName" text not null,
+  "RowId" bigint not null,
+  "DeletedAt" timestamptz not null default now()
+);
+
+create index if not exists deletedrows_table_deletedat_idx on "DeletedRows" ("TableName", "DeletedAt");
+
+-- tg_argv[0] is the table's key column
+create or replace function record_deleted_rows()
+returns trigger
+language plpgsql
+as $$
+begin
+  insert into "DeletedRows" ("TableName", "RowId")
+  select tg_table_name, (to_jsonb(o) ->> tg_argv[0])::bigint
+  from old_rows o;
+
+  delete from "DeletedRows" where "DeletedAt" < now() - interval '1 day';
+  return null;
+end;
+$$;
+
+drop trigger if exists products_record_deleted on "Products";
+create trigger products_record_deleted
+  after delete on "Products"
+  referencing old table as old_rows
+  for each statement execute function record_deleted_rows('id');
+
+drop trigger if exists services_record_deleted on "Services";
+create trigger services_record_deleted
+  after delete on "Services"
+  referencing old table as old_rows
+  for each statement execute function record_deleted_rows('id');
+
+drop trigger if exists customers_record_deleted on "Customers";
+create trigger customers_record_deleted
+  after delete on "Customers"
+  referencing old table as old_rows
+  for each statement execute function record_deleted_rows('CustomerNo');
+
+drop trigger if exists saleproducts_record_deleted on "SaleProducts";
+create trigger saleproducts_record_deleted
+  after delete on "SaleProducts"
+  referencing old table as old_rows
+  for each statement execute function record_deleted_rows('id');
+
+-- ---------- DATASET RESET ----------
+-- Same as 008, plus the tombstones: after `restart identity` a stale tombstone
+-- would delete the new row that reuses its id.
+create or replace function truncate_app_data()
+returns void
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+  truncate table "SaleLines", "Sales", "SaleCart", "ProductsUsed", "Visits", "Customers",
+                 "Products", "Services", "SaleProducts", "DailyRollup", "DeletedRows"
+    restart identity cascade;
+end;
+$$;
+
+revoke execute on function truncate_app_data() from public, anon, authenticated;
+grant execute on function truncate_app_data() to service_role;
@@ -0,0 +1,60 @@
+-- Expiry of abandoned carts: SaleCart.UpdatedAt and expire_sale_carts().
+-- Run once in the Supabase SQL editor (after 009). Safe to re-run.
+--
+-- Carts are keyed by a random session id (retail_session_id), and a cart that
+-- is never confirmed or cleared used to stay forever. Every cart line now
+-- carries UpdatedAt, set by the set_updated_at() trigger of 009 on each
+-- insert and on each update (the write-behind upsert of db.save_cart included).
+-- expire_sale_carts() deletes carts whose newest line is older than the
+-- cutoff, a batch of carts per call. cart.CartSweeper calls it from the app;
+-- with pg_cron (Database > Extensions in Supabase) the database can do it
+-- instead, and the in-app sweeper is switched off with cart_sweeper = "off":
+--
+--   select cron.schedule('expire-sale-carts', '*/15 * * * *',
+--                        $$select expire_sale_carts(24, 500)$$);
+--
+-- Indexes on "SaleCart", so cart latency does not grow with the table:
+--   salecart_session_product_uidx ("SessionID", "ProductID") - from 003. Serves
+--     every cart read, upsert and delete (SessionID = ..., optionally with
+--     ProductID) and confirm_sale.
+--   salecart_updatedat_session_idx ("UpdatedAt", "SessionID") - the sweeper's
+--     range scan for lines older than the cutoff, answered from the index.
+-- The unique index also checks that a candidate cart has no newer line.
+
+-- ---------- UPDATEDAT ----------
+alter table "SaleCart" add column if not exists "UpdatedAt" timestamptz not null default now();
+
+create index if not exists salecart_updatedat_session_idx on "SaleCart" ("UpdatedAt", "SessionID");
+
+drop trigger if exists salecart_set_updated_at on "SaleCart";
+create trigger salecart_set_updated_at
+  before insert or update on "SaleCart"
+  for each row execute function set_updated_at();
+
+-- ---------- EXPIRY ----------
+-- Returns how many carts it deleted; call again while that equals p_batch.
+create or replace function expire_sale_carts(p_max_age_hours numeric default 24, p_batch int default 500)
+returns int
+language plpgsql
+as $$
+declare
+  cutoff timestamptz := now() - make_interval(secs => p_max_age_hours * 3600);
+  expired int;
+begin
+  with stale as (
+    select distinct a."SessionID"
+    from "SaleCart" a
+    where a."UpdatedAt" < cutoff
+      and not exists (select 1 from "SaleCart" b
+                      where b."SessionID" = a."SessionID" and b."UpdatedAt" >= cutoff)
+    limit p_batch
+  ), gone as (
+    delete from "SaleCart" c
+    using stale s
+    where c."SessionID" = s."SessionID"
+    returning c."SessionID"
+  )
+  select count(distinct "SessionID") into expired from gone;
+  return expired;
+end;
+$$;
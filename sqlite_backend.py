@@ -0,0 +1,948 @@
+"""Local SQLite implementation of the Supabase tables the app uses.
+
+`SQLiteBackend` answers the same query-builder calls the pages make on a
+supabase Client (`table(...).select(...).eq(...).order(...).execute()`,
+`insert/update/upsert/delete`, `rpc(...)`) with the same semantics:
+PostgREST-style ordering (NULLs last ascending, first descending),
+case-insensitive `ilike`, `or_` filter strings, resource embedding along the
+app's foreign keys, inserts that return the stored rows with their generated
+keys, and Python versions of the SQL functions in sql/.
+
+Use `:memory:` for throwaway runs or a file path for a persistent local copy.
+"""
+import difflib
+import json
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS "Customers" (
+  "CustomerNo" INTEGER PRIMARY KEY AUTOINCREMENT,
+  "FullName" TEXT,
+  "Phone" TEXT,
+  "Email" TEXT,
+  "LastVisitID" INTEGER NOT NULL DEFAULT 0,
+  "UpdatedAt" TEXT
+);
+CREATE TABLE IF NOT EXISTS "Visits" (
+  "VisitPK" INTEGER PRIMARY KEY AUTOINCREMENT,
+  "CustomerNo" INTEGER REFERENCES "Customers" ("CustomerNo"),
+  "VisitID" INTEGER,
+  "Date" TEXT,
+  "Service" TEXT,
+  "TotalPrice_Gross" REAL,
+  "VAT" REAL,
+  "NetIncome" REAL
+);
+CREATE TABLE IF NOT EXISTS "ProductsUsed" (
+  "ProductUsedPK" INTEGER PRIMARY KEY AUTOINCREMENT,
+  "VisitPK" INTEGER REFERENCES "Visits" ("VisitPK") ON DELETE CASCADE,
+  "ProductPK" INTEGER,
+  "Product" TEXT,
+  "Brand" TEXT,
+  "ColorNo" TEXT,
+  "WeightUsed_g" REAL,
+  "ProductCost" REAL
+);
+CREATE TABLE IF NOT EXISTS "Products" (
+  "id" INTEGER PRIMARY KEY AUTOINCREMENT,
+  "ProductName" TEXT,
+  "Brand" TEXT,
+  "ColorNo" TEXT,
+  "PackageWeight_g" REAL,
+  "PackagePrice" REAL,
+  "PricePerGram" REAL,
+  "Quantity" REAL,
+  "UpdatedAt" TEXT
+);
+CREATE TABLE IF NOT EXISTS "Services" (
+  "id" INTEGER PRIMARY KEY AUTOINCREMENT,
+  "Category" TEXT,
+  "ServiceName" TEXT,
+  "Duration" REAL,
+  "Price_EUR" REAL,
+  "Active" INTEGER,
+  "UpdatedAt" TEXT
+);
+CREATE TABLE IF NOT EXISTS "SaleProducts" (
+  "id" INTEGER PRIMARY KEY AUTOINCREMENT,
+  "Name" TEXT,
+  "Brand" TEXT,
+  "BuyPriceEx" REAL,
+  "BuyPriceInc" REAL,
+  "SellPriceEx" REAL,
+  "SellPriceInc" REAL,
+  "ProfitAbs" REAL,
+  "Quantity" REAL,
+  "UpdatedAt" TEXT
+);
+CREATE TABLE IF NOT EXISTS "SaleCart" (
+  "id" INTEGER PRIMARY KEY AUTOINCREMENT,
+  "SessionID" TEXT,
+  "ProductID" INTEGER,
+  "Name" TEXT,
+  "Brand" TEXT,
+  "Qty" REAL,
+  "DiscountPct" REAL,
+  "VATRate" REAL NOT NULL,
+  "UnitSellEx" REAL,
+  "UnitSellInc" REAL,
+  "LineTotalEx" REAL,
+  "LineTotalInc" REAL,
+  "UpdatedAt" TEXT,
+  UNIQUE ("SessionID", "ProductID")
+);
+CREATE TABLE IF NOT EXISTS "Sales" (
+  "id" INTEGER PRIMARY KEY AUTOINCREMENT,
+  "SessionID" TEXT NOT NULL,
+  "CreatedAt" TEXT NOT NULL,
+  "Items" REAL NOT NULL DEFAULT 0,
+  "TotalEx" REAL NOT NULL DEFAULT 0,
+  "TotalInc" REAL NOT NULL DEFAULT 0,
+  "VAT" REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS "SaleLines" (
+  "id" INTEGER PRIMARY KEY AUTOINCREMENT,
+  "SaleID" INTEGER NOT NULL REFERENCES "Sales" ("id") ON DELETE CASCADE,
+  "ProductID" INTEGER NOT NULL,
+  "Name" TEXT,
+  "Brand" TEXT,
+  "Qty" REAL NOT NULL,
+  "DiscountPct" REAL NOT NULL DEFAULT 0,
+  "VATRate" REAL NOT NULL,
+  "UnitSellEx" REAL NOT NULL,
+  "UnitSellInc" REAL NOT NULL,
+  "LineTotalEx" REAL NOT NULL,
+  "LineTotalInc" REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS "DailyRollup" (
+  "Day" TEXT NOT NULL,
+  "Kind" TEXT NOT NULL,
+  "Service" TEXT NOT NULL DEFAULT '',
+  "Count" INTEGER NOT NULL DEFAULT 0,
+  "Gross" REAL NOT NULL DEFAULT 0,
+  "VAT" REAL NOT NULL DEFAULT 0,
+  "NetIncome" REAL NOT NULL DEFAULT 0,
+  PRIMARY KEY ("Day", "Kind", "Service")
+);
+
+CREATE INDEX IF NOT EXISTS visits_customerno_date_idx ON "Visits" ("CustomerNo", "Date" DESC);
+CREATE INDEX IF NOT EXISTS productsused_visitpk_idx ON "ProductsUsed" ("VisitPK");
+CREATE INDEX IF NOT EXISTS salelines_saleid_idx ON "SaleLines" ("SaleID");
+
+-- sql/006_id_allocation.sql: CustomerNo starts at 7394, VisitID per customer
+INSERT INTO sqlite_sequence (name, seq)
+  SELECT 'Customers', 7393 WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'Customers');
+
+CREATE TRIGGER IF NOT EXISTS visits_assign_visitid AFTER INSERT ON "Visits"
+WHEN NEW."VisitID" IS NULL
+BEGIN
+  UPDATE "Customers" SET "LastVisitID" = "LastVisitID" + 1 WHERE "CustomerNo" = NEW."CustomerNo";
+  UPDATE "Visits" SET "VisitID" = (SELECT "LastVisitID" FROM "Customers" WHERE "CustomerNo" = NEW."CustomerNo")
+  WHERE "VisitPK" = NEW."VisitPK";
+END;
+CREATE TRIGGER IF NOT EXISTS visits_track_visitid AFTER INSERT ON "Visits"
+WHEN NEW."VisitID" IS NOT NULL
+BEGIN
+  UPDATE "Customers" SET "LastVisitID" = max("LastVisitID", NEW."VisitID") WHERE "CustomerNo" = NEW."CustomerNo";
+END;
+
+-- sql/004_visit_net_income.sql: NetIncome follows ProductsUsed costs
+CREATE TRIGGER IF NOT EXISTS productsused_cost_insert AFTER INSERT ON "ProductsUsed"
+BEGIN
+  UPDATE "Visits" SET "NetIncome" = round("NetIncome" - coalesce(NEW."ProductCost", 0), 2)
+  WHERE "VisitPK" = NEW."VisitPK";
+END;
+CREATE TRIGGER IF NOT EXISTS productsused_cost_delete AFTER DELETE ON "ProductsUsed"
+BEGIN
+  UPDATE "Visits" SET "NetIncome" = round("NetIncome" + coalesce(OLD."ProductCost", 0), 2)
+  WHERE "VisitPK" = OLD."VisitPK";
+END;
+CREATE TRIGGER IF NOT EXISTS productsused_cost_update AFTER UPDATE OF "ProductCost", "VisitPK" ON "ProductsUsed"
+BEGIN
+  UPDATE "Visits" SET "NetIncome" = round("NetIncome" + coalesce(OLD."ProductCost", 0), 2)
+  WHERE "VisitPK" = OLD."VisitPK";
+  UPDATE "Visits" SET "NetIncome" = round("NetIncome" - coalesce(NEW."ProductCost", 0), 2)
+  WHERE "VisitPK" = NEW."VisitPK";
+END;
+
+-- sql/007_daily_rollup.sql: per day/service totals follow Visits and Sales
+CREATE TRIGGER IF NOT EXISTS visits_rollup_insert AFTER INSERT ON "Visits"
+WHEN NEW."Date" IS NOT NULL
+BEGIN
+  INSERT INTO "DailyRollup" ("Day", "Kind", "Service", "Count", "Gross", "VAT", "NetIncome")
+  VALUES (date(NEW."Date"), 'service', coalesce(NEW."Service", ''), 1, coalesce(NEW."TotalPrice_Gross", 0),
+          coalesce(NEW."VAT", 0), coalesce(NEW."NetIncome", 0))
+  ON CONFLICT ("Day", "Kind", "Service") DO UPDATE SET
+    "Count" = "Count" + excluded."Count", "Gross" = round("Gross" + excluded."Gross", 2),
+    "VAT" = round("VAT" + excluded."VAT", 2), "NetIncome" = round("NetIncome" + excluded."NetIncome", 2);
+END;
+CREATE TRIGGER IF NOT EXISTS visits_rollup_delete AFTER DELETE ON "Visits"
+WHEN OLD."Date" IS NOT NULL
+BEGIN
+  INSERT INTO "DailyRollup" ("Day", "Kind", "Service", "Count", "Gross", "VAT", "NetIncome")
+  VALUES (date(OLD."Date"), 'service', coalesce(OLD."Service", ''), -1, -coalesce(OLD."TotalPrice_Gross", 0),
+          -coalesce(OLD."VAT", 0), -coalesce(OLD."NetIncome", 0))
+  ON CONFLICT ("Day", "Kind", "Service") DO UPDATE SET
+    "Count" = "Count" + excluded."Count", "Gross" = round("Gross" + excluded."Gross", 2),
+    "VAT" = round("VAT" + excluded."VAT", 2), "NetIncome" = round("NetIncome" + excluded."NetIncome", 2);
+END;
+CREATE TRIGGER IF NOT EXISTS visits_rollup_update
+AFTER UPDATE OF "Date", "Service", "TotalPrice_Gross", "VAT", "NetIncome" ON "Visits"
+BEGIN
+  INSERT INTO "DailyRollup" ("Day", "Kind", "Service", "Count", "Gross", "VAT", "NetIncome")
+  SELECT date(OLD."Date"), 'service', coalesce(OLD."Service", ''), -1, -coalesce(OLD."TotalPrice_Gross", 0),
+         -coalesce(OLD."VAT", 0), -coalesce(OLD."NetIncome", 0)
+  WHERE OLD."Date" IS NOT NULL
+  ON CONFLICT ("Day", "Kind", "Service") DO UPDATE SET
+    "Count" = "Count" + excluded."Count", "Gross" = round("Gross" + excluded."Gross", 2),
+    "VAT" = round("VAT" + excluded."VAT", 2), "NetIncome" = round("NetIncome" + excluded."NetIncome", 2);
+  INSERT INTO "DailyRollup" ("Day", "Kind", "Service", "Count", "Gross", "VAT", "NetIncome")
+  SELECT date(NEW."Date"), 'service', coalesce(NEW."Service", ''), 1, coalesce(NEW."TotalPrice_Gross", 0),
+         coalesce(NEW."VAT", 0), coalesce(NEW."NetIncome", 0)
+  WHERE NEW."Date" IS NOT NULL
+  ON CONFLICT ("Day", "Kind", "Service") DO UPDATE SET
+    "Count" = "Count" + excluded."Count", "Gross" = round("Gross" + excluded."Gross", 2),
+    "VAT" = round("VAT" + excluded."VAT", 2), "NetIncome" = round("NetIncome" + excluded."NetIncome", 2);
+END;
+CREATE TRIGGER IF NOT EXISTS sales_rollup_insert AFTER INSERT ON "Sales"
+BEGIN
+  INSERT INTO "DailyRollup" ("Day", "Kind", "Service", "Count", "Gross", "VAT", "NetIncome")
+  VALUES (business_day(NEW."CreatedAt"), 'retail', '', 1, NEW."TotalInc", NEW."VAT", NEW."TotalEx")
+  ON CONFLICT ("Day", "Kind", "Service") DO UPDATE SET
+    "Count" = "Count" + excluded."Count", "Gross" = round("Gross" + excluded."Gross", 2),
+    "VAT" = round("VAT" + excluded."VAT", 2), "NetIncome" = round("NetIncome" + excluded."NetIncome", 2);
+END;
+"""
+
+# Columns added after a table's first release: (table, column) -> type.
+# Older files get them through ALTER TABLE, backfilled like Postgres' `default now()`.
+ADDED_COLUMNS = {
+    ("Customers", "UpdatedAt"): "TEXT",
+    ("Products", "UpdatedAt"): "TEXT",
+    ("Services", "UpdatedAt"): "TEXT",
+    ("SaleCart", "UpdatedAt"): "TEXT",
+}
+
+
+def _updated_at(table: str, key: str) -> str:
+    """The set_updated_at() trigger of sql/009_delta_refresh.sql for one table.
+
+    The update trigger only fires when the statement left UpdatedAt alone, so
+    the insert trigger's own UPDATE does not stamp the row twice.
+    """
+    name = table.lower()
+    return f"""
+CREATE TRIGGER IF NOT EXISTS {name}_set_updated_at AFTER INSERT ON "{table}"
+BEGIN
+  UPDATE "{table}" SET "UpdatedAt" = utc_now() WHERE "{key}" = NEW."{key}";
+END;
+CREATE TRIGGER IF NOT EXISTS {name}_touch_updated_at AFTER UPDATE ON "{table}"
+WHEN NEW."UpdatedAt" IS OLD."UpdatedAt"
+BEGIN
+  UPDATE "{table}" SET "UpdatedAt" = utc_now() WHERE "{key}" = NEW."{key}";
+END;
+"""
+
+
+def _change_tracking(table: str, key: str) -> str:
+    """sql/009_delta_refresh.sql: UpdatedAt maintenance and delete tombstones for one table."""
+    name = table.lower()
+    return f"""
+CREATE INDEX IF NOT EXISTS {name}_updatedat_idx ON "{table}" ("UpdatedAt");
+{_updated_at(table, key)}
+CREATE TRIGGER IF NOT EXISTS {name}_record_deleted AFTER DELETE ON "{table}"
+BEGIN
+  INSERT INTO "DeletedRows" ("TableName", "RowId", "DeletedAt") VALUES ('{table}', OLD."{key}", utc_now());
+  DELETE FROM "DeletedRows" WHERE "TableName" = '{table}'
+    AND "DeletedAt" < strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now', '-1 day');
+END;
+"""
+
+
+TRACKING_SCHEMA = """
+CREATE TABLE IF NOT EXISTS "DeletedRows" (
+  "id" INTEGER PRIMARY KEY AUTOINCREMENT,
+  "TableName" TEXT NOT NULL,
+  "RowId" INTEGER NOT NULL,
+  "DeletedAt" TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS deletedrows_table_deletedat_idx ON "DeletedRows" ("TableName", "DeletedAt");
+""" + "".join(_change_tracking(table, key) for table, key in [
+    ("Products", "id"), ("Services", "id"), ("Customers", "CustomerNo"), ("SaleProducts", "id")]) + """
+-- sql/010_cart_expiry.sql
+CREATE INDEX IF NOT EXISTS salecart_updatedat_session_idx ON "SaleCart" ("UpdatedAt", "SessionID");
+""" + _updated_at("SaleCart", "id")
+
+PRIMARY_KEYS = {
+    "Customers": "CustomerNo",
+    "Visits": "VisitPK",
+    "ProductsUsed": "ProductUsedPK",
+    "Products": "id",
+    "Services": "id",
+    "SaleProducts": "id",
+    "SaleCart": "id",
+    "Sales": "id",
+    "SaleLines": "id",
+    "DailyRollup": "Day,Kind,Service",
+    "DeletedRows": "id",
+}
+
+# (parent, child) -> (parent column, child column) for one-to-many embedding
+RELATIONSHIPS = {
+    ("Customers", "Visits"): ("CustomerNo", "CustomerNo"),
+    ("Visits", "ProductsUsed"): ("VisitPK", "VisitPK"),
+    ("Sales", "SaleLines"): ("id", "SaleID"),
+}
+
+BOOLEAN_COLUMNS = {"Services": {"Active"}}
+
+BUSINESS_TZ = ZoneInfo("Europe/Helsinki")   # sql/007: sales count toward the salon's local day
+
+
+class LocalBackendError(Exception):
+    """Raised for queries the local backend rejects (mirrors a PostgREST 4xx)."""
+
+
+class Response:
+    """The part of postgrest's APIResponse the app reads."""
+
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+# ---------- HELPERS ----------
+def _q(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _now() -> str:
+    # Fixed width (always microseconds), so stored timestamps compare correctly as text
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds")
+
+
+def _business_day(timestamp) -> str | None:
+    if timestamp is None:
+        return None
+    return datetime.fromisoformat(timestamp).astimezone(BUSINESS_TZ).date().isoformat()
+
+
+def _digits(value) -> str:
+    return re.sub(r"\D", "", value or "")
+
+
+def _ilike(value, pattern) -> int:
+    if value is None or pattern is None:
+        return 0
+    regex = "".join(".*" if ch == "%" else "." if ch == "_" else re.escape(ch) for ch in str(pattern))
+    return int(re.fullmatch(regex, str(value), re.IGNORECASE | re.DOTALL) is not None)
+
+
+def _split_top_level(text: str) -> list[str]:
+    parts, depth, current = [], 0, ""
+    for ch in text:
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        if ch == "," and depth == 0:
+            parts.append(current.strip())
+            current = ""
+        else:
+            current += ch
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+def parse_select(columns: str) -> tuple[list[str], dict[str, str]]:
+    """'*, Visits(*, ProductsUsed(*))' -> (['*'], {'Visits': '*, ProductsUsed(*)'})"""
+    plain, embeds = [], {}
+    for part in _split_top_level(columns or "*"):
+        match = re.fullmatch(r"(\w+)\((.*)\)", part, re.DOTALL)
+        if match:
+            embeds[match.group(1)] = match.group(2)
+        else:
+            plain.append(part)
+    return plain or ["*"], embeds
+
+
+_OPERATORS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+
+def _condition(column: str, op: str, value) -> tuple[str, list]:
+    col = _q(column)
+    if op in _OPERATORS:
+        return f"{col} {_OPERATORS[op]} ?", [value]
+    if op == "ilike":
+        return f"ilike({col}, ?)", [value]
+    if op == "like":
+        return f"{col} LIKE ?", [value]
+    if op == "in":
+        values = list(value)
+        if not values:
+            return "0", []
+        return f"{col} IN ({', '.join('?' * len(values))})", values
+    if op == "is":
+        if value in (None, "null"):
+            return f"{col} IS NULL", []
+        return f"{col} IS ?", [{"true": 1, "false": 0}.get(str(value).lower(), value)]
+    raise LocalBackendError(f"Unsupported filter operator: {op}")
+
+
+def _parse_or(expression: str) -> tuple[str, list]:
+    """PostgREST or-syntax: 'Name.ilike.%x%,Brand.eq.y' -> SQL (a OR b)."""
+    clauses, params = [], []
+    for part in _split_top_level(expression):
+        column, op, value = part.split(".", 2)
+        negate = op == "not"
+        if negate:
+            op, value = value.split(".", 1)
+        if op == "in":
+            value = [v.strip().strip('"') for v in value.strip("()").split(",") if v.strip()]
+        sql, p = _condition(column, op, value)
+        clauses.append(f"NOT ({sql})" if negate else sql)
+        params += p
+    return "(" + " OR ".join(clauses) + ")", params
+
+
+def _order_sql(orders: list[tuple[str, bool, bool | None]]) -> str:
+    terms = []
+    for column, desc, nullsfirst in orders:
+        # Postgres default: NULLS LAST ascending, NULLS FIRST descending
+        nulls_first = desc if nullsfirst is None else nullsfirst
+        terms.append(f"({_q(column)} IS NULL) {'DESC' if nulls_first else 'ASC'}")
+        terms.append(f"{_q(column)} {'DESC' if desc else 'ASC'}")
+    return " ORDER BY " + ", ".join(terms) if terms else ""
+
+
+def _encode(value):
+    if value == "now()":
+        return _now()
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+# ---------- QUERY BUILDER ----------
+class _Filters:
+    def __init__(self):
+        self._where: list[str] = []
+        self._params: list = []
+        self._negate_next = False
+
+    @property
+    def not_(self):
+        self._negate_next = True
+        return self
+
+    def _add(self, column, op, value):
+        sql, params = _condition(column, op, value)
+        if self._negate_next:
+            sql, self._negate_next = f"NOT ({sql})", False
+        self._where.append(sql)
+        self._params += params
+        return self
+
+    def eq(self, column, value):
+        return self._add(column, "eq", value)
+
+    def neq(self, column, value):
+        return self._add(column, "neq", value)
+
+    def gt(self, column, value):
+        return self._add(column, "gt", value)
+
+    def gte(self, column, value):
+        return self._add(column, "gte", value)
+
+    def lt(self, column, value):
+        return self._add(column, "lt", value)
+
+    def lte(self, column, value):
+        return self._add(column, "lte", value)
+
+    def ilike(self, column, pattern):
+        return self._add(column, "ilike", pattern)
+
+    def like(self, column, pattern):
+        return self._add(column, "like", pattern)
+
+    def in_(self, column, values):
+        return self._add(column, "in", values)
+
+    def is_(self, column, value):
+        return self._add(column, "is", value)
+
+    def or_(self, filters: str, reference_table: str | None = None):
+        sql, params = _parse_or(filters)
+        self._where.append(sql)
+        self._params += params
+        return self
+
+    def _where_sql(self) -> str:
+        return " WHERE " + " AND ".join(self._where) if self._where else ""
+
+
+class LocalQuery(_Filters):
+    def __init__(self, backend: "SQLiteBackend", table: str):
+        super().__init__()
+        self._backend = backend
+        self._table = table
+        self._action = "select"
+        self._columns = "*"
+        self._count = None
+        self._payload = None
+        self._on_conflict = None
+        self._ignore_duplicates = False
+        self._orders: dict[str | None, list] = {}
+        self._limits: dict[str | None, int] = {}
+        self._offsets: dict[str | None, int] = {}
+
+    # --- actions ---
+    def select(self, *columns, count: str | None = None):
+        self._columns = ",".join(columns) if columns else "*"
+        self._count = count
+        return self
+
+    def insert(self, rows, **_):
+        self._action, self._payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict: str = "", ignore_duplicates: bool = False, **_):
+        self._action, self._payload = "upsert", rows
+        self._on_conflict = on_conflict or PRIMARY_KEYS.get(self._table, "id")
+        self._ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, values, **_):
+        self._action, self._payload = "update", values
+        return self
+
+    def delete(self, **_):
+        self._action = "delete"
+        return self
+
+    # --- modifiers ---
+    def order(self, column, *, desc=False, nullsfirst=None, foreign_table=None):
+        self._orders.setdefault(foreign_table, []).append((column, desc, nullsfirst))
+        return self
+
+    def limit(self, size, *, foreign_table=None):
+        self._limits[foreign_table] = int(size)
+        return self
+
+    def range(self, start, end, foreign_table=None):
+        self._offsets[foreign_table] = int(start)
+        self._limits[foreign_table] = int(end) - int(start) + 1
+        return self
+
+    def execute(self) -> Response:
+        return self._backend.run(self)
+
+
+class LocalRPC:
+    def __init__(self, backend: "SQLiteBackend", name: str, params: dict):
+        self._backend, self._name, self._params = backend, name, params or {}
+
+    def execute(self) -> Response:
+        return self._backend.call(self._name, self._params)
+
+
+# ---------- BACKEND ----------
+class SQLiteBackend:
+    """Drop-in for a supabase Client backed by one SQLite connection."""
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.create_function("ilike", 2, _ilike, deterministic=True)
+        self.conn.create_function("digits", 1, _digits, deterministic=True)
+        self.conn.create_function("business_day", 1, _business_day, deterministic=True)
+        self.conn.create_function("utc_now", 0, _now)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(SCHEMA)
+        self._add_columns()
+        self.conn.executescript(TRACKING_SCHEMA)
+        self.rpcs = {
+            "search_customers": rpc_search_customers,
+            "confirm_sale": rpc_confirm_sale,
+            "rebuild_daily_rollup": rpc_rebuild_daily_rollup,
+            "rollup_report": rpc_rollup_report,
+            "truncate_app_data": rpc_truncate_app_data,
+            "bulk_load": rpc_bulk_load,
+            "expire_sale_carts": rpc_expire_sale_carts,
+        }
+        self.calls = 0      # requests served; what a PostgREST round trip would be
+
+    def _add_columns(self) -> None:
+        for (table, column), kind in ADDED_COLUMNS.items():
+            existing = {r["name"] for r in self.conn.execute(f"PRAGMA table_info({_q(table)})")}
+            if column not in existing:
+                self.conn.execute(f"ALTER TABLE {_q(table)} ADD COLUMN {_q(column)} {kind}")
+                self.conn.execute(f"UPDATE {_q(table)} SET {_q(column)} = utc_now()")
+
+    # --- client API ---
+    def table(self, name: str) -> LocalQuery:
+        if name not in PRIMARY_KEYS:
+            raise LocalBackendError(f'relation "{name}" does not exist')
+        return LocalQuery(self, name)
+
+    def from_(self, name: str) -> LocalQuery:
+        return self.table(name)
+
+    def rpc(self, name: str, params: dict | None = None) -> LocalRPC:
+        return LocalRPC(self, name, params)
+
+    # --- execution ---
+    def _rows(self, table: str, cursor) -> list[dict]:
+        booleans = BOOLEAN_COLUMNS.get(table, ())
+        rows = [dict(r) for r in cursor]
+        for row in rows:
+            for column in booleans:
+                if row.get(column) is not None:
+                    row[column] = bool(row[column])
+        return rows
+
+    def _by_rowid(self, table: str, rowids: list[int]) -> list[dict]:
+        if not rowids:
+            return []
+        marks = ", ".join("?" * len(rowids))
+        cur = self.conn.execute(f"SELECT * FROM {_q(table)} WHERE _rowid_ IN ({marks}) ORDER BY _rowid_", rowids)
+        return self._rows(table, cur)
+
+    def run(self, query: LocalQuery) -> Response:
+        with self._lock:
+            self.calls += 1
+            try:
+                if query._action == "select":
+                    return self._select(query)
+                self.conn.execute("BEGIN IMMEDIATE")
+                try:
+                    data = getattr(self, f"_{query._action}")(query)
+                    self.conn.execute("COMMIT")
+                except BaseException:
+                    self.conn.execute("ROLLBACK")
+                    raise
+                return Response(data, len(data))
+            except sqlite3.Error as e:
+                raise LocalBackendError(str(e)) from e
+
+    def _select(self, query: LocalQuery) -> Response:
+        plain, embeds = parse_select(query._columns)
+        table = query._table
+        where = query._where_sql()
+        count = None
+        if query._count:
+            count = self.conn.execute(f"SELECT count(*) FROM {_q(table)}{where}", query._params).fetchone()[0]
+        sql = f"SELECT * FROM {_q(table)}{where}{_order_sql(query._orders.get(None, []))}"
+        if None in query._limits or None in query._offsets:
+            sql += f" LIMIT {query._limits.get(None, -1)} OFFSET {query._offsets.get(None, 0)}"
+        rows = self._rows(table, self.conn.execute(sql, query._params))
+        for name, inner in embeds.items():
+            self._embed(table, rows, name, inner, query, name)
+        if plain != ["*"]:
+            keep = [c.strip() for c in plain if c.strip() != "*"]
+            star = "*" in [c.strip() for c in plain]
+            rows = [{k: v for k, v in row.items() if star or k in keep or k in embeds} for row in rows]
+        return Response(rows, count)
+
+    def _embed(self, parent: str, rows: list[dict], child: str, columns: str, query: LocalQuery, path: str):
+        if (parent, child) not in RELATIONSHIPS:
+            raise LocalBackendError(f"Could not find a relationship between '{parent}' and '{child}'")
+        parent_col, child_col = RELATIONSHIPS[(parent, child)]
+        keys = list({row[parent_col] for row in rows if row.get(parent_col) is not None})
+        children = []
+        if keys:
+            marks = ", ".join("?" * len(keys))
+            sql = (f"SELECT * FROM {_q(child)} WHERE {_q(child_col)} IN ({marks})"
+                   f"{_order_sql(query._orders.get(path, []))}")
+            children = self._rows(child, self.conn.execute(sql, keys))
+        plain, embeds = parse_select(columns)
+        for name, inner in embeds.items():
+            self._embed(child, children, name, inner, query, f"{path}.{name}")
+        if plain != ["*"] and "*" not in plain:
+            children = [{k: v for k, v in c.items() if k in plain or k in embeds or k == child_col}
+                        for c in children]
+        grouped: dict = {}
+        for c in children:
+            grouped.setdefault(c[child_col], []).append(c)
+        offset, limit = query._offsets.get(path, 0), query._limits.get(path)
+        for row in rows:
+            items = grouped.get(row.get(parent_col), [])
+            row[child] = items[offset:offset + limit] if limit is not None else items[offset:]
+
+    def _insert_rows(self, table: str, rows, conflict_sql: str = "") -> list[int]:
+        rows = [rows] if isinstance(rows, dict) else list(rows)
+        rowids = []
+        for row in rows:
+            columns = list(row)
+            sql = (f"INSERT INTO {_q(table)} ({', '.join(map(_q, columns))}) "
+                   f"VALUES ({', '.join('?' * len(columns))}){conflict_sql} RETURNING _rowid_")
+            got = self.conn.execute(sql, [_encode(row[c]) for c in columns]).fetchone()
+            if got is not None:
+                rowids.append(got[0])
+        return rowids
+
+    def _insert(self, query: LocalQuery) -> list[dict]:
+        # Re-read by rowid so values set by AFTER triggers (VisitID) are included
+        return self._by_rowid(query._table, self._insert_rows(query._table, query._payload))
+
+    def _upsert(self, query: LocalQuery) -> list[dict]:
+        table = query._table
+        target = ", ".join(_q(c.strip()) for c in query._on_conflict.split(","))
+        rows = [query._payload] if isinstance(query._payload, dict) else list(query._payload)
+        rowids = []
+        for row in rows:
+            if query._ignore_duplicates:
+                conflict = f" ON CONFLICT ({target}) DO NOTHING"
+            else:
+                sets = ", ".join(f"{_q(c)} = excluded.{_q(c)}" for c in row) or f"{target} = {target}"
+                conflict = f" ON CONFLICT ({target}) DO UPDATE SET {sets}"
+            rowids += self._insert_rows(table, [row], conflict)
+        return self._by_rowid(table, rowids)
+
+    def _update(self, query: LocalQuery) -> list[dict]:
+        table = query._table
+        values = query._payload
+        sets = ", ".join(f"{_q(c)} = ?" for c in values)
+        cur = self.conn.execute(
+            f"UPDATE {_q(table)} SET {sets}{query._where_sql()} RETURNING _rowid_",
+            [_encode(v) for v in values.values()] + query._params,
+        )
+        return self._by_rowid(table, [r[0] for r in cur.fetchall()])
+
+    def _delete(self, query: LocalQuery) -> list[dict]:
+        cur = self.conn.execute(f"DELETE FROM {_q(query._table)}{query._where_sql()} RETURNING *", query._params)
+        return self._rows(query._table, cur)
+
+    def call(self, name: str, params: dict) -> Response:
+        if name not in self.rpcs:
+            raise LocalBackendError(f"Could not find the function public.{name}")
+        with self._lock:
+            self.calls += 1
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                data = self.rpcs[name](self, **params)
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return Response(data)
+
+    def bulk_load(self, table: str, columns: list[str], rows) -> int:
+        """COPY-style load of an iterable of tuples in one transaction.
+
+        The table's triggers are dropped for the load and recreated afterwards,
+        so callers must supply already-consistent rows (ids, NetIncome, ...)
+        made of plain Python values.
+        """
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                count = self._load(table, columns, rows)
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            return count
+
+    def replace(self, tables: dict[str, list[dict]]) -> dict[str, int]:
+        """Swap the contents of several tables for `rows` in one transaction.
+
+        Readers see either the old or the new rows. Tables are given parents
+        first. Like bulk_load, the rows must be complete: the tables' triggers
+        are off while they are written.
+        """
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                with self._triggers_off(list(tables)):
+                    for table in reversed(list(tables)):
+                        self.conn.execute(f"DELETE FROM {_q(table)}")
+                    for table, rows in tables.items():
+                        if rows:
+                            columns = list(rows[0])
+                            sql = (f"INSERT INTO {_q(table)} ({', '.join(map(_q, columns))}) "
+                                   f"VALUES ({', '.join('?' * len(columns))})")
+                            self.conn.executemany(sql, ([_encode(r.get(c)) for c in columns] for r in rows))
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            return {table: len(rows) for table, rows in tables.items()}
+
+    def _load(self, table: str, columns: list[str], rows) -> int:
+        cols = ", ".join(map(_q, columns))
+        sql = f"INSERT INTO {_q(table)} ({cols}) VALUES ({', '.join('?' * len(columns))})"
+        with self._triggers_off([table]):
+            return self.conn.executemany(sql, rows).rowcount
+
+    @contextmanager
+    def _triggers_off(self, tables: list[str]):
+        """Drop the tables' triggers for the block and recreate them (inside the caller's transaction)."""
+        marks = ", ".join("?" * len(tables))
+        triggers = self.conn.execute(
+            f"SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name IN ({marks})", tables).fetchall()
+        for name, _ in triggers:
+            self.conn.execute(f"DROP TRIGGER {_q(name)}")
+        yield
+        for _, ddl in triggers:
+            self.conn.execute(ddl)
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+# ---------- RPC FUNCTIONS (sql/ equivalents) ----------
+def rpc_search_customers(backend: SQLiteBackend, q: str, max_results: int = 20) -> list[dict]:
+    """sql/001_customer_search.sql; difflib's ratio stands in for pg_trgm similarity."""
+    term = (q or "").strip().lower()
+    digits = _digits(q)
+    pattern = term.replace("%", "").replace("_", "")
+    cur = backend.conn.execute(
+        'SELECT * FROM "Customers" WHERE CAST("CustomerNo" AS TEXT) LIKE ? '
+        'OR (? AND digits("Phone") LIKE ?) OR ilike("FullName", ?) OR ilike("Email", ?)',
+        [pattern + "%", len(digits) >= 3, f"%{digits}%", f"%{pattern}%", f"%{pattern}%"],
+    )
+    rows = backend._rows("Customers", cur)
+
+    def rank(row):
+        number = str(row["CustomerNo"])
+        tier = 4 if number == term else 3 if number.startswith(pattern) else \
+            2 if len(digits) >= 3 and digits in _digits(row["Phone"]) else 1
+        similarity = max(difflib.SequenceMatcher(None, (row[c] or "").lower(), term).ratio()
+                         for c in ("FullName", "Email"))
+        return (-tier, -similarity, row["CustomerNo"])
+
+    return sorted(rows, key=rank)[:min(max(int(max_results), 1), 100)]
+
+
+def rpc_confirm_sale(backend: SQLiteBackend, p_session_id: str) -> dict:
+    """sql/002_checkout.sql; runs inside the BEGIN IMMEDIATE opened by call()."""
+    conn = backend.conn
+    wanted = [dict(r) for r in conn.execute(
+        'SELECT "ProductID", min("Name") AS "Name", sum("Qty") AS qty FROM "SaleCart" '
+        'WHERE "SessionID" = ? GROUP BY "ProductID" ORDER BY "ProductID"', [p_session_id])]
+    if not wanted:
+        return {"ok": False, "sale_id": None, "errors": [{"error": "Cart is empty"}]}
+
+    errors = []
+    for w in wanted:
+        product = conn.execute('SELECT "Quantity" FROM "SaleProducts" WHERE id = ?', [w["ProductID"]]).fetchone()
+        available = float(product["Quantity"] or 0) if product else 0.0
+        if product is None or available < w["qty"]:
+            errors.append({
+                "product_id": w["ProductID"],
+                "name": w["Name"],
+                "requested": w["qty"],
+                "available": available,
+                "error": "Product no longer exists" if product is None else "Not enough stock",
+            })
+    if errors:
+        return {"ok": False, "sale_id": None, "errors": errors}
+
+    now = _now()
+    for w in wanted:
+        conn.execute('UPDATE "SaleProducts" SET "Quantity" = round("Quantity" - ?, 2), "UpdatedAt" = ? WHERE id = ?',
+                     [w["qty"], now, w["ProductID"]])
+    sale_id = conn.execute(
+        'INSERT INTO "Sales" ("SessionID", "CreatedAt", "Items", "TotalEx", "TotalInc", "VAT") '
+        'SELECT ?, ?, sum("Qty"), sum("LineTotalEx"), sum("LineTotalInc"), '
+        'round(sum("LineTotalInc") - sum("LineTotalEx"), 2) FROM "SaleCart" WHERE "SessionID" = ? RETURNING id',
+        [p_session_id, now, p_session_id]).fetchone()[0]
+    conn.execute(
+        'INSERT INTO "SaleLines" ("SaleID", "ProductID", "Name", "Brand", "Qty", "DiscountPct", "VATRate", '
+        '"UnitSellEx", "UnitSellInc", "LineTotalEx", "LineTotalInc") '
+        'SELECT ?, "ProductID", "Name", "Brand", "Qty", coalesce("DiscountPct", 0), "VATRate", '
+        '"UnitSellEx", "UnitSellInc", "LineTotalEx", "LineTotalInc" FROM "SaleCart" WHERE "SessionID" = ?',
+        [sale_id, p_session_id])
+    conn.execute('DELETE FROM "SaleCart" WHERE "SessionID" = ?', [p_session_id])
+    return {"ok": True, "sale_id": sale_id, "errors": []}
+
+
+def rpc_expire_sale_carts(backend: SQLiteBackend, p_max_age_hours: float = 24, p_batch: int = 500) -> int:
+    """sql/010_cart_expiry.sql: delete up to p_batch carts whose newest line is older than the cutoff."""
+    conn = backend.conn
+    cutoff = (datetime.now(timezone.utc) - timedelta(hours=float(p_max_age_hours))).isoformat(timespec="microseconds")
+    stale = [r[0] for r in conn.execute(
+        'SELECT DISTINCT a."SessionID" FROM "SaleCart" a WHERE a."UpdatedAt" < ? AND NOT EXISTS '
+        '(SELECT 1 FROM "SaleCart" b WHERE b."SessionID" = a."SessionID" AND b."UpdatedAt" >= ?) LIMIT ?',
+        [cutoff, cutoff, int(p_batch)])]
+    if stale:
+        conn.execute(f'DELETE FROM "SaleCart" WHERE "SessionID" IN ({", ".join("?" * len(stale))})', stale)
+    return len(stale)
+
+
+def rpc_rebuild_daily_rollup(backend: SQLiteBackend) -> int:
+    """sql/007_daily_rollup.sql rebuild_daily_rollup()."""
+    conn = backend.conn
+    conn.execute('DELETE FROM "DailyRollup"')
+    conn.execute(
+        'INSERT INTO "DailyRollup" ("Day", "Kind", "Service", "Count", "Gross", "VAT", "NetIncome") '
+        'SELECT date("Date"), \'service\', coalesce("Service", \'\'), count(*), '
+        'round(sum(coalesce("TotalPrice_Gross", 0)), 2), round(sum(coalesce("VAT", 0)), 2), '
+        'round(sum(coalesce("NetIncome", 0)), 2) FROM "Visits" WHERE "Date" IS NOT NULL GROUP BY 1, 3 '
+        'UNION ALL '
+        'SELECT business_day("CreatedAt"), \'retail\', \'\', count(*), round(sum("TotalInc"), 2), '
+        'round(sum("VAT"), 2), round(sum("TotalEx"), 2) FROM "Sales" GROUP BY 1')
+    return conn.execute('SELECT count(*) FROM "DailyRollup"').fetchone()[0]
+
+
+# date_trunc(grain, "Day") for the report
+_PERIOD_SQL = {
+    "day": '"Day"',
+    "week": 'date("Day", \'-\' || ((CAST(strftime(\'%w\', "Day") AS INTEGER) + 6) % 7) || \' days\')',
+    "month": 'strftime(\'%Y-%m-01\', "Day")',
+    "year": 'strftime(\'%Y-01-01\', "Day")',
+}
+
+
+def rpc_rollup_report(backend: SQLiteBackend, p_from: str, p_to: str, p_grain: str = "month") -> dict:
+    """sql/007_daily_rollup.sql rollup_report()."""
+    if p_grain not in _PERIOD_SQL:
+        raise LocalBackendError(f'unit "{p_grain}" not recognized for type date')
+    sums = 'sum("Count") AS "Count", round(sum("Gross"), 2) AS "Gross", round(sum("VAT"), 2) AS "VAT", ' \
+           'round(sum("NetIncome"), 2) AS "NetIncome"'
+    periods = backend.conn.execute(
+        f'SELECT {_PERIOD_SQL[p_grain]} AS "Period", "Kind", {sums} FROM "DailyRollup" '
+        'WHERE "Day" BETWEEN ? AND ? GROUP BY 1, 2 ORDER BY 1, 2', [str(p_from), str(p_to)])
+    services = backend.conn.execute(
+        f'SELECT "Service", {sums} FROM "DailyRollup" '
+        'WHERE "Kind" = \'service\' AND "Day" BETWEEN ? AND ? GROUP BY 1 HAVING sum("Count") <> 0 '
+        'ORDER BY "Gross" DESC',
+        [str(p_from), str(p_to)])
+    return {"periods": [dict(r) for r in periods], "services": [dict(r) for r in services]}
+
+
+def rpc_truncate_app_data(backend: SQLiteBackend) -> None:
+    """truncate_app_data() as redefined by sql/009: every app table and the tombstones emptied, ids restarted."""
+    tables = ["SaleLines", "Sales", "SaleCart", "ProductsUsed", "Visits", "Customers",
+              "Products", "Services", "SaleProducts", "DailyRollup", "DeletedRows"]
+    with backend._triggers_off(tables):
+        for table in tables:
+            backend.conn.execute(f"DELETE FROM {_q(table)}")
+    backend.conn.execute(f"DELETE FROM sqlite_sequence WHERE name IN ({', '.join('?' * len(tables))})", tables)
+    backend.conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('Customers', 7393)")
+
+
+def rpc_bulk_load(backend: SQLiteBackend, p_table: str, p_rows: list[dict]) -> int:
+    """sql/008_dataset_admin.sql bulk_load(): complete rows, loaded without triggers."""
+    if p_table not in PRIMARY_KEYS:
+        raise LocalBackendError(f"bulk_load: unknown table {p_table}")
+    if not p_rows:
+        return 0
+    columns = list(p_rows[0])
+    return backend._load(p_table, columns, ([_encode(row.get(c)) for c in columns] for row in p_rows))
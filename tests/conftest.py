@@ -0,0 +1,20 @@
+import sys
+from pathlib import Path
+
+import pytest
+import streamlit as st
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def app_db(tmp_path, monkeypatch):
+    """A fresh local database behind db.get_client(), with every shared resource rebuilt."""
+    monkeypatch.setenv("SALON_BACKEND", "sqlite")
+    monkeypatch.setenv("SALON_SQLITE_PATH", str(tmp_path / "salon.db"))
+    for name in ("FAULTS", "HEDGE_READS", "OFFLINE_MIRROR"):
+        monkeypatch.delenv(f"SALON_{name}", raising=False)
+    st.cache_resource.clear()
+    import db
+    yield db.get_client()
+    st.cache_resource.clear()
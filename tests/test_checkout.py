@@ -0,0 +1,74 @@
+"""confirm_sale as the SQLite port in sqlite_backend.py (rpc_confirm_sale) runs it.
+
+Only the port is exercised: the plpgsql function in sql/002_checkout.sql is not
+run here, so a change to one must be mirrored in the other by hand and the SQL
+checked against a Supabase project.
+"""
+import pandas as pd
+import pytest
+
+from backends import create_backend
+from pricing import price_lines
+
+
+@pytest.fixture
+def backend(tmp_path):
+    client = create_backend("sqlite", sqlite_path=str(tmp_path / "salon.db"))
+    client.table("SaleProducts").insert([
+        {"id": 1, "Name": "Shampoo", "Brand": "Davines", "BuyPriceEx": 8.0, "SellPriceEx": 12.0, "Quantity": 5},
+        {"id": 2, "Name": "Mask", "Brand": "Olaplex", "BuyPriceEx": 15.0, "SellPriceEx": 22.5, "Quantity": 1},
+    ]).execute()
+    return client
+
+
+def fill_cart(client, session_id: str, qty: dict[int, float]) -> None:
+    lines = pd.DataFrame({"ProductID": list(qty), "Qty": list(qty.values()), "DiscountPct": 0.0,
+                          "BasePriceEx": [12.0 if pid == 1 else 22.5 for pid in qty]})
+    priced = price_lines(lines).drop(columns=["BasePriceEx", "LineVAT"])
+    rows = priced.assign(SessionID=session_id, Name="Line").to_dict("records")
+    client.table("SaleCart").upsert(rows, on_conflict="SessionID,ProductID").execute()
+
+
+def stock(client) -> dict[int, float]:
+    return {r["id"]: r["Quantity"] for r in client.table("SaleProducts").select("id, Quantity").execute().data}
+
+
+def count(client, table: str) -> int:
+    return len(client.table(table).select("*").execute().data)
+
+
+def confirm(client, session_id: str) -> dict:
+    return client.rpc("confirm_sale", {"p_session_id": session_id}).execute().data
+
+
+def test_sale_decrements_stock_and_empties_cart(backend):
+    fill_cart(backend, "s1", {1: 2, 2: 1})
+    result = confirm(backend, "s1")
+
+    assert result["ok"] and result["errors"] == []
+    assert stock(backend) == {1: 3, 2: 0}
+    sale = backend.table("Sales").select("*").eq("id", result["sale_id"]).execute().data[0]
+    assert sale["Items"] == 3 and sale["TotalEx"] == 46.5
+    assert count(backend, "SaleLines") == 2
+    assert count(backend, "SaleCart") == 0
+
+
+def test_insufficient_stock_changes_nothing(backend):
+    fill_cart(backend, "s1", {1: 2, 2: 3})
+    result = confirm(backend, "s1")
+
+    assert not result["ok"] and result["sale_id"] is None
+    assert [(e["product_id"], e["requested"], e["available"]) for e in result["errors"]] == [(2, 3, 1)]
+    assert stock(backend) == {1: 5, 2: 1}
+    assert count(backend, "Sales") == count(backend, "SaleLines") == 0
+    assert count(backend, "SaleCart") == 2
+
+
+def test_double_confirm_sells_once(backend):
+    fill_cart(backend, "s1", {1: 2})
+    assert confirm(backend, "s1")["ok"]
+    again = confirm(backend, "s1")
+
+    assert not again["ok"] and again["errors"] == [{"error": "Cart is empty"}]
+    assert stock(backend) == {1: 3, 2: 1}
+    assert count(backend, "Sales") == 1
@@ -0,0 +1,26 @@
+import pytest
+
+import dataset
+from backends import create_backend
+
+
+@pytest.mark.parametrize("parquet", [True, False])
+def test_snapshot_restore_round_trip(tmp_path, monkeypatch, parquet):
+    monkeypatch.setattr(dataset, "DATASETS", tmp_path / "datasets")
+    monkeypatch.setattr(dataset, "_has_pyarrow", lambda: parquet)
+    client = create_backend("sqlite", sqlite_path=str(tmp_path / "salon.db"))
+    client.table("Customers").insert([{"FullName": "Aino", "Phone": "0401234567"},
+                                      {"FullName": "Eero", "Phone": None}]).execute()
+    client.table("Services").insert({"Category": "Hair", "ServiceName": "Cut", "Duration": 45,
+                                     "Price_EUR": 59.5, "Active": True}).execute()
+    before = {t: dataset.read_table(client, t) for t in ("Customers", "Services")}
+
+    path = dataset.snapshot(client, "small", log=lambda _: None)
+    assert (path / f"Customers.{'parquet' if parquet else 'csv'}").exists()
+    dataset.reset(client)
+    dataset.load_dataset(client, dataset.read_dataset(path), log=lambda _: None)
+
+    for table, rows in before.items():
+        after = dataset.read_table(client, table)
+        assert after.astype(object).where(after.notna(), None).to_dict("records") == \
+            rows.astype(object).where(rows.notna(), None).to_dict("records")
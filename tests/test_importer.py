@@ -0,0 +1,30 @@
+import io
+
+import importer
+
+
+def csv_bytes(rows: list[str], header: str = "Full name;Phone;Email") -> bytes:
+    return ("﻿" + "\n".join([header, *rows]) + "\n").encode("utf-8")
+
+
+def test_read_chunks_streams_the_file():
+    file = io.BytesIO(csv_bytes([f"Customer {i};040{i:07d};c{i}@example.com" for i in range(25)]))
+    chunks = list(importer.read_chunks(file, "customers.csv", chunk_rows=10))
+
+    assert [len(c) for c, _ in chunks] == [10, 10, 5]
+    assert list(chunks[0][0].columns) == ["Row", "Full name", "Phone", "Email"]
+    assert chunks[0][0]["Phone"].iloc[0] == "0400000000"
+    assert chunks[-1][0]["Row"].iloc[-1] == 26
+    fractions = [f for _, f in chunks]
+    assert fractions == sorted(fractions) and fractions[-1] == 1.0
+    assert not file.closed
+
+
+def test_error_report_is_capped_across_chunks(app_db, monkeypatch):
+    monkeypatch.setattr(importer, "MAX_REPORTED_ERRORS", 7)
+    rows = [f";040{i:07d};" for i in range(importer.CHUNK_ROWS * 2 + 10)]     # no name: every row is invalid
+    result = importer.run_import(io.BytesIO(csv_bytes(rows)), "customers.csv", "Customers")
+
+    assert result["invalid"] == len(rows)
+    assert len(result["errors"]) == 7
+    assert result["errors"]["Row"].tolist() == list(range(2, 9))
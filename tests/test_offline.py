@@ -0,0 +1,119 @@
+from datetime import datetime
+
+import pytest
+
+from backends import create_backend
+from db import save_cart
+from offline import PROBE_EVERY, OfflineClient
+from resilience import Executor, FaultyBackend, ResilientClient
+from sqlite_backend import BUSINESS_TZ
+
+
+@pytest.fixture
+def server(tmp_path):
+    backend = create_backend("sqlite", sqlite_path=str(tmp_path / "server.db"))
+    backend.table("Customers").insert({"CustomerNo": 7394, "FullName": "Aino", "Phone": "0401234567"}).execute()
+    backend.table("Services").insert({"Category": "Hair", "ServiceName": "Cut", "Price_EUR": 59.5}).execute()
+    backend.table("SaleProducts").insert({"id": 1, "Name": "Shampoo", "BuyPriceEx": 8.0, "SellPriceEx": 12.0,
+                                          "Quantity": 5}).execute()
+    return backend
+
+
+@pytest.fixture
+def offline(server, tmp_path):
+    network = FaultyBackend(server, {})
+    now = [0.0]
+    client = OfflineClient(ResilientClient(network, Executor(sleep=lambda _: None)), str(tmp_path / "mirror.db"),
+                           clock=lambda: now[0])
+    client.sync_mirror()
+    network.set_down(True)
+
+    def reconnect():
+        network.set_down(False)
+        now[0] += PROBE_EVERY
+    client.network, client.reconnect = network, reconnect
+    return client
+
+
+def queue_visit_and_sale(client) -> None:
+    today = datetime.now(BUSINESS_TZ).date().isoformat()
+    visit = client.table("Visits").insert({"CustomerNo": 7394, "VisitID": 1, "Date": today, "Service": "Color",
+                                           "TotalPrice_Gross": 124.0, "VAT": 25.2, "NetIncome": 98.8}).execute()
+    local_pk = visit.data[0]["VisitPK"]
+    assert local_pk < 0 and not client.online
+    client.table("ProductsUsed").insert([
+        {"VisitPK": local_pk, "Product": "Koleston 7/0", "WeightUsed_g": 60, "ProductCost": 4.2},
+        {"VisitPK": local_pk, "Product": "Developer 6%", "WeightUsed_g": 90, "ProductCost": 1.35},
+    ]).execute()
+    client.table("SaleCart").upsert({"SessionID": "till", "ProductID": 1, "Name": "Shampoo", "Qty": 2,
+                                     "DiscountPct": 0, "VATRate": 0.255, "UnitSellEx": 12.0, "UnitSellInc": 15.06,
+                                     "LineTotalEx": 24.0, "LineTotalInc": 30.12},
+                                    on_conflict="SessionID,ProductID").execute()
+    assert client.rpc("confirm_sale", {"p_session_id": "till"}).execute().data["ok"]
+    assert client.status()["pending"] == 3
+
+
+def test_replay_maps_keys_and_sells_once(server, offline):
+    queue_visit_and_sale(offline)
+    offline.reconnect()
+    offline.table("Services").select("id").execute()      # the probe replays the queue first
+
+    assert offline.online and offline.status()["pending"] == 0 and offline.status()["conflicts"] == []
+    visit = server.table("Visits").select("*").execute().data
+    assert len(visit) == 1 and visit[0]["VisitPK"] > 0
+    assert offline.queue.remote_id("Visits", -1) == visit[0]["VisitPK"]
+    used = server.table("ProductsUsed").select("VisitPK, ProductCost").execute().data
+    assert [u["VisitPK"] for u in used] == [visit[0]["VisitPK"]] * 2
+    assert visit[0]["NetIncome"] == 93.25
+    assert server.table("SaleProducts").select("Quantity").eq("id", 1).execute().data[0]["Quantity"] == 3
+    assert len(server.table("Sales").select("id").execute().data) == 1
+
+    offline.replay()
+    assert len(server.table("Sales").select("id").execute().data) == 1
+    assert len(server.table("ProductsUsed").select("*").execute().data) == 2
+
+
+def test_lost_response_is_not_sent_twice(server, offline):
+    queue_visit_and_sale(offline)
+    # Every write reached the server, but the app crashed before it heard back
+    offline.network.set_down(False)
+    for op in offline.queue.pending():
+        (offline._send_sale if op["Kind"] == "sale" else offline._send_insert)(op["Target"], op["Payload"], False)
+        offline.queue.mark(op["id"], "sending")
+    offline.reconnect()
+    offline.table("Services").select("id").execute()
+
+    assert offline.status()["pending"] == 0
+    assert len(server.table("Visits").select("*").execute().data) == 1
+    assert len(server.table("ProductsUsed").select("*").execute().data) == 2
+    assert len(server.table("Sales").select("id").execute().data) == 1
+    assert server.table("SaleProducts").select("Quantity").eq("id", 1).execute().data[0]["Quantity"] == 3
+
+
+CART_LINE = {"ProductID": 1, "Name": "Shampoo", "Brand": None, "Qty": 2, "DiscountPct": 0, "VATRate": 0.255,
+             "UnitSellEx": 12.0, "UnitSellInc": 15.06, "LineTotalEx": 24.0, "LineTotalInc": 30.12}
+
+
+def test_cart_saved_before_the_outage_sells_offline(server, offline):
+    offline.network.set_down(False)
+    save_cart("till", [{**CART_LINE, "SessionID": "till"}], offline)
+    offline.network.set_down(True)
+
+    result = offline.rpc("confirm_sale", {"p_session_id": "till"}).execute().data
+    assert result["ok"] and not offline.online
+    offline.reconnect()
+    offline.table("Services").select("id").execute()
+
+    assert len(server.table("Sales").select("id").execute().data) == 1
+    assert server.table("SaleProducts").select("Quantity").eq("id", 1).execute().data[0]["Quantity"] == 3
+    assert server.table("SaleCart").select("*").execute().data == []
+
+
+def test_cart_sold_online_is_not_sold_again_offline(server, offline):
+    offline.network.set_down(False)
+    save_cart("till", [{**CART_LINE, "SessionID": "till"}], offline)
+    assert offline.rpc("confirm_sale", {"p_session_id": "till"}).execute().data["ok"]
+    offline.network.set_down(True)
+
+    result = offline.rpc("confirm_sale", {"p_session_id": "till"}).execute().data
+    assert not result["ok"] and offline.status()["pending"] == 0
@@ -0,0 +1,101 @@
+import time
+
+import httpx
+import pytest
+from postgrest.exceptions import APIError
+
+from backends import create_backend
+from resilience import HEDGE_MIN_SAMPLES, RETRY_ATTEMPTS, Executor, FaultyBackend, ResilientClient, RetryPolicy
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return create_backend("sqlite", sqlite_path=str(tmp_path / "salon.db"))
+
+
+def faulty(backend, **faults) -> FaultyBackend:
+    return FaultyBackend(backend, {"seed": 1, **faults})
+
+
+def client_over(backend: FaultyBackend, **executor) -> ResilientClient:
+    executor.setdefault("sleep", lambda _: None)
+    return ResilientClient(backend, Executor(**executor))
+
+
+def customers(backend) -> int:
+    return len(backend.table("Customers").select("CustomerNo").execute().data)
+
+
+def stats(client, table: str, op: str) -> dict:
+    return next(s for s in client.executor.stats() if (s["table"], s["op"]) == (table, op))
+
+
+def test_unsent_insert_is_retried(backend):
+    flaky = faulty(backend, refused=1)
+    client = client_over(flaky, sleep=lambda _: flaky.rates.update(refused=0))     # the connection comes back
+
+    client.table("Customers").insert({"FullName": "Aino"}).execute()
+    assert customers(backend) == 1
+    assert flaky.injected["refused"] == 1
+    assert stats(client, "Customers", "insert")["retries"] == 1
+
+
+def test_unsent_gives_up_after_the_attempts(backend):
+    flaky = faulty(backend, refused=1)
+    client = client_over(flaky)
+    with pytest.raises(httpx.ConnectError):
+        client.table("Customers").insert({"FullName": "Aino"}).execute()
+    assert flaky.injected["refused"] == RETRY_ATTEMPTS
+    assert customers(backend) == 0
+
+
+def test_insert_is_not_repeated_after_a_timeout(backend):
+    flaky = faulty(backend, timeout=1)
+    client = client_over(flaky)
+    for _ in range(3):
+        with pytest.raises(httpx.ReadTimeout):
+            client.table("Customers").insert({"FullName": "Aino"}).execute()
+    # Each insert was applied once and never sent again
+    assert customers(backend) == 3
+    assert flaky.injected["timeout"] == 3
+    assert stats(client, "Customers", "insert")["retries"] == 0
+
+
+def test_checkout_is_not_repeated_after_a_timeout(backend):
+    flaky = faulty(backend, timeout=1)
+    client = client_over(flaky)
+    with pytest.raises(httpx.ReadTimeout):
+        client.rpc("confirm_sale", {"p_session_id": "s1"}).execute()
+    assert flaky.injected["timeout"] == 1
+
+
+def test_upsert_is_retried_after_a_timeout(backend):
+    flaky = faulty(backend, timeout=1)
+    client = client_over(flaky)
+    with pytest.raises(httpx.ReadTimeout):
+        client.table("Customers").upsert({"CustomerNo": 7, "FullName": "Aino"}).execute()
+    assert flaky.injected["timeout"] == RETRY_ATTEMPTS
+    assert customers(backend) == 1
+
+
+def test_budget_stops_the_retries(backend):
+    # Backoffs of 0.1, 0.2, 0.4 s: the third would end past the 0.5 s budget
+    flaky = faulty(backend, error=1)
+    client = client_over(flaky, policy=RetryPolicy(attempts=10, budget=0.5), rng=lambda: 1.0, sleep=time.sleep)
+    with pytest.raises(APIError):
+        client.table("Customers").select("*").execute()
+    assert flaky.injected["error"] == 3
+
+
+def test_hedged_read_answers_once(backend):
+    backend.table("Customers").insert([{"FullName": f"C{i}"} for i in range(5)]).execute()
+    flaky = faulty(backend)
+    client = client_over(flaky, hedge=True)
+    for _ in range(HEDGE_MIN_SAMPLES):
+        client.table("Customers").select("*").execute()
+
+    flaky.rates["slow"], flaky.delay = 1, 0.2
+    rows = client.table("Customers").select("*").execute().data
+    assert len(rows) == 5
+    s = stats(client, "Customers", "select")
+    assert (s["requests"], s["hedges"], s["retries"]) == (HEDGE_MIN_SAMPLES + 1, 1, 0)
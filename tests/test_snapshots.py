@@ -0,0 +1,75 @@
+import pandas as pd
+
+import db
+from pricing import price_products
+
+
+def test_delta_merge_keeps_prices_exact(app_db):
+    rows = price_products(pd.DataFrame({"Name": ["A", "B", "C"], "Brand": ["X", "Y", "X"],
+                                        "BuyPriceEx": [31.8, 24.57, 9.99], "Quantity": [5.0, 3.0, 2.0]}))
+    app_db.table("SaleProducts").insert(db.to_records(rows)).execute()
+    # Older than DELTA_OVERLAP, so a delta brings back only the edited row
+    app_db.table("SaleProducts").update({"UpdatedAt": "2026-01-01T00:00:00.000000+00:00"}).gte("id", 0).execute()
+    now = [0.0]
+    db.get_snapshots()["SaleProducts"].clock = lambda: now[0]
+
+    # Each save is merged into the float32 snapshot as a delta
+    for buy_ex in (30.73, 12.34):
+        original = db.load_sale_products()
+        edited = original.copy()
+        edited.loc[edited["Name"] == "B", "BuyPriceEx"] = buy_ex
+        assert db.save_sale_products(original, edited) == 1
+        now[0] += db.DELTA_POLL
+
+    original = db.load_sale_products()
+    assert db.get_snapshots()["SaleProducts"]._rows["BuyPriceEx"].dtype == "float32"
+    assert original["BuyPriceEx"].tolist() == [31.8, 12.34, 9.99]
+    edited = original.copy()
+    edited.loc[edited["Name"] == "A", "Quantity"] = 4.0
+    db.save_sale_products(original, edited)
+
+    stored = pd.DataFrame(app_db.table("SaleProducts").select("*").order("id").execute().data)
+    assert stored["BuyPriceEx"].tolist() == [31.8, 12.34, 9.99]
+    assert stored["BuyPriceInc"].tolist() == price_products(stored)["BuyPriceInc"].tolist()
+    assert stored["BuyPriceInc"].iloc[0] == 39.91
+
+
+def test_money_keeps_extra_decimals():
+    values = pd.Series([1.005, 31.799999237060547, None])
+    assert db._money(values, 2).tolist()[:2] == [1.005, 31.8]
+    assert db._compact(pd.DataFrame({"BuyPriceEx": values}), "SaleProducts")["BuyPriceEx"].dtype == "float64"
+
+
+def test_unmigrated_table_is_not_reread_every_time(app_db):
+    app_db.conn.executescript('DROP TRIGGER services_set_updated_at; DROP TRIGGER services_touch_updated_at; '
+                              'DROP INDEX services_updatedat_idx; '
+                              'ALTER TABLE "Services" DROP COLUMN "UpdatedAt";')
+    app_db.table("Services").insert({"Category": "Hair", "ServiceName": "Cut", "Price_EUR": 59.5}).execute()
+    snapshot = db.get_snapshots()["Services"]
+    now = [0.0]
+    snapshot.clock = lambda: now[0]
+
+    for _ in range(5):
+        assert len(db.load_services()) == 1
+        now[0] += db.DELTA_POLL
+    assert (snapshot.tracked, snapshot.full_loads, snapshot.delta_loads) == (False, 1, 0)
+
+    now[0] += db.CACHE_TTL
+    db.load_services()
+    db.invalidate("Services")
+    db.load_services()
+    assert snapshot.full_loads == 3
+
+
+def test_empty_table_polls_on_the_delta_timer(app_db):
+    snapshot = db.get_snapshots()["Services"]
+    now = [0.0]
+    snapshot.clock = lambda: now[0]
+    for _ in range(5):
+        assert db.load_services().empty
+    assert snapshot.full_loads == 1
+
+    app_db.table("Services").insert({"Category": "Hair", "ServiceName": "Cut", "Price_EUR": 59.5}).execute()
+    now[0] += db.DELTA_POLL
+    assert len(db.load_services()) == 1
+    assert snapshot.tracked